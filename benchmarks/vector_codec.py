@@ -0,0 +1,97 @@
+# Copyright 2021 PingCAP, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Micro-benchmark for the VectorField codec.
+
+Compares `encode_vector`/`decode_vector` against the previous per-element
+implementation. It does not need a database:
+
+    $ python benchmarks/vector_codec.py
+
+The current encoder writes the shortest decimal that round-trips each float32
+value, while the legacy one wrote its float64 repr, so the lengths of the
+literals are compared too. Decoding is bound by the text to float conversion:
+numpy's parser only saves the list of Python strings, and measures between
+0.9x and 1.4x of the legacy decoder, i.e. about the same speed.
+"""
+
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from django_tidb.fields.vector import decode_vector, encode_vector  # noqa: E402
+
+DIMENSIONS = (384, 768, 1536)
+NUMBER = 2000
+
+
+def legacy_encode_vector(value):
+    if isinstance(value, np.ndarray):
+        value = value.tolist()
+    return "[" + ",".join([str(float(v)) for v in value]) + "]"
+
+
+def shortest_encode_vector(value):
+    # The shortest float32 representations, as printed by TiDB.
+    return "[" + ",".join([str(v) for v in np.float32(value)]) + "]"
+
+
+def legacy_decode_vector(value):
+    return np.array(value[1:-1].split(","), dtype=np.float32)
+
+
+def measure(func, arg):
+    return min(timeit.repeat(lambda: func(arg), number=NUMBER, repeat=5)) / NUMBER
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(
+        "%6s  %-14s %12s %12s %8s"
+        % ("dims", "operation", "legacy (us)", "numpy (us)", "speedup")
+    )
+    for dim in DIMENSIONS:
+        vector = rng.standard_normal(dim).astype(np.float32)
+        text = shortest_encode_vector(vector)
+        assert np.array_equal(decode_vector(encode_vector(vector)), vector)
+        assert np.array_equal(decode_vector(text), legacy_decode_vector(text))
+        print(
+            "%6d  %-14s %12d %12d %8s"
+            % (
+                dim,
+                "length",
+                len(legacy_encode_vector(vector)),
+                len(encode_vector(vector)),
+                "",
+            )
+        )
+        cases = (
+            ("encode ndarray", legacy_encode_vector, encode_vector, vector),
+            ("encode list", legacy_encode_vector, encode_vector, vector.tolist()),
+            ("decode", legacy_decode_vector, decode_vector, text),
+        )
+        for name, legacy, current, arg in cases:
+            before, after = measure(legacy, arg), measure(current, arg)
+            print(
+                "%6d  %-14s %12.1f %12.1f %7.1fx"
+                % (dim, name, before * 1e6, after * 1e6, before / after)
+            )
+
+
+if __name__ == "__main__":
+    main()
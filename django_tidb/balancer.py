@@ -0,0 +1,225 @@
+# Copyright 2021 PingCAP, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import itertools
+import threading
+import time
+import weakref
+
+import MySQLdb as Database
+
+STRATEGIES = ("round_robin", "least_connections")
+
+# The options of OPTIONS["load_balancing"], with their default values.
+BALANCER_DEFAULTS = {
+    "strategy": "round_robin",
+    # Seconds a host is ejected for after its first failure, doubled after
+    # each following failure up to max_backoff.
+    "backoff": 1.0,
+    "max_backoff": 60.0,
+}
+
+# Errors raised when connecting that mean the host is unreachable or can't
+# serve, other errors (e.g. access denied) are raised without failover.
+# https://dev.mysql.com/doc/mysql-errors/8.0/en/client-error-reference.html
+HOST_ERROR_CODES = {
+    1040,  # ER_CON_COUNT_ERROR, too many connections.
+    1053,  # ER_SERVER_SHUTDOWN
+    2002,  # CR_CONNECTION_ERROR
+    2003,  # CR_CONN_HOST_ERROR
+    2005,  # CR_UNKNOWN_HOST
+    2006,  # CR_SERVER_GONE_ERROR
+    2013,  # CR_SERVER_LOST
+    2026,  # CR_SSL_CONNECTION_ERROR
+    2055,  # CR_SERVER_LOST_EXTENDED
+}
+
+# Errors raised by an open connection whose server went away.
+CONNECTION_LOST_CODES = {
+    2006,  # CR_SERVER_GONE_ERROR
+    2013,  # CR_SERVER_LOST
+}
+
+
+def parse_hosts(hosts, default_port):
+    """
+    Parse a comma-separated list of hosts, each with an optional port, e.g.
+    "tidb-0,tidb-1:4001". Return a list of (host, port).
+    """
+    result = []
+    for host in hosts.split(","):
+        host = host.strip()
+        if not host:
+            continue
+        port = default_port
+        if host.startswith("["):
+            # IPv6 address, e.g. [::1]:4000.
+            address, _sep, rest = host[1:].partition("]")
+            host = address
+            if rest.startswith(":"):
+                port = rest[1:]
+        elif host.count(":") == 1:
+            host, port = host.split(":")
+        result.append((host, int(port) if port else None))
+    return result
+
+
+def format_host(host):
+    name, port = host
+    if ":" in name:
+        name = "[%s]" % name
+    return name if port is None else "%s:%s" % (name, port)
+
+
+def is_host_error(error):
+    return bool(error.args) and error.args[0] in HOST_ERROR_CODES
+
+
+class HostBalancer:
+    """
+    Distribute new connections across several tidb-server hosts.
+
+    Hosts that fail to accept a connection are ejected for an exponential
+    backoff, and the next host is tried. If all the hosts are ejected, they're
+    tried anyway, starting with the one whose backoff ends first.
+    """
+
+    def __init__(self, hosts, **options):
+        unknown = set(options) - set(BALANCER_DEFAULTS)
+        if unknown:
+            raise ValueError(
+                "Unknown load balancing options: %s." % ", ".join(sorted(unknown))
+            )
+        options = {**BALANCER_DEFAULTS, **options}
+        if options["strategy"] not in STRATEGIES:
+            raise ValueError(
+                "Unknown load balancing strategy %r, use one of %s."
+                % (options["strategy"], ", ".join(STRATEGIES))
+            )
+        if not hosts:
+            raise ValueError("No hosts to balance.")
+        self.hosts = list(hosts)
+        self.strategy = options["strategy"]
+        self.backoff = options["backoff"]
+        self.max_backoff = options["max_backoff"]
+        self._lock = threading.Lock()
+        self._next = itertools.count()
+        # Open connections, consecutive failures and ejection deadline by host.
+        self._connections = dict.fromkeys(self.hosts, 0)
+        self._failures = dict.fromkeys(self.hosts, 0)
+        self._ejected_until = dict.fromkeys(self.hosts, 0.0)
+        # The host of each open connection.
+        self._connection_hosts = weakref.WeakKeyDictionary()
+
+    def candidates(self):
+        """Return the hosts in the order they should be tried."""
+        now = time.monotonic()
+        with self._lock:
+            start = next(self._next) % len(self.hosts)
+            rotated = self.hosts[start:] + self.hosts[:start]
+            healthy = [host for host in rotated if self._ejected_until[host] <= now]
+            if self.strategy == "least_connections":
+                # sorted() is stable, ties are broken by the rotation.
+                healthy.sort(key=self._connections.__getitem__)
+            ejected = sorted(
+                (host for host in rotated if self._ejected_until[host] > now),
+                key=self._ejected_until.__getitem__,
+            )
+        return healthy + ejected
+
+    def first_healthy(self):
+        """
+        Return the first host, in the configured order, that isn't ejected,
+        or the one whose backoff ends first.
+        """
+        now = time.monotonic()
+        with self._lock:
+            healthy = [host for host in self.hosts if self._ejected_until[host] <= now]
+            if healthy:
+                return healthy[0]
+            return min(self.hosts, key=self._ejected_until.__getitem__)
+
+    def connect(self, connect, conn_params):
+        """
+        Open a connection with connect(**conn_params), to the first host
+        that accepts it.
+        """
+        error = None
+        for host, port in self.candidates():
+            params = {**conn_params, "host": host}
+            if port is not None:
+                params["port"] = port
+            else:
+                params.pop("port", None)
+            try:
+                connection = connect(**params)
+            except Database.OperationalError as e:
+                if not is_host_error(e):
+                    raise
+                self.mark_failed((host, port))
+                error = e
+                continue
+            self.mark_ok((host, port))
+            self._track(connection, (host, port))
+            return connection
+        raise error
+
+    def mark_failed(self, host):
+        with self._lock:
+            self._failures[host] += 1
+            delay = min(
+                self.backoff * 2 ** (self._failures[host] - 1), self.max_backoff
+            )
+            self._ejected_until[host] = time.monotonic() + delay
+
+    def connection_failed(self, connection, error):
+        """
+        Eject the host of `connection`, opened by connect(), if `error` means
+        that its server went away.
+        """
+        if not error.args or error.args[0] not in CONNECTION_LOST_CODES:
+            return
+        with self._lock:
+            host = self._connection_hosts.get(connection)
+        if host is not None:
+            self.mark_failed(host)
+
+    def mark_ok(self, host):
+        with self._lock:
+            self._failures[host] = 0
+            self._ejected_until[host] = 0.0
+
+    def get_stats(self):
+        """Return the open connections and the state of each host."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                format_host(host): {
+                    "connections": self._connections[host],
+                    "failures": self._failures[host],
+                    "ejected_for": max(self._ejected_until[host] - now, 0.0),
+                }
+                for host in self.hosts
+            }
+
+    def _track(self, connection, host):
+        # Count the connection until it's garbage collected, which happens
+        # as soon as it's closed and dropped by Django or by the pool.
+        with self._lock:
+            self._connections[host] += 1
+            self._connection_hosts[connection] = host
+        weakref.finalize(connection, self._release, host)
+
+    def _release(self, host):
+        with self._lock:
+            self._connections[host] -= 1
@@ -15,19 +15,88 @@
 TiDB database backend for Django.
 Requires mysqlclient: https://pypi.org/project/mysqlclient/
 """
+import threading
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.mysql.base import CursorWrapper as MysqlCursorWrapper
 from django.db.backends.mysql.base import (
     DatabaseWrapper as MysqlDatabaseWrapper,
 )
+from django.db.backends.mysql.base import Database
+from django.utils.asyncio import async_unsafe
 from django.utils.functional import cached_property
 
 # Some of these import MySQLdb, so import them after checking if it's installed.
+from .balancer import HostBalancer, parse_hosts
+from .client import DatabaseClient
 from .features import DatabaseFeatures
 from .introspection import DatabaseIntrospection
+from .limits import execution_limit_error
 from .operations import DatabaseOperations
+from .pool import ConnectionPool
 from .schema import DatabaseSchemaEditor
+from .session import replica_read
 from .version import TiDBVersion
 
-server_version = TiDBVersion()
+# Keys of DATABASES["OPTIONS"] handled by the backend, they aren't passed to
+# MySQLdb.connect().
+TIDB_OPTIONS = ("introspection_cache", "load_balancing", "pool", "server_data")
+
+# The keys of DatabaseWrapper.tidb_server_data.
+SERVER_DATA_KEYS = (
+    "version",
+    "sql_mode",
+    "default_storage_engine",
+    "sql_auto_is_null",
+    "lower_case_table_names",
+    "has_zoneinfo_database",
+)
+
+# Server data probed by the connections of the process, by server. New
+# connections (e.g. one per thread) reuse it instead of probing again.
+_server_data_cache = {}
+_server_data_cache_lock = threading.Lock()
+
+
+def clear_server_data_cache():
+    """Drop the server data cached by all the connections."""
+    with _server_data_cache_lock:
+        _server_data_cache.clear()
+
+
+class CursorWrapper(MysqlCursorWrapper):
+    """
+    Raise the ExecutionLimitExceeded subclasses for queries cancelled by
+    TiDB because they exceeded a limit. Other operational errors are passed
+    to connection_failed(error), if given, e.g. to eject a host that went
+    away from the load balancer.
+    """
+
+    def __init__(self, cursor, connection_failed=None):
+        super().__init__(cursor)
+        self.connection_failed = connection_failed
+
+    def execute(self, query, args=None):
+        try:
+            return super().execute(query, args)
+        except Database.OperationalError as e:
+            self._handle_error(e)
+            raise
+
+    def executemany(self, query, args):
+        try:
+            return super().executemany(query, args)
+        except Database.OperationalError as e:
+            self._handle_error(e)
+            raise
+
+    def _handle_error(self, error):
+        limit_error = execution_limit_error(error)
+        if limit_error is not None:
+            raise limit_error from error
+        if self.connection_failed is not None:
+            self.connection_failed(error)
 
 
 class DatabaseWrapper(MysqlDatabaseWrapper):
@@ -38,9 +107,168 @@ class DatabaseWrapper(MysqlDatabaseWrapper):
 
     SchemaEditorClass = DatabaseSchemaEditor
     # Classes instantiated in __init__().
+    client_class = DatabaseClient
     features_class = DatabaseFeatures
     introspection_class = DatabaseIntrospection
     ops_class = DatabaseOperations
+    # Connection pools shared by the connections of the process, by database.
+    _connection_pools = {}
+    # Load balancers shared by the connections of the process, by hosts.
+    _balancers = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # The pool the current connection was taken from. Settings might
+        # change before it's returned.
+        self._connection_pool = None
+        # Blocks of django_tidb.session that changed session variables of the
+        # current connection and haven't restored them yet.
+        self._session_changes = 0
+
+    @property
+    def pool(self):
+        pool_options = self.settings_dict["OPTIONS"].get("pool")
+        if self.alias == NO_DB_ALIAS or not pool_options:
+            return None
+        settings_dict = self.settings_dict
+        # The test runner changes NAME, don't reuse the connections of the
+        # previous database.
+        pool_key = (
+            self.alias,
+            settings_dict["HOST"],
+            settings_dict["PORT"],
+            settings_dict["USER"],
+            settings_dict["NAME"],
+        )
+        if pool_key not in self._connection_pools:
+            if settings_dict.get("CONN_MAX_AGE", 0) != 0:
+                raise ImproperlyConfigured(
+                    "Pooling doesn't support persistent connections."
+                )
+            if pool_options is True:
+                pool_options = {}
+            conn_params = self.get_connection_params()
+            balancer = self.balancer
+            try:
+                pool = ConnectionPool(
+                    lambda: self._connect(balancer, conn_params),
+                    connection_failed=balancer and balancer.connection_failed,
+                    **pool_options,
+                )
+            except ValueError as e:
+                raise ImproperlyConfigured("Invalid pool options: %s" % e)
+            # setdefault() ensures that threads creating a pool at the same
+            # time end up using the same one.
+            if self._connection_pools.setdefault(pool_key, pool) is not pool:
+                pool.close()
+        return self._connection_pools[pool_key]
+
+    def close_pool(self):
+        """Close the pool of this database, if connections are pooled."""
+        pool = self.pool
+        if pool:
+            pool.close()
+            for key, value in list(self._connection_pools.items()):
+                if value is pool:
+                    del self._connection_pools[key]
+
+    @property
+    def balancer(self):
+        """
+        The load balancer of the hosts, if HOST is a comma-separated list,
+        e.g. "tidb-0,tidb-1,tidb-2:4001".
+        """
+        settings_dict = self.settings_dict
+        hosts = settings_dict["HOST"]
+        if "," not in hosts:
+            return None
+        options = settings_dict["OPTIONS"].get("load_balancing") or {}
+        if isinstance(options, str):
+            options = {"strategy": options}
+        key = (self.alias, hosts, settings_dict["PORT"])
+        if key not in self._balancers:
+            port = int(settings_dict["PORT"]) if settings_dict["PORT"] else None
+            try:
+                balancer = HostBalancer(parse_hosts(hosts, port), **options)
+            except ValueError as e:
+                raise ImproperlyConfigured("Invalid load balancing options: %s" % e)
+            self._balancers.setdefault(key, balancer)
+        return self._balancers[key]
+
+    @staticmethod
+    def _connect(balancer, conn_params):
+        if balancer:
+            return balancer.connect(Database.connect, conn_params)
+        return Database.connect(**conn_params)
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        self._connection_pool = self.pool
+        if self._connection_pool:
+            return self._connection_pool.getconn()
+        return self._connect(self.balancer, conn_params)
+
+    def init_connection_state(self):
+        # The session variables of a reused pooled connection were already
+        # set when it was opened, with the same settings.
+        if self._connection_pool and self._connection_pool.is_reused(self.connection):
+            return
+        super().init_connection_state()
+
+    def _close(self):
+        session_changed, self._session_changes = self._session_changes > 0, 0
+        if self.connection is None or not self._connection_pool:
+            return super()._close()
+        pool, self._connection_pool = self._connection_pool, None
+        connection = self.connection
+        # Connection can no longer be used.
+        self.connection = None
+        # Don't hand out a connection with changed session variables, they
+        # aren't reset when it's reused.
+        discard = session_changed
+        if self.in_atomic_block or not self.autocommit:
+            # Don't hand out a connection in a transaction.
+            try:
+                connection.rollback()
+            except Database.Error:
+                discard = True
+        if self.errors_occurred and not discard:
+            try:
+                connection.ping()
+            except Database.Error:
+                discard = True
+        with self.wrap_database_errors:
+            pool.putconn(connection, discard=discard)
+
+    def close_if_health_check_failed(self):
+        if self._connection_pool:
+            # The pool checks the connections before handing them out.
+            return
+        return super().close_if_health_check_failed()
+
+    def replica_read(self, mode):
+        """
+        Return a context manager that sets tidb_replica_read to `mode` on this
+        connection and restores it on exit.
+        """
+        return replica_read(mode, using=self.alias)
+
+    @async_unsafe
+    def create_cursor(self, name=None):
+        cursor = self.connection.cursor()
+        balancer = self.balancer
+        if balancer is None:
+            return CursorWrapper(cursor)
+        connection = self.connection
+        return CursorWrapper(
+            cursor, lambda error: balancer.connection_failed(connection, error)
+        )
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        for option in TIDB_OPTIONS:
+            kwargs.pop(option, None)
+        return kwargs
 
     def get_database_version(self):
         return self.tidb_version
@@ -61,6 +289,36 @@ class DatabaseWrapper(MysqlDatabaseWrapper):
 
     @cached_property
     def tidb_server_data(self):
+        """
+        The server version and the variables the features depend on.
+
+        They are probed once per process and server, with a temporary
+        connection, unless they are all pinned in OPTIONS["server_data"].
+        """
+        pinned = self.settings_dict["OPTIONS"].get("server_data") or {}
+        if all(key in pinned for key in SERVER_DATA_KEYS):
+            return {key: pinned[key] for key in SERVER_DATA_KEYS}
+        settings_dict = self.settings_dict
+        cache_key = (
+            settings_dict["HOST"],
+            settings_dict["PORT"],
+            settings_dict["USER"],
+            settings_dict["NAME"],
+        )
+        with _server_data_cache_lock:
+            data = _server_data_cache.get(cache_key)
+        if data is None:
+            data = self._probe_server_data()
+            with _server_data_cache_lock:
+                _server_data_cache.setdefault(cache_key, data)
+        return {**data, **pinned}
+
+    @cached_property
+    def mysql_server_data(self):
+        # MySQL features read the same data, don't probe the server twice.
+        return self.tidb_server_data
+
+    def _probe_server_data(self):
         with self.temporary_connection() as cursor:
             # Select some server variables and test if the time zone
             # definitions are installed. CONVERT_TZ returns NULL if 'UTC'
@@ -91,6 +349,7 @@ class DatabaseWrapper(MysqlDatabaseWrapper):
 
     @cached_property
     def tidb_version(self):
+        server_version = TiDBVersion()
         match = server_version.match(self.tidb_server_info)
         if not match:
             raise Exception(
@@ -0,0 +1,51 @@
+# Copyright 2021 PingCAP, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import subprocess
+
+from django.db.backends.mysql.client import DatabaseClient as MysqlDatabaseClient
+
+from .balancer import parse_hosts
+
+
+def with_host(settings_dict, host):
+    """
+    Return a copy of `settings_dict` that connects to `host`, a (host, port)
+    tuple, instead of the hosts listed in HOST.
+    """
+    name, port = host
+    return {**settings_dict, "HOST": name, "PORT": "" if port is None else str(port)}
+
+
+class DatabaseClient(MysqlDatabaseClient):
+    @classmethod
+    def settings_to_cmd_args_env(cls, settings_dict, parameters):
+        # The mysql client connects to a single host, the first one of a
+        # balanced HOST.
+        if "," in settings_dict["HOST"]:
+            port = int(settings_dict["PORT"]) if settings_dict["PORT"] else None
+            hosts = parse_hosts(settings_dict["HOST"], port)
+            settings_dict = with_host(settings_dict, hosts[0])
+        return super().settings_to_cmd_args_env(settings_dict, parameters)
+
+    def runshell(self, parameters):
+        balancer = self.connection.balancer
+        if balancer is None:
+            return super().runshell(parameters)
+        args, env = self.settings_to_cmd_args_env(
+            with_host(self.connection.settings_dict, balancer.first_healthy()),
+            parameters,
+        )
+        env = {**os.environ, **env} if env else None
+        subprocess.run(args, env=env, check=True)
@@ -0,0 +1,266 @@
+# Copyright 2021 PingCAP, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from django.core.exceptions import FieldError
+from django.db.backends.mysql import compiler
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.sql.datastructures import BaseTable, Join
+
+from .limits import max_execution_time
+from .query import check_writable, deferred_by_default
+
+
+def statement_hints(query):
+    """
+    Return the optimizer hints of `query` that apply to the whole statement,
+    they're only valid in the outermost query block.
+    """
+    hints = []
+    replica_read = getattr(query, "tidb_replica_read", None)
+    if replica_read is not None:
+        hints.append("SET_VAR(tidb_replica_read='%s')" % replica_read)
+    if getattr(query, "tidb_mpp", False):
+        hints.append("SET_VAR(tidb_enforce_mpp=1)")
+    timeout = max_execution_time(getattr(query, "tidb_max_execution_time", None))
+    if timeout is not None:
+        hints.append("MAX_EXECUTION_TIME(%d)" % timeout)
+    memory_quota = getattr(query, "tidb_memory_quota", None)
+    if memory_quota is not None:
+        hints.append("MEMORY_QUOTA(%d MB)" % memory_quota)
+    return hints
+
+
+def add_hints(sql, hints):
+    """
+    Add the optimizer hints comment after the first keyword of `sql`, a
+    SELECT, UPDATE or DELETE statement.
+    """
+    if hints:
+        for keyword in ("SELECT ", "UPDATE ", "DELETE "):
+            if sql.startswith(keyword):
+                return "%s/*+ %s */ %s" % (
+                    keyword,
+                    " ".join(hints),
+                    sql.removeprefix(keyword),
+                )
+    return sql
+
+
+class SQLCompiler(compiler.SQLCompiler):
+    # The aliases of the tables in the FROM clause, set by get_from_clause().
+    _from_aliases = ()
+
+    def as_sql(self, with_limits=True, with_col_aliases=False):
+        sql, params = super().as_sql(
+            with_limits=with_limits, with_col_aliases=with_col_aliases
+        )
+        return add_hints(sql, self.get_hints()), params
+
+    def get_hints(self):
+        """Return the optimizer hints of this query block."""
+        hints = [] if self.query.subquery else statement_hints(self.query)
+        engine = getattr(self.query, "tidb_engine", None)
+        if engine is not None:
+            tables = self._hint_tables()
+            if tables:
+                hints.append("READ_FROM_STORAGE(%s[%s])" % (engine.upper(), tables))
+        for hint in getattr(self.query, "tidb_hints", ()):
+            if not (hint.is_statement_hint and self.query.subquery):
+                hints.append(hint.as_sql(self.query, self._from_aliases))
+        return hints
+
+    def get_write_hints(self):
+        """
+        Return the optimizer hints of an UPDATE or DELETE statement. Hints on
+        tables that the statement doesn't join are left out, Django moves the
+        joins of related filters to a subquery that gets them.
+        """
+        hints = []
+        memory_quota = getattr(self.query, "tidb_memory_quota", None)
+        if memory_quota is not None:
+            hints.append("MEMORY_QUOTA(%d MB)" % memory_quota)
+        aliases = self._from_aliases or [self.query.base_table]
+        for hint in getattr(self.query, "tidb_hints", ()):
+            # Invalid tables raise as in SELECT statements, the query keeps
+            # the aliases of the joins moved to the subquery.
+            sql = hint.as_sql(self.query, self.query.alias_map)
+            try:
+                hint.as_sql(self.query, aliases)
+            except FieldError:
+                continue
+            hints.append(sql)
+        return hints
+
+    def _hint_tables(self):
+        """Return the tables of this query block, as hints refer to them."""
+        return ", ".join(self._from_aliases)
+
+    def get_default_columns(
+        self, select_mask, start_alias=None, opts=None, from_parent=None
+    ):
+        columns = super().get_default_columns(
+            select_mask, start_alias=start_alias, opts=opts, from_parent=from_parent
+        )
+        if opts is None:
+            opts = self.query.get_meta()
+        if opts is None:
+            return columns
+        skipped = set(deferred_by_default(opts)) - self._undeferred_fields(
+            opts, self._relation_path(start_alias)
+        )
+        if not skipped:
+            return columns
+        # The model instances get these fields deferred, they are loaded on
+        # access.
+        return [
+            column
+            for column in columns
+            if getattr(column, "target", None) not in skipped
+        ]
+
+    def get_from_clause(self):
+        """
+        Add the suffixes of table_suffix() after the name and the alias of
+        each table.
+        """
+        result = []
+        params = []
+        # The reference counts of the aliases are reset once the query is
+        # compiled, the hints are resolved against the rendered tables.
+        self._from_aliases = []
+        for alias, from_clause in tuple(self.query.alias_map.items()):
+            if not self.query.alias_refcount[alias]:
+                continue
+            self._from_aliases.append(alias)
+            clause_sql, clause_params = self.compile(from_clause)
+            suffix_sql, suffix_params = self.table_suffix(from_clause)
+            if suffix_sql:
+                clause_sql, clause_params = self._add_table_suffix(
+                    from_clause, clause_sql, clause_params, suffix_sql, suffix_params
+                )
+            result.append(clause_sql)
+            params.extend(clause_params)
+        for t in self.query.extra_tables:
+            alias, _ = self.query.table_alias(t)
+            # Only add the alias if it's not already present (the table_alias()
+            # call increments the refcount, so an alias refcount of one means
+            # this is the only reference).
+            if (
+                alias not in self.query.alias_map
+                or self.query.alias_refcount[alias] == 1
+            ):
+                suffix_sql, suffix_params = self.table_suffix(None)
+                result.append(
+                    ", %s%s"
+                    % (
+                        self.quote_name_unless_alias(alias),
+                        " " + suffix_sql if suffix_sql else "",
+                    )
+                )
+                params.extend(suffix_params)
+        return result, params
+
+    def table_suffix(self, from_clause):
+        """
+        Return the SQL and the params that follow the table `from_clause` in
+        the FROM clause: `AS OF TIMESTAMP` for stale reads.
+        """
+        as_of = getattr(self.query, "tidb_as_of", None)
+        if as_of is None:
+            return "", []
+        as_of = as_of.resolve_expression(self.query, allow_joins=False)
+        sql, params = self.compile(as_of)
+        return "AS OF TIMESTAMP %s" % sql, list(params)
+
+    def _add_table_suffix(self, from_clause, sql, params, suffix_sql, suffix_params):
+        if isinstance(from_clause, (BaseTable, Join)):
+            head = self.quote_name_unless_alias(from_clause.table_name)
+            if from_clause.table_alias != from_clause.table_name:
+                head += " %s" % from_clause.table_alias
+            if isinstance(from_clause, Join):
+                head = "%s %s" % (from_clause.join_type, head)
+            if sql.startswith(head):
+                # The params of a join are the ones of its ON clause.
+                return (
+                    "%s %s%s" % (head, suffix_sql, sql.removeprefix(head)),
+                    [*suffix_params, *params],
+                )
+        return sql, params
+
+    def _relation_path(self, alias):
+        """
+        Return the names of the relations followed from the base table to
+        `alias`, as in the lookups of select_related() and only().
+        """
+        path = []
+        join = self.query.alias_map.get(alias)
+        while isinstance(join, Join):
+            field = join.join_field
+            # Parents of multi-table inheritance aren't part of lookups.
+            if not (
+                getattr(field, "parent_link", False)
+                or getattr(field.remote_field, "parent_link", False)
+            ):
+                path.append(field.name)
+            join = self.query.alias_map.get(join.parent_alias)
+        return path[::-1]
+
+    def _undeferred_fields(self, opts, path=()):
+        """
+        Return the deferred-by-default fields of `opts`, reached through the
+        relations of `path`, that this query selects: through undefer() or
+        explicitly named in only().
+        """
+        undeferred = getattr(self.query, "tidb_undeferred", None)
+        if undeferred is True:
+            return set(opts.concrete_fields)
+        names = set(undeferred or ())
+        field_names, defer = self.query.deferred_loading
+        if not defer:
+            names.update(field_names)
+        path = list(path)
+        names = {
+            parts[-1]
+            for parts in (name.split(LOOKUP_SEP) for name in names)
+            if parts[:-1] == path
+        }
+        return {
+            field
+            for field in opts.concrete_fields
+            if field.name in names or field.attname in names
+        }
+
+
+class SQLInsertCompiler(compiler.SQLInsertCompiler, SQLCompiler):
+    pass
+
+
+class SQLDeleteCompiler(compiler.SQLDeleteCompiler, SQLCompiler):
+    def as_sql(self):
+        check_writable(self.query)
+        sql, params = super().as_sql()
+        return add_hints(sql, self.get_write_hints()), params
+
+
+class SQLUpdateCompiler(compiler.SQLUpdateCompiler, SQLCompiler):
+    def as_sql(self):
+        check_writable(self.query)
+        sql, params = super().as_sql()
+        return add_hints(sql, self.get_write_hints()), params
+
+
+class SQLAggregateCompiler(compiler.SQLAggregateCompiler, SQLCompiler):
+    def as_sql(self):
+        sql, params = super().as_sql()
+        # The statement is built around the inner query, which has the hints.
+        return add_hints(sql, statement_hints(self.query.inner_query)), params
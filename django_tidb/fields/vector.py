@@ -1,42 +1,481 @@
+import base64
+import copy
+import datetime
+import operator
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import warnings
+import zipfile
+from collections import OrderedDict, namedtuple
+
 import numpy as np
+from numpy.lib.mixins import NDArrayOperatorsMixin
+from django.conf import settings
 from django.core import checks
+from django.core.exceptions import ImproperlyConfigured, ValidationError
 from django import forms
-from django.db import models
-from django.db.models import Field, FloatField, Func, Value, Index
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, models, transaction
+from django.db.models import F, Field, FloatField, Func, Index, Lookup, Value
+from django.db.models.fields import AutoFieldMixin
+from django.db.models.sql.constants import GET_ITERATOR_CHUNK_SIZE, MULTI
+from django.utils.translation import gettext_lazy as _
+
+from django_tidb.query import TiDBQuerySet
 
 MAX_DIM_LENGTH = 16000
 MIN_DIM_LENGTH = 1
+# "text" is the decimal vector literal understood by TiDB, "base64" is the
+# base64 of the little-endian float32 values, which is about 3-4x smaller and
+# faster to load.
+SERIALIZATION_FORMATS = ("text", "base64")
 
+# How the column is loaded: with the rest of the row, or on access.
+LOAD_MODES = ("eager", "deferred")
 
-def encode_vector(value, dim=None):
-    if value is None:
-        return value
 
+# Every element is rendered as the shortest decimal that parses back to the
+# same float32 value, like TiDB itself prints vectors, e.g. "0.1", "-2" or
+# "1.25e-7". Nine significant digits always round-trip. The digits are computed
+# for the whole vector with array operations, then the characters of each
+# element are picked from a small per-element table by a precomputed layout,
+# so that no Python string is built per element.
+_MANTISSA_DIGITS = 9
+# 10**8, 10**7, ..., 1: the weight of each digit of a nine digit mantissa.
+_DIGIT_WEIGHTS = 10.0 ** np.arange(_MANTISSA_DIGITS - 1, -1, -1)
+_POWERS_OF_TEN = 10.0 ** np.arange(-64, 64)
+# The decimal exponents of the finite, nonzero float32 values.
+_MIN_EXPONENT, _MAX_EXPONENT = -45, 38
+# Columns of the per-element table: the sign, "0", ".", the nine digits, "e",
+# the sign of the exponent and its two digits.
+_SIGN, _ZERO, _POINT, _DIGITS, _E, _MINUS, _TENS, _ONES = 0, 1, 2, 3, 12, 13, 14, 15
+_ELEMENT_WIDTH = 16
+
+
+def _element_layout(size, exponent):
+    """
+    Return the table columns of an element with `size` significant digits and
+    a decimal `exponent`, padded to _ELEMENT_WIDTH, and their number. The
+    positional notation is used unless the scientific one is shorter.
+    """
+    digits = list(range(_DIGITS, _DIGITS + size))
+    if exponent >= size - 1:
+        positional = digits + [_ZERO] * (exponent - size + 1)
+    elif exponent >= 0:
+        positional = digits[:]
+        positional.insert(exponent + 1, _POINT)
+    else:
+        positional = [_ZERO, _POINT] + [_ZERO] * (-exponent - 1) + digits
+    scientific = digits[:1] + ([_POINT] + digits[1:] if size > 1 else []) + [_E]
+    if exponent < 0:
+        scientific.append(_MINUS)
+    if abs(exponent) >= 10:
+        scientific.append(_TENS)
+    scientific.append(_ONES)
+    layout = positional if len(positional) <= len(scientific) else scientific
+    return [_SIGN] + layout + [_SIGN] * (_ELEMENT_WIDTH - 1 - len(layout)), len(layout)
+
+
+_LAYOUTS, _LENGTHS = zip(
+    *(
+        _element_layout(size, exponent)
+        for size in range(1, _MANTISSA_DIGITS + 1)
+        for exponent in range(_MIN_EXPONENT, _MAX_EXPONENT + 1)
+    )
+)
+_LAYOUTS = np.array(_LAYOUTS, dtype=np.uint8)
+# The characters kept of each layout: the sign is set per element, and the
+# last column is the separator.
+_KEPT = np.arange(_ELEMENT_WIDTH + 1) <= np.array(_LENGTHS)[:, None]
+_KEPT[:, -1] = True
+
+
+def _as_float_vector(value):
     if isinstance(value, np.ndarray):
         if value.ndim != 1:
             raise ValueError("expected ndim to be 1")
 
-        if not np.issubdtype(value.dtype, np.integer) and not np.issubdtype(
-            value.dtype, np.floating
-        ):
+        if value.dtype.kind not in "iuf" and value.dtype.name != "bfloat16":
             raise ValueError("dtype must be numeric")
 
-        value = value.tolist()
+    value = np.asarray(value, dtype=np.float32)
+    if value.ndim != 1:
+        raise ValueError("expected ndim to be 1")
+    return value
+
+
+def _format_vector(value):
+    """
+    Format a 1-D float32 array as a TiDB vector literal.
+    """
+    if not value.size:
+        return "[]"
+    if not np.isfinite(value).all():
+        raise ValueError("vector must not contain NaN or infinity")
+
+    value = value.astype(np.float32, copy=False)
+    count = value.shape[0]
+    absolute = np.abs(value)
+    magnitude = absolute.astype(np.float64)
+    nonzero = magnitude != 0
+    # A decimal closer to the value than half the gap to its float32
+    # neighbours parses back to it. The gap below is the smaller one at
+    # powers of two, and the margin covers the float64 rounding errors.
+    with np.errstate(over="ignore"):
+        gap = np.minimum(
+            magnitude - np.nextafter(absolute, np.float32(0)),
+            np.spacing(absolute).astype(np.float64),
+        )
+    with np.errstate(divide="ignore"):
+        exponent = np.floor(np.log10(magnitude))
+    exponent[~nonzero] = 0
+    exponent = exponent.astype(np.intp)
+    # log10 may be off by one around exact powers of ten.
+    exponent += magnitude >= _POWERS_OF_TEN[exponent + 65]
+    exponent -= nonzero & (magnitude < _POWERS_OF_TEN[exponent + 64])
+
+    # Scale the values into [10**8, 10**9) and round them to 1 to 9
+    # significant digits, keeping the fewest that round-trip.
+    scale = _POWERS_OF_TEN[64 + _MANTISSA_DIGITS - 1 - exponent]
+    mantissa = magnitude * scale
+    tolerance = gap * scale * (0.5 * (1 - 1e-6))
+    candidates = np.rint(mantissa[:, None] / _DIGIT_WEIGHTS) * _DIGIT_WEIGHTS
+    fits = np.abs(candidates - mantissa[:, None]) <= tolerance[:, None]
+    fits[:, -1] = True
+    size = np.argmax(fits, axis=1)
+    mantissa = candidates[np.arange(count), size]
+    size += 1
+    # Rounding up may add a digit, e.g. 9.96 to 10.
+    carry = mantissa >= 10.0**_MANTISSA_DIGITS
+    mantissa[carry] /= 10
+    exponent[carry] += 1
+
+    table = np.empty((count, _ELEMENT_WIDTH), dtype=np.uint8)
+    table[:, _SIGN] = ord("-")
+    table[:, _ZERO] = ord("0")
+    table[:, _POINT] = ord(".")
+    quotients = np.floor(mantissa[:, None] / _DIGIT_WEIGHTS)
+    table[:, _DIGITS:_E] = quotients - 10 * np.floor(quotients / 10) + ord("0")
+    table[:, _E] = ord("e")
+    table[:, _MINUS] = ord("-")
+    exponent_magnitude = np.abs(exponent)
+    table[:, _TENS] = exponent_magnitude // 10 + ord("0")
+    table[:, _ONES] = exponent_magnitude % 10 + ord("0")
+
+    layout = (size - 1) * (_MAX_EXPONENT - _MIN_EXPONENT + 1) + exponent - _MIN_EXPONENT
+    out = np.empty((count, _ELEMENT_WIDTH + 1), dtype=np.uint8)
+    out[:, :-1] = table.ravel()[
+        _LAYOUTS[layout] + np.arange(0, count * _ELEMENT_WIDTH, _ELEMENT_WIDTH)[:, None]
+    ]
+    out[:, -1] = ord(",")
+    kept = _KEPT[layout]
+    kept[:, _SIGN] = np.signbit(value)
+    return "[" + out[kept][:-1].tobytes().decode("ascii") + "]"
+
+
+def _parse_vector(value):
+    """
+    Parse comma separated vector elements into a flat float32 array without
+    creating a Python object per element.
+    """
+    if not value:
+        return np.empty(0, dtype=np.float32)
+    return np.fromstring(value, dtype=np.float32, sep=",")
+
+
+def _parse_vectors(values, dim):
+    """
+    Parse a sequence of vector literals into a (len(values), dim) float32
+    array with a single parser call.
+    """
+    values = [
+        value.decode("utf-8") if isinstance(value, bytes) else value for value in values
+    ]
+    parsed = _parse_vector(",".join([value.strip()[1:-1] for value in values]))
+    if parsed.size != len(values) * dim:
+        raise ValueError("expected every vector to have %d dimensions" % dim)
+    return parsed.reshape(len(values), dim)
+
+
+def encode_vector(value, dim=None):
+    if value is None:
+        return value
+
+    value = _as_float_vector(value)
 
     if dim is not None and len(value) != dim:
         raise ValueError("expected %d dimensions, not %d" % (dim, len(value)))
 
-    return "[" + ",".join([str(float(v)) for v in value]) + "]"
+    return _format_vector(value)
+
+
+VectorLiteralCacheInfo = namedtuple(
+    "VectorLiteralCacheInfo", "hits misses maxsize currsize"
+)
 
 
-def decode_vector(value):
-    if value is None or isinstance(value, np.ndarray):
+class VectorLiteralCache:
+    """
+    A thread-safe, bounded LRU cache of encoded vector literals, keyed by the
+    dtype and raw bytes of the vector. Distance functions use it, so that hot
+    query vectors are not formatted again on every query.
+
+    The size limit can be changed at runtime with the `maxsize` attribute,
+    `0` disables caching.
+    """
+
+    def __init__(self, maxsize=256):
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._maxsize = maxsize
+        self.hits = self.misses = 0
+
+    @property
+    def maxsize(self):
+        return self._maxsize
+
+    @maxsize.setter
+    def maxsize(self, value):
+        if value < 0:
+            raise ValueError("maxsize must be a non-negative integer")
+        with self._lock:
+            self._maxsize = value
+            while len(self._cache) > value:
+                self._cache.popitem(last=False)
+
+    def encode(self, value):
+        array = np.asarray(value)
+        if array.ndim != 1 or array.dtype.kind not in "iuf":
+            # Let encode_vector() report the error.
+            return encode_vector(value)
+        key = (array.dtype.str, array.tobytes())
+        with self._lock:
+            literal = self._cache.get(key)
+            if literal is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return literal
+            self.misses += 1
+        literal = encode_vector(array)
+        with self._lock:
+            if self._maxsize:
+                self._cache[key] = literal
+                while len(self._cache) > self._maxsize:
+                    self._cache.popitem(last=False)
+        return literal
+
+    def cache_info(self):
+        with self._lock:
+            return VectorLiteralCacheInfo(
+                self.hits, self.misses, self._maxsize, len(self._cache)
+            )
+
+    def cache_clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.hits = self.misses = 0
+
+
+vector_literal_cache = VectorLiteralCache()
+
+
+def encode_vector_base64(value, dim=None):
+    """
+    Encode a vector in the compact serialization format: base64 of the
+    little-endian float32 values.
+    """
+    if value is None:
         return value
 
-    if isinstance(value, bytes):
-        value = value.decode("utf-8")
+    value = _as_float_vector(value)
+
+    if dim is not None and len(value) != dim:
+        raise ValueError("expected %d dimensions, not %d" % (dim, len(value)))
+
+    return base64.b64encode(value.astype("<f4").tobytes()).decode("ascii")
+
+
+base64_re = re.compile(r"^[A-Za-z0-9+/]+={0,2}$")
+
+INVALID_VECTOR_MESSAGE = (
+    "Invalid vector, expected a list of numbers such as [1,2,3], or the base64 "
+    "of its float32 values."
+)
+
+
+def decode_vector_base64(value):
+    return np.frombuffer(base64.b64decode(value, validate=True), dtype="<f4").astype(
+        np.float32
+    )
+
+
+def decode_vector(value, dtype=np.float32):
+    """
+    Decode a vector from its text form, e.g. "[1,2,3]", or from the compact
+    base64 form produced by encode_vector_base64(), into an array of `dtype`.
+    Raise ValueError if `value` is in neither form.
+    """
+    if value is None:
+        return value
+
+    if isinstance(value, (np.ndarray, LazyVector)):
+        return np.asarray(value).astype(dtype, copy=False)
+
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        value = bytes(value).decode("utf-8")
+
+    value = value.strip()
+    if value.startswith("[") and value.endswith("]"):
+        elements = value[1:-1].strip()
+        try:
+            array = _parse_vector(elements)
+        except ValueError:
+            array = None
+        # The parser stops at a trailing comma instead of failing.
+        if array is None or array.size != (elements.count(",") + 1 if elements else 0):
+            raise ValueError(INVALID_VECTOR_MESSAGE)
+    elif base64_re.match(value):
+        try:
+            array = decode_vector_base64(value)
+        except ValueError:
+            raise ValueError(INVALID_VECTOR_MESSAGE)
+    else:
+        raise ValueError(INVALID_VECTOR_MESSAGE)
+    return array.astype(dtype, copy=False)
+
+
+class LazyVector(NDArrayOperatorsMixin):
+    """
+    Vector loaded from the database, decoded into an array of `dtype` on
+    first access.
+
+    Returned by VectorField(lazy=True), so that listing rows doesn't pay for
+    decoding vectors that are never used. It behaves like the decoded array:
+    NumPy functions, ufuncs, operators, indexing and the buffer protocol all
+    work on it, and other attributes are looked up on the array. The array
+    is decoded once and then shared, no copy is made. Saving an instance
+    whose vector was never accessed writes the raw value back unchanged.
+    """
+
+    __slots__ = ("_raw", "_dtype", "_array")
+
+    def __init__(self, raw, dtype=np.float32):
+        if isinstance(raw, (bytearray, memoryview)):
+            # The driver may reuse its buffer, keep a copy. It is only
+            # decoded to text on first access.
+            raw = bytes(raw)
+        self._raw = raw
+        self._dtype = np.dtype(dtype)
+        self._array = None
+
+    @property
+    def array(self):
+        """The decoded array."""
+        if self._array is None:
+            self._array = decode_vector(self._raw, self._dtype)
+        return self._array
+
+    @property
+    def is_decoded(self):
+        return self._array is not None
+
+    @property
+    def raw(self):
+        """The value as returned by the database."""
+        return self._raw
+
+    @property
+    def is_literal(self):
+        """Whether the raw value is a vector literal, e.g. "[1,2,3]"."""
+        raw = self._raw
+        if isinstance(raw, bytes):
+            return raw.lstrip().startswith(b"[")
+        return isinstance(raw, str) and raw.lstrip().startswith("[")
+
+    @property
+    def dtype(self):
+        return self._dtype
+
+    @property
+    def shape(self):
+        return (len(self),)
+
+    def __len__(self):
+        if self._array is None and self.is_literal:
+            # Count the elements without decoding them.
+            raw = self._raw
+            if isinstance(raw, bytes):
+                return raw.count(b",") + 1 if raw.strip(b"[ ]") else 0
+            return raw.count(",") + 1 if raw.strip("[ ]") else 0
+        return len(self.array)
+
+    def __getattr__(self, name):
+        if name.startswith("__") or name in self.__slots__:
+            raise AttributeError(name)
+        return getattr(self.array, name)
+
+    def __array__(self, dtype=None, copy=None):
+        if copy:
+            return np.array(self.array, dtype=dtype, copy=True)
+        if dtype is None:
+            return self.array
+        return self.array.astype(dtype, copy=False)
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        inputs = [x.array if isinstance(x, LazyVector) else x for x in inputs]
+        if "out" in kwargs:
+            kwargs["out"] = tuple(
+                x.array if isinstance(x, LazyVector) else x for x in kwargs["out"]
+            )
+        return getattr(ufunc, method)(*inputs, **kwargs)
+
+    def __buffer__(self, flags):
+        return memoryview(self.array)
+
+    def __getitem__(self, key):
+        return self.array[key]
+
+    def __setitem__(self, key, value):
+        self.array[key] = value
+
+    def __iter__(self):
+        return iter(self.array)
+
+    def __bool__(self):
+        return bool(self.array)
+
+    def __reduce__(self):
+        if self._array is None:
+            return (LazyVector, (self._raw, self._dtype))
+        return (_decoded_lazy_vector, (self._array,))
+
+    def __repr__(self):
+        return "LazyVector(%r)" % (self.array,)
 
-    return np.array(value[1:-1].split(","), dtype=np.float32)
+
+def _decoded_lazy_vector(array):
+    vector = LazyVector(None, array.dtype)
+    vector._array = array
+    return vector
+
+
+def resolve_vector_dtype(dtype):
+    """
+    Return the NumPy dtype for the in-memory representation of vectors.
+    "bfloat16" is provided by the optional ml_dtypes package.
+    """
+    if isinstance(dtype, str) and dtype == "bfloat16":
+        try:
+            import ml_dtypes
+        except ImportError:
+            raise ImproperlyConfigured(
+                "The bfloat16 vector dtype requires the ml_dtypes package."
+            )
+        return np.dtype(ml_dtypes.bfloat16)
+    return np.dtype(dtype)
 
 
 class VectorField(Field):
@@ -72,14 +511,48 @@ class VectorField(Field):
     description = "Vector"
     empty_strings_allowed = False
 
-    def __init__(self, *args, dimensions=None, **kwargs):
+    default_error_messages = {
+        "dtype_overflow": _("Vector values are out of range for %(dtype)s."),
+        "invalid_shape": _("Expected a vector with 1 dimension, not %(ndim)s."),
+        "invalid_dtype": _("Vector values must be numbers, not %(dtype)s."),
+        "dimensions": _(
+            "Expected a vector with %(dimensions)s dimensions, not %(length)s."
+        ),
+        "not_finite": _("Vector values must be finite numbers."),
+    }
+
+    def __init__(
+        self,
+        *args,
+        dimensions=None,
+        serialization="text",
+        dtype=np.float32,
+        lazy=False,
+        load="eager",
+        **kwargs,
+    ):
         self.dimensions = dimensions
+        self.serialization = serialization
+        # Load values as LazyVector, decoded on first access.
+        self.lazy = lazy
+        # "deferred" leaves the column out of the default SELECT list.
+        self.load = load
+        # The in-memory representation. TiDB always stores float32 values.
+        self.dtype = resolve_vector_dtype(dtype)
         super().__init__(*args, **kwargs)
 
     def deconstruct(self):
         name, path, args, kwargs = super().deconstruct()
         if self.dimensions is not None:
             kwargs["dimensions"] = self.dimensions
+        if self.serialization != "text":
+            kwargs["serialization"] = self.serialization
+        if self.dtype != np.float32:
+            kwargs["dtype"] = self.dtype.name
+        if self.lazy:
+            kwargs["lazy"] = True
+        if self.load != "eager":
+            kwargs["load"] = self.load
         return name, path, args, kwargs
 
     def db_type(self, connection):
@@ -88,28 +561,105 @@ class VectorField(Field):
         return "vector(%d)" % self.dimensions
 
     def from_db_value(self, value, expression, connection):
-        return decode_vector(value)
+        if self.lazy and value is not None:
+            return LazyVector(value, self.dtype)
+        return decode_vector(value, self.dtype)
 
     def to_python(self, value):
-        if isinstance(value, list):
-            return np.array(value, dtype=np.float32)
-        return decode_vector(value)
+        if isinstance(value, LazyVector):
+            return value
+        # Values out of range for the dtype become infinite, they are
+        # reported by validate().
+        with np.errstate(over="ignore"):
+            if isinstance(value, list):
+                return np.array(value, dtype=self.dtype)
+            return decode_vector(value, self.dtype)
 
     def get_prep_value(self, value):
+        if isinstance(value, LazyVector) and not value.is_decoded and value.is_literal:
+            # Untouched since it was loaded, write back the database's text.
+            raw = value.raw
+            return raw.decode("utf-8") if isinstance(raw, bytes) else raw
         return encode_vector(value)
 
     def value_to_string(self, obj):
-        return self.get_prep_value(self.value_from_object(obj))
+        value = self.value_from_object(obj)
+        if self.serialization == "base64":
+            return encode_vector_base64(value)
+        return self.get_prep_value(value)
 
     def validate(self, value, model_instance):
-        if isinstance(value, np.ndarray):
-            value = value.tolist()
-        super().validate(value, model_instance)
+        if not self.editable:
+            return
+        if isinstance(value, (np.ndarray, LazyVector)) and not self.choices:
+            # Checked on the array, instead of the list that the base
+            # implementation would need for its emptiness checks.
+            array = np.asarray(value)
+            if not self.blank and array.size == 0:
+                raise ValidationError(self.error_messages["blank"], code="blank")
+        else:
+            if isinstance(value, (np.ndarray, LazyVector)):
+                value = value.tolist()
+            super().validate(value, model_instance)
+            if value is None:
+                return
+            array = np.asarray(value)
+        self._validate_array(array)
+
+    def _validate_array(self, array):
+        if array.ndim != 1:
+            raise ValidationError(
+                self.error_messages["invalid_shape"],
+                code="invalid_shape",
+                params={"ndim": array.ndim},
+            )
+        if array.dtype.kind not in "iuf" and array.dtype.name != "bfloat16":
+            raise ValidationError(
+                self.error_messages["invalid_dtype"],
+                code="invalid_dtype",
+                params={"dtype": array.dtype.name},
+            )
+        if self.dimensions is not None and array.shape[0] != self.dimensions:
+            raise ValidationError(
+                self.error_messages["dimensions"],
+                code="dimensions",
+                params={"dimensions": self.dimensions, "length": array.shape[0]},
+            )
+        if array.dtype.kind == "f" and np.isnan(array).any():
+            raise ValidationError(self.error_messages["not_finite"], code="not_finite")
+        # Values out of range for float32, or for the in-memory dtype,
+        # become infinite.
+        with np.errstate(over="ignore"):
+            finite = np.isfinite(array.astype(self.dtype, copy=False)).all() and (
+                self.dtype.itemsize <= 4
+                or np.isfinite(array.astype(np.float32, copy=False)).all()
+            )
+        if not finite:
+            if self.dtype == np.float32:
+                raise ValidationError(
+                    self.error_messages["not_finite"], code="not_finite"
+                )
+            raise ValidationError(
+                self.error_messages["dtype_overflow"],
+                code="dtype_overflow",
+                params={"dtype": self.dtype.name},
+            )
 
     def run_validators(self, value):
-        if isinstance(value, np.ndarray):
-            value = value.tolist()
-        super().run_validators(value)
+        if not isinstance(value, (np.ndarray, LazyVector)):
+            return super().run_validators(value)
+        if not self.validators or len(value) == 0:
+            return
+        errors = []
+        for validator in self.validators:
+            try:
+                validator(value)
+            except ValidationError as e:
+                if hasattr(e, "code") and e.code in self.error_messages:
+                    e.message = self.error_messages[e.code]
+                errors.extend(e.error_list)
+        if errors:
+            raise ValidationError(errors)
 
     def formfield(self, **kwargs):
         return super().formfield(form_class=VectorFormField, **kwargs)
@@ -118,8 +668,43 @@ class VectorField(Field):
         return [
             *super().check(**kwargs),
             *self._check_dimensions(),
+            *self._check_serialization(),
+            *self._check_dtype(),
+            *self._check_load(),
         ]
 
+    def _check_load(self):
+        if self.load not in LOAD_MODES:
+            return [
+                checks.Error(
+                    "Vector load must be one of: %s" % ", ".join(LOAD_MODES),
+                    obj=self,
+                )
+            ]
+        return []
+
+    def _check_dtype(self):
+        if self.dtype.kind != "f" and self.dtype.name != "bfloat16":
+            return [
+                checks.Error(
+                    "Vector dtype must be a floating point type, not %s."
+                    % self.dtype.name,
+                    obj=self,
+                )
+            ]
+        return []
+
+    def _check_serialization(self):
+        if self.serialization not in SERIALIZATION_FORMATS:
+            return [
+                checks.Error(
+                    "Vector serialization must be one of: %s"
+                    % ", ".join(SERIALIZATION_FORMATS),
+                    obj=self,
+                )
+            ]
+        return []
+
     def _check_dimensions(self):
         if self.dimensions is not None and (
             self.dimensions < MIN_DIM_LENGTH or self.dimensions > MAX_DIM_LENGTH
@@ -133,6 +718,12 @@ class VectorField(Field):
         return []
 
 
+VectorIndexProgress = namedtuple(
+    "VectorIndexProgress",
+    "replica_available replica_progress rows_indexed rows_not_indexed ready",
+)
+
+
 class VectorIndex(Index):
     """
     Example:
@@ -161,18 +752,38 @@ class VectorIndex(Index):
     ```
 
     Note:
-    Creating a vector index will automatically set the "TiFlash replica" to 1 in TiDB.
-    If you want to use high-availability columnar storage feature, use raw SQL instead.
+    Vector indexes are built on TiFlash replicas. By default, creating a vector
+    index sets the TiFlash replica count of the table to `tiflash_replica`
+    (1 unless specified). Pass `tiflash_replica=None` to manage replicas
+    yourself, or `add_columnar_replica_on_demand=True` to let TiDB add a
+    replica only if the table has none.
 
+    Index creation returns before the replica is synced and the index is
+    built. Use `wait_until_ready()` or the `tidb_wait_vector_indexes`
+    management command to block until the index can serve queries.
     """
 
     def __init__(
         self,
         *expressions,
         name,
+        tiflash_replica=1,
+        add_columnar_replica_on_demand=False,
     ) -> None:
+        if tiflash_replica is not None and tiflash_replica < 1:
+            raise ValueError("VectorIndex.tiflash_replica must be a positive integer.")
+        self.tiflash_replica = tiflash_replica
+        self.add_columnar_replica_on_demand = add_columnar_replica_on_demand
         super().__init__(*expressions, fields=(), name=name)
 
+    def deconstruct(self):
+        path, args, kwargs = super().deconstruct()
+        if self.tiflash_replica != 1:
+            kwargs["tiflash_replica"] = self.tiflash_replica
+        if self.add_columnar_replica_on_demand:
+            kwargs["add_columnar_replica_on_demand"] = True
+        return path, args, kwargs
+
     def create_sql(self, model, schema_editor, using="", **kwargs):
         include = [
             model._meta.get_field(field_name).column for field_name in self.include
@@ -189,10 +800,16 @@ class VectorIndex(Index):
         )
         fields = None
         col_suffixes = None
-        # TODO: remove the tiflash replica setting statement from sql_template
-        #       after we support `ADD_TIFLASH_ON_DEMAND` in the `CREATE VECTOR INDEX ...`
-        sql_template = """ALTER TABLE %(table)s SET TIFLASH REPLICA 1;
-        CREATE VECTOR INDEX %(name)s ON %(table)s%(using)s (%(columns)s)%(extra)s"""
+        sql_template = (
+            "CREATE VECTOR INDEX %(name)s ON %(table)s%(using)s (%(columns)s)%(extra)s"
+        )
+        if self.add_columnar_replica_on_demand:
+            sql_template += " ADD_COLUMNAR_REPLICA_ON_DEMAND"
+        elif self.tiflash_replica is not None:
+            sql_template = (
+                "ALTER TABLE %%(table)s SET TIFLASH REPLICA %d;\n        %s"
+                % (self.tiflash_replica, sql_template)
+            )
         return schema_editor._create_index_sql(
             model,
             fields=fields,
@@ -208,6 +825,80 @@ class VectorIndex(Index):
             **kwargs,
         )
 
+    def get_build_progress(self, model, using=DEFAULT_DB_ALIAS):
+        """
+        Return the VectorIndexProgress of the TiFlash replica of the model's
+        table and of the index build.
+        """
+        table = model._meta.db_table
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT available, progress
+                FROM information_schema.tiflash_replica
+                WHERE table_schema = DATABASE() AND table_name = %s
+                """,
+                [table],
+            )
+            row = cursor.fetchone()
+            replica_available, replica_progress = (
+                (bool(row[0]), float(row[1] or 0)) if row else (False, 0.0)
+            )
+            cursor.execute(
+                """
+                SELECT
+                    COALESCE(SUM(rows_stable_indexed), 0),
+                    COALESCE(SUM(rows_stable_not_indexed), 0),
+                    COUNT(*),
+                    MAX(error_message)
+                FROM information_schema.tiflash_indexes
+                WHERE tidb_database = DATABASE()
+                AND tidb_table = %s
+                AND index_name = %s
+                """,
+                [table, self.name],
+            )
+            rows_indexed, rows_not_indexed, replicas, error = cursor.fetchone()
+        if error:
+            raise DatabaseError(
+                "Failed to build vector index %r on %s: %s" % (self.name, table, error)
+            )
+        return VectorIndexProgress(
+            replica_available=replica_available,
+            replica_progress=replica_progress,
+            rows_indexed=int(rows_indexed),
+            rows_not_indexed=int(rows_not_indexed),
+            ready=replica_available and bool(replicas) and not rows_not_indexed,
+        )
+
+    def wait_until_ready(
+        self, model, using=DEFAULT_DB_ALIAS, timeout=None, interval=5, progress=None
+    ):
+        """
+        Block until the TiFlash replica of the model's table is available and
+        the index is built, polling every `interval` seconds. `progress` is
+        called with a VectorIndexProgress after every poll. Raise TimeoutError
+        if the index isn't ready after `timeout` seconds.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            state = self.get_build_progress(model, using=using)
+            if progress is not None:
+                progress(state)
+            if state.ready:
+                return state
+            delay = interval
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(
+                        "Vector index %r on %s is not ready after %s seconds."
+                        % (self.name, model._meta.db_table, timeout)
+                    )
+                # Poll a last time at the deadline.
+                delay = min(interval, remaining)
+            time.sleep(delay)
+
 
 class DistanceBase(Func):
     output_field = FloatField()
@@ -218,34 +909,1033 @@ class DistanceBase(Func):
         vector: a vector to compare against
         """
         expressions = [expression]
+        # Keep the literal query vector around, so results can be reranked
+        # on the client side with `compute`.
+        self.vector = None
         # When using the distance function as expression in the vector index
         # statement, the `vector` is None
         if vector is not None:
             if not hasattr(vector, "resolve_expression"):
-                vector = Value(encode_vector(vector))
+                self.vector = vector
+                vector = Value(vector_literal_cache.encode(vector))
             expressions.append(vector)
         super().__init__(*expressions, **extra)
 
+    @staticmethod
+    def compute(vectors, vector):
+        """
+        Compute the exact distances between each row of the 2-D `vectors`
+        array and `vector` with NumPy.
+        """
+        raise NotImplementedError(
+            "subclasses of DistanceBase must provide a compute() method"
+        )
+
 
 class L1Distance(DistanceBase):
     function = "VEC_L1_DISTANCE"
 
+    @staticmethod
+    def compute(vectors, vector):
+        return np.abs(vectors - vector).sum(axis=1)
+
 
 class L2Distance(DistanceBase):
     function = "VEC_L2_DISTANCE"
 
+    @staticmethod
+    def compute(vectors, vector):
+        return np.sqrt(np.square(vectors - vector).sum(axis=1))
+
 
 class CosineDistance(DistanceBase):
     function = "VEC_COSINE_DISTANCE"
 
+    @staticmethod
+    def compute(vectors, vector):
+        norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(vector)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return 1 - (vectors @ vector) / norms
+
 
 class NegativeInnerProduct(DistanceBase):
     function = "VEC_NEGATIVE_INNER_PRODUCT"
 
+    @staticmethod
+    def compute(vectors, vector):
+        return -(vectors @ vector)
+
+
+class FullTextMatch(Lookup):
+    """
+    `FTS_MATCH_WORD(text, column)` condition, served by a full-text index of
+    the column (TiDB Cloud).
+
+    Example:
+    ```python
+    Document.objects.filter(FullTextMatch(F("content"), "vector database"))
+    ```
+    """
+
+    lookup_name = "fts_match_word"
+    prepare_rhs = False
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return "FTS_MATCH_WORD(%s, %s)" % (rhs, lhs), (*rhs_params, *lhs_params)
+
+
+class FullTextScore(Func):
+    """
+    BM25 relevance of `expression` to `text`, as computed by FTS_MATCH_WORD.
+    Higher is more relevant.
+    """
+
+    function = "FTS_MATCH_WORD"
+    output_field = FloatField()
+
+    def __init__(self, expression, text, **extra):
+        super().__init__(Value(text), expression, **extra)
+
+
+def reciprocal_rank_fusion(rankings, weights=None, k=60):
+    """
+    Fuse `rankings`, sequences of keys ordered from best to worst, into a
+    dict mapping each key to `sum(weight / (k + rank))` over the rankings
+    it appears in, ranks starting at 1.
+    """
+    if weights is None:
+        weights = [1.0] * len(rankings)
+    scores = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + weight / (k + rank)
+    return scores
+
+
+def weighted_score_fusion(scores, weights=None):
+    """
+    Fuse `scores`, dicts mapping keys to scores where higher is better, into
+    a dict mapping each key to the weighted sum of its min-max normalized
+    scores. A key missing from one of the dicts gets 0 for it.
+    """
+    if weights is None:
+        weights = [1.0] * len(scores)
+    fused = {}
+    for source, weight in zip(scores, weights):
+        if not source:
+            continue
+        values = np.fromiter(source.values(), dtype=np.float64, count=len(source))
+        low, span = values.min(), np.ptp(values)
+        normalized = (values - low) / span if span else np.ones_like(values)
+        for key, value in zip(source, normalized):
+            fused[key] = fused.get(key, 0.0) + weight * float(value)
+    return fused
+
+
+FUSION_METHODS = ("rrf", "weighted")
+
+
+# Vector index searches are reported as `annIndex:` (TiDB < v8.5) or
+# `vector_idx:` in the operator info of the TiFlash table scan.
+VECTOR_INDEX_PLAN_PATTERN = re.compile(r"annIndex:|vector_idx:", re.IGNORECASE)
+
+# Annotation used to tell apart the subqueries of nearest_many().
+QUERY_INDEX_ALIAS = "vector_query_index"
+# Raw score of a row in the subqueries of hybrid_search().
+HYBRID_SCORE_ALIAS = "vector_hybrid_score"
+
+DISTANCE_METRICS = {
+    "l1": L1Distance,
+    "l2": L2Distance,
+    "cosine": CosineDistance,
+    "negative_inner_product": NegativeInnerProduct,
+}
+
+
+def _vector_matrix(queryset, field, chunk_size=GET_ITERATOR_CHUNK_SIZE):
+    """
+    Stream the primary keys and the `field` vectors of `queryset` into a
+    ``(pks, matrix)`` tuple, see VectorQuerySet.vector_matrix().
+    """
+    size = queryset.count()
+    integer_types = connections[queryset.db].ops.integer_field_ranges
+    pk_dtype = (
+        np.int64
+        if queryset.model._meta.pk.get_internal_type() in integer_types
+        else object
+    )
+    pks = np.empty(size, dtype=pk_dtype)
+    dim = field.dimensions
+    matrix = None if dim is None else np.empty((size, dim), dtype=field.dtype)
+
+    queryset = queryset.values_list("pk", field.name)
+    compiler = queryset.query.get_compiler(using=queryset.db)
+    results = compiler.execute_sql(MULTI, chunked_fetch=True, chunk_size=chunk_size)
+    pk_converters = compiler.get_converters([compiler.select[0][0]])
+    row_count = 0
+    for rows in results:
+        if pk_converters:
+            rows = list(compiler.apply_converters(rows, pk_converters))
+        end = row_count + len(rows)
+        if end > size:
+            # The table grew since it was counted.
+            size = max(end, 2 * size)
+            pks = np.resize(pks, size)
+            if matrix is not None:
+                matrix = np.resize(matrix, (size, matrix.shape[1]))
+        pks[row_count:end] = [row[0] for row in rows]
+        vectors = [row[1] for row in rows]
+        present = [i for i, vector in enumerate(vectors) if vector is not None]
+        if present and matrix is None:
+            # The rows of the previous chunks were all NULL.
+            dim = decode_vector(vectors[present[0]]).shape[0]
+            matrix = np.full((size, dim), np.nan, dtype=field.dtype)
+        if matrix is not None:
+            block = matrix[row_count:end]
+            if len(present) == len(vectors):
+                block[:] = _parse_vectors(vectors, matrix.shape[1])
+            else:
+                block[:] = np.nan
+                block[present] = _parse_vectors(
+                    [vectors[i] for i in present], matrix.shape[1]
+                )
+        row_count = end
+    if matrix is None:
+        matrix = np.full((size, dim or 0), np.nan, dtype=field.dtype)
+    if row_count != size:
+        pks, matrix = pks[:row_count], matrix[:row_count]
+    return pks, matrix
+
+
+def _export_dtype(field, connection):
+    """Return the dtype of the exported array of a scalar model field."""
+    target = field.target_field if field.is_relation else field
+    internal_type = target.get_internal_type()
+    if internal_type in connection.ops.integer_field_ranges:
+        dtype = np.dtype(np.int64)
+    elif internal_type == "BooleanField":
+        dtype = np.dtype(np.bool_)
+    elif internal_type in ("FloatField", "DecimalField"):
+        dtype = np.dtype(np.float64)
+    elif internal_type == "DateTimeField":
+        return np.dtype("datetime64[us]")
+    elif internal_type == "DateField":
+        return np.dtype("datetime64[D]")
+    else:
+        raise ValueError(
+            "Can't export %r: only numeric, boolean, date and datetime fields "
+            "can be exported." % field.name
+        )
+    # NULL values are exported as NaN, or NaT for dates.
+    return np.dtype(np.float64) if field.null else dtype
+
+
+def _export_value(value, dtype):
+    if value is None:
+        return np.datetime64("NaT") if dtype.kind == "M" else np.nan
+    if isinstance(value, datetime.datetime) and value.tzinfo is not None:
+        return value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def export_vectors(
+    queryset, field_name, path, fields=(), chunk_size=10000, progress=None
+):
+    """
+    Stream the primary keys, the `field_name` vectors and the scalar `fields`
+    of `queryset` into memory-mapped NumPy files, and return the number of
+    exported rows.
+
+    When `path` ends with ".npz", a single uncompressed archive is written,
+    otherwise `path` is a directory that receives one ``.npy`` file per
+    array: ``pk.npy``, ``<field_name>.npy`` and ``<field>.npy`` for each of
+    `fields`. Vectors are written with the dtype of the field, NULL vectors
+    as NaN rows.
+
+    Rows are read in primary key order, `chunk_size` rows per query, inside
+    a transaction so that all the chunks see the same snapshot. Memory use
+    is bounded by the chunk size, whatever the size of the table.
+    `progress` is called with the number of rows written after each chunk.
+
+    Example:
+    ```python
+    export_vectors(Document.objects.all(), "embedding", "documents.npz", ["created"])
+    data = np.load("documents.npz")
+    ```
+    """
+    if isinstance(queryset, type) and issubclass(queryset, models.Model):
+        queryset = queryset._default_manager.all()
+    if chunk_size < 1:
+        raise ValueError("'chunk_size' must be a positive integer.")
+    opts = queryset.model._meta
+    connection = connections[queryset.db]
+    field = opts.get_field(field_name)
+    if not isinstance(field, VectorField):
+        raise ValueError("%r is not a VectorField." % field_name)
+    if opts.pk.get_internal_type() not in connection.ops.integer_field_ranges:
+        raise ValueError("Only models with an integer primary key can be exported.")
+    columns = [opts.get_field(name) for name in fields]
+    dtypes = [_export_dtype(column, connection) for column in columns]
+    path = os.fspath(path)
+    archive = path.endswith(".npz")
+    directory = (
+        tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(path)))
+        if archive
+        else path
+    )
+    os.makedirs(directory, exist_ok=True)
+    queryset = queryset.order_by("pk")
+
+    try:
+        with transaction.atomic(using=queryset.db):
+            size = queryset.count()
+            dim = field.dimensions
+            if dim is None:
+                sample = (
+                    queryset.filter(**{"%s__isnull" % field.name: False})
+                    .values_list(field.name, flat=True)
+                    .first()
+                )
+                dim = 0 if sample is None else len(sample)
+            arrays = {
+                "pk": np.lib.format.open_memmap(
+                    os.path.join(directory, "pk.npy"),
+                    mode="w+",
+                    dtype=np.int64,
+                    shape=(size,),
+                ),
+                field.name: np.lib.format.open_memmap(
+                    os.path.join(directory, "%s.npy" % field.name),
+                    mode="w+",
+                    dtype=field.dtype,
+                    shape=(size, dim),
+                ),
+            }
+            for column, dtype in zip(columns, dtypes):
+                arrays[column.name] = np.lib.format.open_memmap(
+                    os.path.join(directory, "%s.npy" % column.name),
+                    mode="w+",
+                    dtype=dtype,
+                    shape=(size,),
+                )
+            matrix = arrays[field.name]
+
+            row_count = 0
+            last_pk = None
+            while row_count < size:
+                chunk = queryset
+                if last_pk is not None:
+                    chunk = chunk.filter(pk__gt=last_pk)
+                chunk = chunk.values_list(
+                    "pk", field.name, *(column.attname for column in columns)
+                )[: min(chunk_size, size - row_count)]
+                compiler = chunk.query.get_compiler(using=chunk.db)
+                results = compiler.execute_sql(MULTI)
+                converters = compiler.get_converters(
+                    [select[0] for select in compiler.select]
+                )
+                # Vectors are parsed straight into the matrix.
+                converters.pop(1, None)
+                rows = [
+                    row
+                    for batch in results
+                    for row in (
+                        compiler.apply_converters(batch, converters)
+                        if converters
+                        else batch
+                    )
+                ]
+                if not rows:
+                    break
+                end = row_count + len(rows)
+                arrays["pk"][row_count:end] = [row[0] for row in rows]
+                vectors = [row[1] for row in rows]
+                present = [i for i, vector in enumerate(vectors) if vector is not None]
+                block = matrix[row_count:end]
+                if len(present) == len(vectors):
+                    block[:] = _parse_vectors(vectors, dim)
+                else:
+                    block[:] = np.nan
+                    if present:
+                        block[present] = _parse_vectors(
+                            [vectors[i] for i in present], dim
+                        )
+                for i, (column, dtype) in enumerate(zip(columns, dtypes), start=2):
+                    arrays[column.name][row_count:end] = [
+                        _export_value(row[i], dtype) for row in rows
+                    ]
+                last_pk = rows[-1][0]
+                row_count = end
+                if progress is not None:
+                    progress(row_count)
+            for array in arrays.values():
+                array.flush()
+        if archive:
+            with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED, allowZip64=True) as zf:
+                for name in os.listdir(directory):
+                    zf.write(os.path.join(directory, name), name)
+    finally:
+        if archive:
+            shutil.rmtree(directory, ignore_errors=True)
+    return row_count
+
+
+class VectorQuerySet(TiDBQuerySet):
+    """
+    QuerySet with helpers for models that have a VectorField.
+
+    Example:
+    ```python
+    class Document(models.Model):
+        embedding = VectorField(dimensions=3)
+
+        objects = VectorQuerySet.as_manager()
+
+    pks, matrix = Document.objects.filter(...).vector_matrix("embedding")
+    ```
+    """
+
+    def _vector_field(self, field_name):
+        field = self.model._meta.get_field(field_name)
+        if not isinstance(field, VectorField):
+            raise ValueError("%r is not a VectorField." % field_name)
+        return field
+
+    def vector_matrix(self, field_name, chunk_size=GET_ITERATOR_CHUNK_SIZE):
+        """
+        Return a ``(pks, matrix)`` tuple, where ``matrix`` is a contiguous
+        array of shape ``(n, dimensions)`` and of the field's dtype, holding
+        the vectors of
+        ``field_name`` in queryset order and ``pks`` holds the matching primary
+        keys. Rows are streamed in chunks and parsed straight into the
+        preallocated matrix, NULL vectors are filled with NaN.
+        """
+        return _vector_matrix(self, self._vector_field(field_name), chunk_size)
+
+    def _nearest_queryset(self, distance, limit, alias):
+        """
+        Return a queryset selecting up to `limit` rows ordered by `distance`,
+        with SQL that TiDB can serve from a vector index:
+        `ORDER BY VEC_*_DISTANCE(column, literal) LIMIT n`.
+
+        A WHERE clause in front of the ORDER BY stops TiDB from using the
+        index, so when this queryset is filtered, only the primary keys of
+        the nearest rows of the whole table are selected.
+        """
+        if not self.query.has_filters():
+            return self.annotate(**{alias: distance}).order_by(alias)[:limit]
+        return (
+            self.model._base_manager.using(self.db)
+            .alias(**{alias: distance})
+            .order_by(alias)
+            .values_list("pk", flat=True)[:limit]
+        )
+
+    def _nearest_candidates(self, distance, limit, alias):
+        """
+        Return up to `limit` instances ordered by `distance`. Filters of this
+        queryset are applied afterwards on the candidates, in a second query
+        by primary key.
+        """
+        queryset = self._nearest_queryset(distance, limit, alias)
+        if not self.query.has_filters():
+            return list(queryset)
+        return list(
+            self.filter(pk__in=list(queryset))
+            .annotate(**{alias: distance})
+            .order_by(alias)
+        )
+
+    def _distance_class(self, metric):
+        try:
+            return DISTANCE_METRICS[metric]
+        except KeyError:
+            raise ValueError(
+                "Unknown metric %r. Allowed metrics: %s"
+                % (metric, ", ".join(sorted(DISTANCE_METRICS)))
+            )
+
+    def _check_vector_index(self, field_name, distance_class):
+        for index in self.model._meta.indexes:
+            if not isinstance(index, VectorIndex):
+                continue
+            for expression in index.expressions:
+                if type(expression) is distance_class and any(
+                    getattr(source, "name", None) == field_name
+                    for source in expression.get_source_expressions()
+                ):
+                    return index
+        raise ValueError(
+            "%s has no VectorIndex on %r using %s."
+            % (self.model.__name__, field_name, distance_class.__name__)
+        )
+
+    def nearest(
+        self, field_name, vector, k=10, metric="cosine", alias="distance", explain=None
+    ):
+        """
+        Return the `k` instances nearest to `vector` by `metric` ("cosine" or
+        "l2"), each with the distance set on the `alias` attribute.
+
+        The model must declare a matching VectorIndex, and the query is always
+        emitted in the `ORDER BY VEC_*_DISTANCE(...) LIMIT k` shape that TiDB
+        serves from the index. Filters of this queryset are applied to the `k`
+        nearest rows afterwards, so fewer than `k` results may be returned.
+
+        When `explain` is true (defaults to settings.DEBUG), the plan of the
+        query is checked and a RuntimeWarning is issued if TiDB does not use
+        the vector index.
+        """
+        distance_class = self._distance_class(metric)
+        self._vector_field(field_name)
+        index = self._check_vector_index(field_name, distance_class)
+        distance = distance_class(field_name, vector)
+        if explain is None:
+            explain = settings.DEBUG
+        if explain:
+            plan = self._nearest_queryset(distance, k, alias).explain()
+            if not VECTOR_INDEX_PLAN_PATTERN.search(plan):
+                warnings.warn(
+                    "The query on %s is not served by vector index %r, TiDB "
+                    "falls back to a full scan. Check that the index is built "
+                    "and that the TiFlash replica is available.\n%s"
+                    % (self.model._meta.db_table, index.name, plan),
+                    RuntimeWarning,
+                )
+        return self._nearest_candidates(distance, k, alias)
+
+    def nearest_many(
+        self, field_name, vectors, k=10, metric="cosine", alias="distance"
+    ):
+        """
+        Run one `nearest()` search per row of the 2-D `vectors` array in a
+        single statement, a `UNION ALL` of index-friendly subqueries.
+
+        Return a list with one list of up to `k` instances per query vector,
+        in the order of `vectors`. Filters of this queryset are applied to
+        the nearest rows afterwards, in a second query by primary key.
+        """
+        distance_class = self._distance_class(metric)
+        self._vector_field(field_name)
+        self._check_vector_index(field_name, distance_class)
+        vectors = np.asarray(vectors)
+        if vectors.ndim != 2:
+            raise ValueError("expected a 2-D array of query vectors")
+        results = [[] for _ in range(len(vectors))]
+        if not len(vectors):
+            return results
+
+        filtered = self.query.has_filters()
+        base = self.model._base_manager.using(self.db) if filtered else self
+        parts = []
+        for i, vector in enumerate(vectors):
+            part = base.annotate(
+                **{
+                    alias: distance_class(field_name, vector),
+                    QUERY_INDEX_ALIAS: Value(i),
+                }
+            ).order_by(alias)[:k]
+            if filtered:
+                part = part.values_list("pk", QUERY_INDEX_ALIAS, alias)
+            parts.append(part)
+        combined = parts[0].union(*parts[1:], all=True) if len(parts) > 1 else parts[0]
+
+        if filtered:
+            rows = list(combined)
+            objs = self.filter(pk__in={row[0] for row in rows}).in_bulk()
+            for pk, i, distance in rows:
+                if pk in objs:
+                    obj = copy.copy(objs[pk])
+                    setattr(obj, alias, distance)
+                    results[i].append(obj)
+        else:
+            for obj in combined:
+                results[obj.__dict__.pop(QUERY_INDEX_ALIAS)].append(obj)
+        for group in results:
+            group.sort(key=operator.attrgetter(alias))
+        return results
+
+    def search(self, distance, k, oversample=4, alias="distance"):
+        """
+        Return the `k` instances closest to the query vector of `distance`.
+
+        `k * oversample` approximate candidates are fetched through the
+        vector index, then reranked by their exact distance in NumPy. Each
+        returned instance has the exact distance set on the `alias` attribute.
+        Filters of this queryset are applied to the candidates, so fewer
+        than `k` results may be returned for selective filters.
+
+        Example:
+        ```python
+        Document.objects.filter(lang="en").search(
+            CosineDistance("embedding", [3, 1, 2]), k=10, oversample=8
+        )
+        ```
+        """
+        if not isinstance(distance, DistanceBase) or distance.vector is None:
+            raise ValueError(
+                "search() requires a distance function with a literal query vector."
+            )
+        if k < 1 or oversample < 1:
+            raise ValueError("'k' and 'oversample' must be positive integers.")
+        field_name = getattr(distance.get_source_expressions()[0], "name", None)
+        if field_name is None:
+            raise ValueError("search() requires a distance function on a field.")
+        attname = self._vector_field(field_name).attname
+        # The vectors are needed for reranking, even when deferred by default.
+        queryset = self.undefer(field_name)
+        candidates = [
+            obj
+            for obj in queryset._nearest_candidates(distance, k * oversample, alias)
+            if getattr(obj, attname) is not None
+        ]
+        if not candidates:
+            return []
+        vectors = np.stack([getattr(obj, attname) for obj in candidates])
+        exact = distance.compute(
+            vectors.astype(np.float64), np.asarray(distance.vector, dtype=np.float64)
+        )
+        results = []
+        for i in np.argsort(exact, kind="stable")[:k]:
+            obj = candidates[i]
+            setattr(obj, alias, float(exact[i]))
+            results.append(obj)
+        return results
+
+    def hybrid_search(
+        self,
+        text_field,
+        text,
+        vector_field,
+        vector,
+        k=10,
+        metric="cosine",
+        fusion="rrf",
+        weights=None,
+        oversample=2,
+        rrf_k=60,
+        alias="score",
+    ):
+        """
+        Return the `k` instances that rank best when combining a full-text
+        search of `text` in `text_field` with a KNN search of `vector` in
+        `vector_field`, each with the fused score set on the `alias`
+        attribute, best first.
+
+        Both searches fetch `k * oversample` candidates in a single `UNION
+        ALL` statement: `FTS_MATCH_WORD()` served by the full-text index of
+        `text_field`, and `ORDER BY VEC_*_DISTANCE(...) LIMIT n` served by
+        the vector index of `vector_field`. The candidates are then fused
+        with reciprocal rank fusion (`fusion="rrf"`, `rrf_k` being the rank
+        constant) or with a weighted sum of min-max normalized scores
+        (`fusion="weighted"`). `weights` gives the weight of the full-text
+        and of the vector search, `(1, 1)` by default.
+
+        Filters of this queryset are applied to the vector candidates
+        afterwards, in a second query by primary key.
+
+        Example:
+        ```python
+        Document.objects.hybrid_search(
+            "content", "vector database", "embedding", [3, 1, 2], k=10
+        )
+        ```
+        """
+        if fusion not in FUSION_METHODS:
+            raise ValueError(
+                "Unknown fusion %r. Allowed fusions: %s"
+                % (fusion, ", ".join(FUSION_METHODS))
+            )
+        if k < 1 or oversample < 1:
+            raise ValueError("'k' and 'oversample' must be positive integers.")
+        if weights is None:
+            weights = (1.0, 1.0)
+        if len(weights) != 2:
+            raise ValueError("'weights' must be a (text, vector) pair.")
+        distance_class = self._distance_class(metric)
+        self._vector_field(vector_field)
+        self._check_vector_index(vector_field, distance_class)
+        limit = k * oversample
+
+        filtered = self.query.has_filters()
+        base = self.model._base_manager.using(self.db) if filtered else self
+        text_part = (
+            self.filter(FullTextMatch(F(text_field), text))
+            .annotate(
+                **{
+                    QUERY_INDEX_ALIAS: Value(0),
+                    HYBRID_SCORE_ALIAS: FullTextScore(text_field, text),
+                }
+            )
+            .order_by("-%s" % HYBRID_SCORE_ALIAS)[:limit]
+        )
+        vector_part = base.annotate(
+            **{
+                QUERY_INDEX_ALIAS: Value(1),
+                HYBRID_SCORE_ALIAS: distance_class(vector_field, vector),
+            }
+        ).order_by(HYBRID_SCORE_ALIAS)[:limit]
+        if filtered:
+            columns = ("pk", QUERY_INDEX_ALIAS, HYBRID_SCORE_ALIAS)
+            text_part = text_part.values_list(*columns)
+            vector_part = vector_part.values_list(*columns)
+            rows = list(text_part.union(vector_part, all=True))
+            objs = self.filter(pk__in={row[0] for row in rows}).in_bulk()
+        else:
+            rows, objs = [], {}
+            for obj in text_part.union(vector_part, all=True):
+                rows.append(
+                    (
+                        obj.pk,
+                        obj.__dict__.pop(QUERY_INDEX_ALIAS),
+                        obj.__dict__.pop(HYBRID_SCORE_ALIAS),
+                    )
+                )
+                objs.setdefault(obj.pk, obj)
+
+        # Rows of a UNION ALL come in no particular order, rank them again.
+        # Distances are negated so that higher is better for both searches.
+        sources = ({}, {})
+        for pk, source, score in rows:
+            if pk in objs:
+                sources[source][pk] = score if source == 0 else -score
+        if fusion == "rrf":
+            rankings = [
+                sorted(source, key=source.__getitem__, reverse=True)
+                for source in sources
+            ]
+            scores = reciprocal_rank_fusion(rankings, weights, k=rrf_k)
+        else:
+            scores = weighted_score_fusion(sources, weights)
+        results = []
+        for pk in sorted(scores, key=scores.__getitem__, reverse=True)[:k]:
+            obj = objs[pk]
+            setattr(obj, alias, scores[pk])
+            results.append(obj)
+        return results
+
+
+_LocalIndexState = namedtuple(
+    "_LocalIndexState",
+    ["pks", "matrix", "norms", "positions", "centroids", "assignments"],
+)
+
+
+# The number of elements of the temporary arrays of the L1 distances between
+# rows and centroids, 16 MiB of float32.
+_L1_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+class LocalVectorIndex:
+    """
+    In-process mirror of the vectors of a queryset, for small collections
+    that are searched far more often than they change.
+
+    Vectors are kept in a float32 NumPy matrix and searched by brute force,
+    or, when `lists` is given, through an IVF index: the vectors are
+    clustered with k-means into `lists` lists, and a search only scans the
+    `nprobe` lists whose centroids are closest to the query vector.
+
+    By default `refresh()` loads all the rows again. When `watermark` names a
+    field whose value grows when a row is written, e.g. an `auto_now`
+    timestamp, it only loads the rows whose value is at least the highest
+    value loaded so far minus `lag`, and replaces the rows it already has.
+    TiDB doesn't commit the values in order: a transaction may commit a
+    timestamp after a later one, so `lag` should be longer than the longest
+    transaction. For the same reason, auto-incremented and auto-random
+    primary keys, which are allocated in batches per TiDB server or at
+    random, can't be watermarks. Deleted rows are only dropped by `reload()`
+    and `remove()`. When `max_age` is set, `search()` refreshes the mirror
+    once it is older than `max_age` seconds.
+
+    Example:
+    ```python
+    index = LocalVectorIndex(Document.objects.all(), "embedding", metric="cosine")
+    index.refresh()
+    pks, distances = index.search([3, 1, 2], k=10)
+    ```
+    """
+
+    def __init__(
+        self,
+        queryset,
+        field_name,
+        metric="cosine",
+        watermark=None,
+        lag=None,
+        lists=None,
+        nprobe=8,
+        max_age=None,
+        chunk_size=GET_ITERATOR_CHUNK_SIZE,
+    ):
+        if isinstance(queryset, type) and issubclass(queryset, models.Model):
+            queryset = queryset._default_manager.all()
+        self.queryset = queryset
+        self.field = queryset.model._meta.get_field(field_name)
+        if not isinstance(self.field, VectorField):
+            raise ValueError("%r is not a VectorField." % field_name)
+        if metric not in DISTANCE_METRICS:
+            raise ValueError(
+                "Unknown metric %r. Allowed metrics: %s"
+                % (metric, ", ".join(sorted(DISTANCE_METRICS)))
+            )
+        if lists is not None and lists < 1:
+            raise ValueError("'lists' must be a positive integer.")
+        if watermark is not None:
+            watermark_field = (
+                queryset.model._meta.pk
+                if watermark == "pk"
+                else queryset.model._meta.get_field(watermark)
+            )
+            if isinstance(watermark_field, AutoFieldMixin):
+                raise ValueError(
+                    "%r can't be a watermark: TiDB doesn't allocate its values in "
+                    "increasing order. Use a timestamp field with a lag." % watermark
+                )
+        self.metric = metric
+        self.watermark = watermark
+        self.lag = lag
+        self.lists = lists
+        self.nprobe = nprobe
+        self.max_age = max_age
+        self.chunk_size = chunk_size
+        # Searches read the state without locking, refreshes replace it.
+        self._lock = threading.Lock()
+        self._clear()
+
+    def __len__(self):
+        return len(self._state.pks)
+
+    def _clear(self):
+        self._state = _LocalIndexState(
+            np.empty(0, dtype=object), None, None, {}, None, None
+        )
+        self._high_water_mark = None
+        self._refreshed_at = None
+        self._trained_size = 0
+
+    def clear(self):
+        """Drop all the mirrored vectors."""
+        with self._lock:
+            self._clear()
+
+    def reload(self):
+        """Load all the vectors again, dropping the deleted rows."""
+        with self._lock:
+            return self._refresh(replace=True)
+
+    def refresh(self):
+        """
+        Load the rows added or updated since the last refresh, and return
+        how many rows were loaded.
+        """
+        with self._lock:
+            return self._refresh()
+
+    def _refresh(self, replace=False):
+        queryset = self.queryset
+        replace = replace or self.watermark is None
+        high_water_mark = None
+        if not replace and self._high_water_mark is not None:
+            # Rows committed late with a lower value are read again within
+            # the lag, and replace the copy loaded before.
+            since = self._high_water_mark
+            if self.lag is not None:
+                since -= self.lag
+            queryset = queryset.filter(**{"%s__gte" % self.watermark: since})
+        if self.watermark is not None:
+            # Bound the load by the current maximum, rows written afterwards
+            # are picked up by the next refresh.
+            high_water_mark = queryset.aggregate(
+                high_water_mark=models.Max(self.watermark)
+            )["high_water_mark"]
+            if high_water_mark is None:
+                if replace:
+                    self._clear()
+                self._refreshed_at = time.monotonic()
+                return 0
+            queryset = queryset.filter(
+                **{"%s__lte" % self.watermark: high_water_mark}
+            ).order_by(self.watermark)
+        self._refreshed_at = time.monotonic()
+        pks, matrix = _vector_matrix(queryset, self.field, self.chunk_size)
+        # NULL vectors are loaded as NaN rows and can't be searched. Without
+        # dimensions, the matrix has no columns when all of them are NULL.
+        present = ~np.isnan(matrix).any(axis=1) & (matrix.shape[1] > 0)
+        matrix = matrix[present].astype(np.float32, copy=False)
+        if replace and not present.any():
+            self._clear()
+            self._refreshed_at = time.monotonic()
+        elif replace:
+            # Searches keep using the previous state until it is replaced.
+            self._trained_size = 0
+            self._set_rows(pks[present], matrix)
+        else:
+            # Rows whose vector was updated to NULL can't be searched anymore.
+            self._drop(pks[~present].tolist())
+            self._upsert(pks[present], matrix)
+        self._high_water_mark = high_water_mark
+        return len(pks)
+
+    def remove(self, pks):
+        """Drop the vectors of the given primary keys from the mirror."""
+        with self._lock:
+            self._drop(pks)
+
+    def _drop(self, pks):
+        state = self._state
+        drop = [state.positions[pk] for pk in pks if pk in state.positions]
+        if drop:
+            keep = np.ones(len(state.pks), dtype=bool)
+            keep[drop] = False
+            self._set_rows(state.pks[keep], state.matrix[keep])
+
+    def _upsert(self, pks, matrix):
+        if not len(pks):
+            return
+        state = self._state
+        if state.matrix is None:
+            self._set_rows(pks, matrix)
+            return
+        if matrix.shape[1] != state.matrix.shape[1]:
+            raise ValueError(
+                "expected %d dimensions, not %d"
+                % (state.matrix.shape[1], matrix.shape[1])
+            )
+        existing = np.fromiter(
+            (pk in state.positions for pk in pks.tolist()), dtype=bool, count=len(pks)
+        )
+        rows = state.matrix
+        if existing.any():
+            rows = rows.copy()
+            rows[[state.positions[pk] for pk in pks[existing].tolist()]] = matrix[
+                existing
+            ]
+        self._set_rows(
+            np.concatenate([state.pks, pks[~existing]]),
+            np.concatenate([rows, matrix[~existing]]),
+        )
+
+    def _set_rows(self, pks, matrix):
+        matrix = np.ascontiguousarray(matrix)
+        centroids = assignments = None
+        if self.lists is not None and len(pks):
+            if len(pks) >= 2 * self._trained_size or self._state.centroids is None:
+                centroids = self._train(matrix)
+                self._trained_size = len(pks)
+            else:
+                centroids = self._state.centroids
+            assignments = self._nearest_centroids(matrix, centroids, 1)[:, 0]
+        self._state = _LocalIndexState(
+            pks,
+            matrix,
+            np.linalg.norm(matrix, axis=1),
+            {pk: i for i, pk in enumerate(pks.tolist())},
+            centroids,
+            assignments,
+        )
+
+    def _nearest_centroids(self, matrix, centroids, n, chunk_size=4096):
+        """Return the indices of the `n` nearest centroids of each row."""
+        result = np.empty((len(matrix), n), dtype=np.intp)
+        if self.metric == "cosine":
+            with np.errstate(divide="ignore", invalid="ignore"):
+                centroids = centroids / np.linalg.norm(centroids, axis=1)[:, None]
+        squared_norms = np.square(centroids).sum(axis=1)
+        if self.metric == "l1":
+            # The L1 distances go through a (rows, lists, dimensions)
+            # temporary, keep it around _L1_BLOCK_SIZE elements.
+            chunk_size = max(
+                1, min(chunk_size, _L1_BLOCK_SIZE // max(centroids.size, 1))
+            )
+        for start in range(0, len(matrix), chunk_size):
+            end = min(start + chunk_size, len(matrix))
+            block = matrix[start:end]
+            if self.metric == "l1":
+                scores = np.abs(block[:, None, :] - centroids[None, :, :]).sum(axis=2)
+            elif self.metric == "l2":
+                scores = squared_norms - 2 * (block @ centroids.T)
+            else:
+                # The norm of a row is the same for all the centroids, so
+                # ranking by the inner product with the normalized centroids
+                # also ranks by cosine distance.
+                scores = -(block @ centroids.T)
+            if n < scores.shape[1]:
+                result[start:end] = np.argpartition(scores, n - 1, axis=1)[:, :n]
+            else:
+                result[start:end] = np.argsort(scores, axis=1)
+        return result
+
+    def _train(self, matrix, iterations=10):
+        """Cluster `matrix` with k-means and return the centroids."""
+        lists = min(self.lists, len(matrix))
+        rng = np.random.default_rng(0)
+        centroids = matrix[rng.choice(len(matrix), lists, replace=False)].copy()
+        for iteration in range(iterations):
+            assignments = self._nearest_centroids(matrix, centroids, 1)[:, 0]
+            counts = np.bincount(assignments, minlength=lists)
+            sums = np.zeros_like(centroids, dtype=np.float64)
+            np.add.at(sums, assignments, matrix)
+            filled = counts > 0
+            # Empty lists keep their previous centroid.
+            centroids[filled] = sums[filled] / counts[filled, None]
+        return centroids
+
+    def _is_stale(self):
+        return self.max_age is not None and (
+            self._refreshed_at is None
+            or time.monotonic() - self._refreshed_at > self.max_age
+        )
+
+    def search(self, vector, k=10, nprobe=None):
+        """
+        Return a ``(pks, distances)`` tuple of arrays with the `k` rows nearest
+        to `vector`, nearest first. With an IVF index, only the `nprobe`
+        nearest lists are scanned, so the results are approximate.
+        """
+        if self._is_stale():
+            with self._lock:
+                # Another search may have refreshed it while this one waited.
+                if self._is_stale():
+                    self._refresh()
+        state = self._state
+        if state.matrix is None or k < 1:
+            return state.pks[:0], np.empty(0, dtype=np.float32)
+        vector = _as_float_vector(vector)
+        if vector.shape[0] != state.matrix.shape[1]:
+            raise ValueError(
+                "expected %d dimensions, not %d"
+                % (state.matrix.shape[1], vector.shape[0])
+            )
+        matrix, norms, rows = state.matrix, state.norms, None
+        if state.centroids is not None:
+            probe = self._nearest_centroids(
+                vector[None, :],
+                state.centroids,
+                min(nprobe or self.nprobe, len(state.centroids)),
+            )[0]
+            rows = np.flatnonzero(np.isin(state.assignments, probe))
+            matrix, norms = matrix[rows], norms[rows]
+        if self.metric == "cosine":
+            with np.errstate(divide="ignore", invalid="ignore"):
+                distances = 1 - (matrix @ vector) / (norms * np.linalg.norm(vector))
+        else:
+            distances = DISTANCE_METRICS[self.metric].compute(matrix, vector)
+        if k < len(distances):
+            order = np.argpartition(distances, k - 1)[:k]
+            order = order[np.argsort(distances[order], kind="stable")]
+        else:
+            order = np.argsort(distances, kind="stable")
+        if rows is not None:
+            return state.pks[rows[order]], distances[order]
+        return state.pks[order], distances[order]
+
 
 class VectorWidget(forms.TextInput):
     def format_value(self, value):
-        if isinstance(value, np.ndarray):
+        if isinstance(value, (np.ndarray, LazyVector)):
             value = value.tolist()
         return super().format_value(value)
 
@@ -254,6 +1944,6 @@ class VectorFormField(forms.CharField):
     widget = VectorWidget
 
     def has_changed(self, initial, data):
-        if isinstance(initial, np.ndarray):
+        if isinstance(initial, (np.ndarray, LazyVector)):
             initial = initial.tolist()
         return super().has_changed(initial, data)
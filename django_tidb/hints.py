@@ -0,0 +1,154 @@
+# Copyright 2021 PingCAP, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+from collections import namedtuple
+
+from django.core.exceptions import FieldError
+
+# The table of the queryset's model in hints, other tables are referred to
+# by the relation path that joins them, e.g. "course" or "course__teacher".
+SELF = "self"
+
+# Hints whose arguments are tables.
+# https://docs.pingcap.com/tidb/stable/optimizer-hints
+TABLE_HINTS = {
+    "BROADCAST_JOIN",
+    "HASH_JOIN",
+    "HASH_JOIN_BUILD",
+    "HASH_JOIN_PROBE",
+    "INL_HASH_JOIN",
+    "INL_JOIN",
+    "INL_MERGE_JOIN",
+    "LEADING",
+    "MERGE_JOIN",
+    "NO_HASH_JOIN",
+    "NO_INDEX_HASH_JOIN",
+    "NO_INDEX_JOIN",
+    "NO_INDEX_MERGE_JOIN",
+    "NO_MERGE_JOIN",
+    "SHUFFLE_JOIN",
+}
+# Hints whose arguments are a table and index names.
+INDEX_HINTS = {
+    "FORCE_INDEX",
+    "IGNORE_INDEX",
+    "NO_ORDER_INDEX",
+    "ORDER_INDEX",
+    "USE_INDEX",
+    "USE_INDEX_MERGE",
+}
+# Hints without arguments.
+FLAG_HINTS = {
+    "AGG_TO_COP",
+    "HASH_AGG",
+    "LIMIT_TO_COP",
+    "MPP_1PHASE_AGG",
+    "MPP_2PHASE_AGG",
+    "NO_DECORRELATE",
+    "NO_INDEX_MERGE",
+    "SEMI_JOIN_REWRITE",
+    "STRAIGHT_JOIN",
+    "STREAM_AGG",
+}
+# Hints that apply to the whole statement, they're ignored in subqueries.
+STATEMENT_HINTS = {
+    "IGNORE_PLAN_CACHE",
+    "READ_CONSISTENT_REPLICA",
+}
+
+hint_re = re.compile(r"^\s*(\w+)\s*\((.*)\)\s*$", re.DOTALL)
+identifier_re = re.compile(r"^[A-Za-z_$][\w$]*$")
+
+
+class Hint(namedtuple("Hint", "name args")):
+    """
+    An optimizer hint of a queryset. Its table arguments are resolved to the
+    aliases of the compiled query.
+    """
+
+    @property
+    def is_statement_hint(self):
+        return self.name in STATEMENT_HINTS
+
+    def as_sql(self, query, aliases):
+        """
+        Return the SQL of the hint in `query`, whose FROM clause has the
+        tables `aliases`.
+        """
+        if self.name in TABLE_HINTS:
+            args = [resolve_table(query, arg, aliases) for arg in self.args]
+        elif self.name in INDEX_HINTS:
+            args = [resolve_table(query, self.args[0], aliases), *self.args[1:]]
+        else:
+            args = self.args
+        return "%s(%s)" % (self.name, ", ".join(args))
+
+
+def parse_hint(hint):
+    """
+    Parse and validate a hint such as "HASH_JOIN(self, course)" or
+    "USE_INDEX(course, course_name_idx)". Raise ValueError if it's invalid.
+    """
+    if isinstance(hint, Hint):
+        return hint
+    match = hint_re.match(hint) if isinstance(hint, str) else None
+    if match is None:
+        raise ValueError("Invalid optimizer hint %r." % (hint,))
+    name = match[1].upper()
+    args = [arg.strip() for arg in match[2].split(",")] if match[2].strip() else []
+    if name in TABLE_HINTS:
+        if not args:
+            raise ValueError("The %s hint requires at least one table." % name)
+    elif name in INDEX_HINTS:
+        if not args:
+            raise ValueError("The %s hint requires a table." % name)
+    elif name in FLAG_HINTS or name in STATEMENT_HINTS:
+        if args:
+            raise ValueError("The %s hint doesn't take arguments." % name)
+    else:
+        raise ValueError("Unknown optimizer hint %r." % name)
+    for arg in args:
+        if not identifier_re.match(arg):
+            raise ValueError("Invalid argument %r in the %s hint." % (arg, name))
+    return Hint(name, tuple(args))
+
+
+def resolve_table(query, path, aliases):
+    """
+    Return the alias of the table that `path` refers to in `query`: SELF for
+    the table of the model, or the relation path that joins the table. The
+    table must be one of `aliases`.
+    """
+    if path == SELF:
+        return query.base_table
+    opts = query.get_meta()
+    # Resolve on a copy, existing joins are reused and new ones are dropped.
+    clone = query.clone()
+    try:
+        info = clone.setup_joins(
+            path.split("__"), opts, clone.get_initial_alias(), allow_many=True
+        )
+    except FieldError as e:
+        raise FieldError("Invalid table %r in an optimizer hint: %s" % (path, e))
+    if not info.final_field.is_relation:
+        raise FieldError(
+            "Invalid table %r in an optimizer hint: %r isn't a relation."
+            % (path, info.final_field.name)
+        )
+    alias = info.joins[-1]
+    if alias not in aliases:
+        raise FieldError(
+            "Invalid table %r in an optimizer hint: the query doesn't join it." % path
+        )
+    return alias
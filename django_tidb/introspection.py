@@ -11,12 +11,22 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from collections import namedtuple
+import copy
+import logging
+import threading
+import time
+from collections import defaultdict, namedtuple
+from contextlib import contextmanager
 
+from MySQLdb.constants import FIELD_TYPE
+
+from django.db import DatabaseError
 from django.db.backends.base.introspection import FieldInfo as BaseFieldInfo
 from django.db.backends.mysql.introspection import (
     DatabaseIntrospection as MysqlDatabaseIntrospection,
 )
+from django.db.models import Index
+from django.utils.datastructures import OrderedSet
 
 FieldInfo = namedtuple(
     "FieldInfo",
@@ -29,13 +39,233 @@ InfoLine = namedtuple(
     "collation is_unsigned comment",
 )
 
+# The type codes reported in cursor.description for the values of
+# information_schema.columns.data_type, used by bulk mode instead of probing
+# each table. Tables with other types are still probed.
+DATA_TYPE_CODES = {
+    "tinyint": FIELD_TYPE.TINY,
+    "smallint": FIELD_TYPE.SHORT,
+    "mediumint": FIELD_TYPE.INT24,
+    "int": FIELD_TYPE.LONG,
+    "integer": FIELD_TYPE.LONG,
+    "bigint": FIELD_TYPE.LONGLONG,
+    "float": FIELD_TYPE.FLOAT,
+    "double": FIELD_TYPE.DOUBLE,
+    "decimal": FIELD_TYPE.NEWDECIMAL,
+    "date": FIELD_TYPE.DATE,
+    "datetime": FIELD_TYPE.DATETIME,
+    "timestamp": FIELD_TYPE.TIMESTAMP,
+    "time": FIELD_TYPE.TIME,
+    "year": FIELD_TYPE.YEAR,
+    "char": FIELD_TYPE.STRING,
+    "varchar": FIELD_TYPE.VAR_STRING,
+    "binary": FIELD_TYPE.STRING,
+    "varbinary": FIELD_TYPE.VAR_STRING,
+    "enum": FIELD_TYPE.STRING,
+    "set": FIELD_TYPE.STRING,
+    "bit": FIELD_TYPE.BIT,
+    "json": FIELD_TYPE.JSON,
+    # All the TEXT and BLOB types are reported as BLOB.
+    "tinytext": FIELD_TYPE.BLOB,
+    "text": FIELD_TYPE.BLOB,
+    "mediumtext": FIELD_TYPE.BLOB,
+    "longtext": FIELD_TYPE.BLOB,
+    "tinyblob": FIELD_TYPE.BLOB,
+    "blob": FIELD_TYPE.BLOB,
+    "mediumblob": FIELD_TYPE.BLOB,
+    "longblob": FIELD_TYPE.BLOB,
+}
+
+# Introspection results shared by all the connections of the process. Maps
+# a database key to (schema version, {(kind, table name): result}), only the
+# results of the latest schema version seen are kept.
+_schema_cache = {}
+_schema_cache_lock = threading.Lock()
+
+logger = logging.getLogger("django.db.backends")
+
+
+def clear_introspection_cache():
+    """Drop the introspection results cached by all the connections."""
+    with _schema_cache_lock:
+        _schema_cache.clear()
+
 
 class DatabaseIntrospection(MysqlDatabaseIntrospection):
+    # How long (in seconds) a schema version read from the server is trusted
+    # before it is read again, when the introspection cache is enabled.
+    schema_version_ttl = 1.0
+
+    def __init__(self, connection):
+        super().__init__(connection)
+        # Results of the schema-wide queries of bulk mode, by kind.
+        self._bulk = None
+        # The last schema version read and when it was read.
+        self._schema_version = None
+        self._schema_version_read_at = None
+        # The database connections that can't run ADMIN SHOW DDL, and the
+        # one that can't read the schema version at all. They aren't asked
+        # again until they're replaced.
+        self._admin_show_ddl_denied = None
+        self._schema_version_unavailable = None
+
+    @property
+    def cache_enabled(self):
+        return bool(self.connection.settings_dict["OPTIONS"].get("introspection_cache"))
+
+    @property
+    def _cache_ttl(self):
+        option = self.connection.settings_dict["OPTIONS"].get("introspection_cache")
+        if isinstance(option, dict):
+            return option.get("schema_version_ttl", self.schema_version_ttl)
+        return self.schema_version_ttl
+
+    @property
+    def _cache_key(self):
+        settings_dict = self.connection.settings_dict
+        return (
+            settings_dict["HOST"],
+            settings_dict["PORT"],
+            settings_dict["USER"],
+            settings_dict["NAME"],
+        )
+
+    def get_schema_version(self, cursor):
+        """
+        Return the current schema version of the cluster, or None if it can't
+        be read. The version is increased by every DDL statement, by any
+        client.
+
+        The version is read with ADMIN SHOW DDL, or from the id of the last
+        DDL job if the user isn't allowed to run it. Once ADMIN SHOW DDL
+        failed, it isn't run again on the same database connection.
+        """
+        connection = self.connection.connection
+        if connection is None or self._admin_show_ddl_denied is not connection:
+            try:
+                cursor.execute("ADMIN SHOW DDL")
+                columns = [column[0].upper() for column in cursor.description]
+                row = cursor.fetchone()
+                return int(row[columns.index("SCHEMA_VER")])
+            except (DatabaseError, ValueError):
+                self._admin_show_ddl_denied = connection
+        try:
+            cursor.execute("SELECT MAX(job_id) FROM information_schema.ddl_jobs")
+            row = cursor.fetchone()
+        except DatabaseError:
+            return None
+        return None if row is None or row[0] is None else int(row[0])
+
+    def _current_schema_version(self, cursor):
+        connection = self.connection.connection
+        if connection is not None and self._schema_version_unavailable is connection:
+            return None
+        now = time.monotonic()
+        if (
+            self._schema_version_read_at is None
+            or now - self._schema_version_read_at >= self._cache_ttl
+        ):
+            self._schema_version = self.get_schema_version(cursor)
+            self._schema_version_read_at = now
+            if self._schema_version is None:
+                self._schema_version_unavailable = connection
+                logger.warning(
+                    "The introspection cache of the %r database is disabled on "
+                    "this connection: the schema version can't be read with "
+                    "ADMIN SHOW DDL or from information_schema.ddl_jobs.",
+                    self.connection.alias,
+                )
+        return self._schema_version
+
+    def _cached(self, cursor, kind, table_name, loader, *args):
+        """
+        Return loader(cursor, *args), from the process-wide cache if the
+        introspection cache is enabled and the schema version didn't change
+        since the result was cached.
+        """
+        if not self.cache_enabled:
+            return loader(cursor, *args)
+        version = self._current_schema_version(cursor)
+        if version is None:
+            return loader(cursor, *args)
+        key = (kind, table_name)
+        with _schema_cache_lock:
+            entry = _schema_cache.get(self._cache_key)
+            if entry is not None and entry[0] == version and key in entry[1]:
+                return copy.deepcopy(entry[1][key])
+        result = loader(cursor, *args)
+        with _schema_cache_lock:
+            entry = _schema_cache.get(self._cache_key)
+            if entry is None or entry[0] < version:
+                entry = _schema_cache[self._cache_key] = (version, {})
+            if entry[0] == version:
+                entry[1][key] = copy.deepcopy(result)
+        return result
+
+    def schema_changed(self):
+        """
+        Drop the results that may be stale after a DDL statement of this
+        connection: the results loaded by bulk mode, and the cached schema
+        version so the next cached call reads the new one.
+        """
+        self.clear_bulk_cache()
+        self._schema_version_read_at = None
+
+    @contextmanager
+    def bulk_mode(self):
+        """
+        Introspect all the tables of the database with a few queries on
+        information_schema, instead of several queries per table.
+
+        Within the block, the descriptions, relations and constraints of all
+        the tables are loaded on first use, and later calls are answered
+        from them. The results reflect the schema when they were loaded,
+        they are dropped when the schema editor runs a statement.
+
+        Example:
+        ```python
+        with connection.introspection.bulk_mode():
+            call_command("inspectdb")
+        ```
+        """
+        if self._bulk is not None:
+            yield
+            return
+        self._bulk = {}
+        try:
+            yield
+        finally:
+            self._bulk = None
+
+    def clear_bulk_cache(self):
+        """Drop the results loaded by bulk mode, e.g. after a DDL statement."""
+        if self._bulk:
+            self._bulk = {}
+
+    def _bulk_load(self, cursor, kind, loader):
+        if kind not in self._bulk:
+            self._bulk[kind] = loader(cursor)
+        return self._bulk[kind]
+
+    def get_table_list(self, cursor):
+        return self._cached(cursor, "tables", None, super().get_table_list)
+
     def get_table_description(self, cursor, table_name):
         """
         Return a description of the table with the DB-API cursor.description
         interface."
         """
+        return self._cached(
+            cursor, "description", table_name, self._get_table_description, table_name
+        )
+
+    def _get_table_description(self, cursor, table_name):
+        if self._bulk is not None:
+            descriptions = self._bulk_load(
+                cursor, "descriptions", self._get_all_table_descriptions
+            )
+            if descriptions.get(table_name) is not None:
+                return descriptions[table_name]
         json_constraints = {}
         if self.connection.features.can_introspect_json_field:
             # JSON data type is an alias for LONGTEXT in MariaDB, select
@@ -118,3 +348,218 @@ class DatabaseIntrospection(MysqlDatabaseIntrospection):
                 )
             )
         return fields
+
+    def _get_all_table_descriptions(self, cursor):
+        """
+        Return the descriptions of all the tables, built from
+        information_schema only. Tables with a column type that isn't in
+        DATA_TYPE_CODES are mapped to None.
+
+        Unlike get_table_description() outside of bulk mode, there's no
+        cursor.description to fall back on: display_size, internal_size,
+        precision and scale are None when information_schema doesn't provide
+        them, e.g. the sizes of non-character columns. The scale of temporal
+        columns is their datetime_precision.
+        """
+        json_constraints = defaultdict(set)
+        if self.connection.features.can_introspect_json_field:
+            cursor.execute(
+                """
+                SELECT c.table_name, c.constraint_name AS column_name
+                FROM information_schema.check_constraints AS c
+                WHERE
+                    LOWER(c.check_clause) = 'json_valid(`' + LOWER(c.constraint_name) + '`)' AND
+                    c.constraint_schema = DATABASE()
+            """
+            )
+            for table_name, column_name in cursor.fetchall():
+                json_constraints[table_name].add(column_name)
+        cursor.execute(
+            """
+            SELECT  table_name, table_collation
+            FROM    information_schema.tables
+            WHERE   table_schema = DATABASE()
+        """
+        )
+        collations = dict(cursor.fetchall())
+        cursor.execute(
+            """
+            SELECT
+                table_name, column_name, data_type, character_maximum_length,
+                numeric_precision, numeric_scale, extra, column_default,
+                collation_name,
+                CASE
+                    WHEN column_type LIKE %s THEN 1
+                    ELSE 0
+                END AS is_unsigned,
+                column_comment, is_nullable, datetime_precision
+            FROM information_schema.columns
+            WHERE table_schema = DATABASE()
+            ORDER BY table_name, ordinal_position
+        """,
+            ["% unsigned"],
+        )
+
+        def to_int(i):
+            return int(i) if i is not None else i
+
+        descriptions = {}
+        for table_name, *line in cursor.fetchall():
+            fields = descriptions.setdefault(table_name, [])
+            if fields is None:
+                continue
+            type_code = DATA_TYPE_CODES.get(line[1].lower())
+            if type_code is None:
+                descriptions[table_name] = None
+                continue
+            info = InfoLine(*line[:10])
+            collation = info.collation
+            if collation == collations.get(table_name, ""):
+                collation = None
+            fields.append(
+                FieldInfo(
+                    info.col_name,
+                    type_code,
+                    to_int(info.max_len),
+                    to_int(info.max_len),
+                    to_int(info.num_prec),
+                    to_int(info.num_scale if info.num_scale is not None else line[11]),
+                    line[10] == "YES",
+                    info.column_default,
+                    collation,
+                    info.extra,
+                    info.is_unsigned,
+                    info.col_name in json_constraints[table_name],
+                    info.comment,
+                    info.data_type,
+                )
+            )
+        return descriptions
+
+    def get_relations(self, cursor, table_name):
+        return self._cached(
+            cursor, "relations", table_name, self._get_relations, table_name
+        )
+
+    def _get_relations(self, cursor, table_name):
+        if self._bulk is None:
+            return super().get_relations(cursor, table_name)
+        relations = self._bulk_load(cursor, "relations", self._get_all_relations)
+        return dict(relations.get(table_name, {}))
+
+    def _get_all_relations(self, cursor):
+        cursor.execute(
+            """
+            SELECT table_name, column_name, referenced_column_name, referenced_table_name
+            FROM information_schema.key_column_usage
+            WHERE table_schema = DATABASE()
+                AND referenced_table_schema = DATABASE()
+                AND referenced_table_name IS NOT NULL
+                AND referenced_column_name IS NOT NULL
+            """
+        )
+        relations = defaultdict(dict)
+        for table_name, field_name, other_field, other_table in cursor.fetchall():
+            relations[table_name][field_name] = (other_field, other_table)
+        return relations
+
+    def get_constraints(self, cursor, table_name):
+        return self._cached(
+            cursor, "constraints", table_name, self._get_constraints, table_name
+        )
+
+    def _get_constraints(self, cursor, table_name):
+        if (
+            self._bulk is None
+            or self.connection.features.can_introspect_check_constraints
+        ):
+            return super().get_constraints(cursor, table_name)
+        constraints = self._bulk_load(cursor, "constraints", self._get_all_constraints)
+        if table_name not in constraints:
+            return super().get_constraints(cursor, table_name)
+        result = {}
+        for name, constraint in constraints[table_name].items():
+            result[name] = {**constraint, "columns": list(constraint["columns"])}
+            if "orders" in constraint:
+                result[name]["orders"] = list(constraint["orders"])
+        return result
+
+    def _get_all_constraints(self, cursor):
+        """
+        Return the key constraints and the indexes of all the tables, as
+        get_constraints() does for one table with SHOW INDEX.
+        """
+        supports_orders = self.connection.features.supports_index_column_ordering
+        cursor.execute(
+            """
+            SELECT  table_name
+            FROM    information_schema.tables
+            WHERE   table_schema = DATABASE()
+        """
+        )
+        all_constraints = {row[0]: {} for row in cursor.fetchall()}
+        cursor.execute(
+            """
+            SELECT kc.`table_name`, kc.`constraint_name`, kc.`column_name`,
+                kc.`referenced_table_name`, kc.`referenced_column_name`,
+                c.`constraint_type`
+            FROM
+                information_schema.key_column_usage AS kc,
+                information_schema.table_constraints AS c
+            WHERE
+                kc.table_schema = DATABASE() AND
+                (
+                    kc.referenced_table_schema = DATABASE() OR
+                    kc.referenced_table_schema IS NULL
+                ) AND
+                c.table_schema = kc.table_schema AND
+                c.table_name = kc.table_name AND
+                c.constraint_name = kc.constraint_name AND
+                c.constraint_type != 'CHECK'
+            ORDER BY kc.`table_name`, kc.`ordinal_position`
+        """
+        )
+        for row in cursor.fetchall():
+            table_name, constraint, column, ref_table, ref_column, kind = row
+            constraints = all_constraints.setdefault(table_name, {})
+            if constraint not in constraints:
+                constraints[constraint] = {
+                    "columns": OrderedSet(),
+                    "primary_key": kind == "PRIMARY KEY",
+                    "unique": kind in {"PRIMARY KEY", "UNIQUE"},
+                    "index": False,
+                    "check": False,
+                    "foreign_key": (ref_table, ref_column) if ref_column else None,
+                }
+                if supports_orders:
+                    constraints[constraint]["orders"] = []
+            constraints[constraint]["columns"].add(column)
+        cursor.execute(
+            """
+            SELECT table_name, non_unique, index_name, column_name, collation,
+                index_type
+            FROM information_schema.statistics
+            WHERE table_schema = DATABASE()
+            ORDER BY table_name, index_name, seq_in_index
+        """
+        )
+        for table_name, non_unique, index, column, order, type_ in cursor.fetchall():
+            constraints = all_constraints.setdefault(table_name, {})
+            if index not in constraints:
+                constraints[index] = {
+                    "columns": OrderedSet(),
+                    "primary_key": False,
+                    "unique": not int(non_unique),
+                    "check": False,
+                    "foreign_key": None,
+                }
+                if supports_orders:
+                    constraints[index]["orders"] = []
+            constraints[index]["index"] = True
+            constraints[index]["type"] = (
+                Index.suffix if type_ == "BTREE" else type_.lower()
+            )
+            constraints[index]["columns"].add(column)
+            if supports_orders:
+                constraints[index]["orders"].append("DESC" if order == "D" else "ASC")
+        return all_constraints
@@ -0,0 +1,106 @@
+# Copyright 2021 PingCAP, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.utils import OperationalError
+
+
+class ExecutionLimitExceeded(OperationalError):
+    """A query was cancelled by TiDB because it exceeded a limit."""
+
+
+class ExecutionTimeExceeded(ExecutionLimitExceeded):
+    """
+    A query ran longer than its maximum execution time, or was about to run
+    after the deadline.
+    """
+
+
+class MemoryQuotaExceeded(ExecutionLimitExceeded):
+    """A query used more memory than its quota."""
+
+
+# Errors raised by TiDB when a query exceeds a limit.
+# https://docs.pingcap.com/tidb/stable/error-codes
+LIMIT_ERRORS = {
+    3024: ExecutionTimeExceeded,  # ErrMaxExecTimeExceeded
+    8175: MemoryQuotaExceeded,  # ErrMemExceedThreshold, tidb_mem_quota_query.
+}
+
+# The monotonic time by which the queries of the current context must end.
+_deadline = ContextVar("tidb_deadline", default=None)
+
+
+def execution_limit_error(error):
+    """
+    Return the ExecutionLimitExceeded exception matching the MySQLdb `error`,
+    or None if it isn't caused by a limit.
+    """
+    exception_class = LIMIT_ERRORS.get(error.args[0]) if error.args else None
+    if exception_class is None:
+        return None
+    return exception_class(*error.args)
+
+
+@contextmanager
+def deadline(seconds):
+    """
+    Give the queries of the block `seconds` to run in total. The time that
+    remains becomes the MAX_EXECUTION_TIME of each SELECT statement, and
+    ExecutionTimeExceeded is raised without querying once it's over. A nested
+    deadline can't extend the outer one.
+
+    Example:
+    ```python
+    with deadline(2):
+        feed = list(Article.objects.filter(published=True)[:20])
+    ```
+    """
+    if seconds <= 0:
+        raise ValueError("The deadline must be in the future.")
+    value = time.monotonic() + seconds
+    outer = _deadline.get()
+    if outer is not None:
+        value = min(value, outer)
+    token = _deadline.set(value)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time():
+    """Return the seconds left before the deadline, or None without one."""
+    value = _deadline.get()
+    if value is None:
+        return None
+    return value - time.monotonic()
+
+
+def max_execution_time(timeout):
+    """
+    Return the MAX_EXECUTION_TIME, in milliseconds, of a statement whose own
+    limit is `timeout` milliseconds or None, given the deadline. Raise
+    ExecutionTimeExceeded if the deadline is over.
+    """
+    remaining = remaining_time()
+    if remaining is None:
+        return timeout
+    if remaining <= 0:
+        raise ExecutionTimeExceeded("The deadline of the queries is over.")
+    remaining = math.ceil(remaining * 1000)
+    return remaining if timeout is None else min(timeout, remaining)
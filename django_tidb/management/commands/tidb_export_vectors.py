@@ -0,0 +1,78 @@
+# Copyright 2021 PingCAP, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from django.apps import apps
+from django.core.exceptions import FieldDoesNotExist
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from django_tidb.fields.vector import export_vectors
+
+
+class Command(BaseCommand):
+    help = (
+        "Export the primary keys, a VectorField and scalar fields of a model "
+        "to memory-mapped .npy files, or to a .npz archive."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "model", metavar="app_label.ModelName", help="The model to export."
+        )
+        parser.add_argument("field", help="The name of the VectorField to export.")
+        parser.add_argument(
+            "path",
+            help="A directory for the .npy files, or a file name ending with .npz.",
+        )
+        parser.add_argument(
+            "--fields",
+            default="",
+            help="Comma separated names of scalar fields to export with the vectors.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=10000,
+            help="Number of rows read per query. Defaults to 10000.",
+        )
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help='Nominates a database to export from. Defaults to the "default" database.',
+        )
+
+    def handle(self, **options):
+        try:
+            model = apps.get_model(options["model"])
+        except (LookupError, ValueError) as e:
+            raise CommandError(str(e))
+        fields = [name for name in options["fields"].split(",") if name]
+
+        def report(rows):
+            if options["verbosity"] >= 2:
+                self.stdout.write("  %d rows exported" % rows)
+
+        try:
+            rows = export_vectors(
+                model._default_manager.using(options["database"]),
+                options["field"],
+                options["path"],
+                fields=fields,
+                chunk_size=options["chunk_size"],
+                progress=report,
+            )
+        except (FieldDoesNotExist, LookupError, ValueError) as e:
+            raise CommandError(str(e))
+        self.stdout.write(
+            self.style.SUCCESS("Exported %d rows to %s." % (rows, options["path"]))
+        )
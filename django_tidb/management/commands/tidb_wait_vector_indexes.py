@@ -0,0 +1,102 @@
+# Copyright 2021 PingCAP, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from django_tidb.fields.vector import VectorIndex
+
+
+class Command(BaseCommand):
+    help = (
+        "Wait until the TiFlash replicas and vector indexes of the given apps "
+        "or models are ready to serve queries."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "args",
+            metavar="app_label[.ModelName]",
+            nargs="*",
+            help="Restricts the indexes to the specified app_label or app_label.ModelName.",
+        )
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help='Nominates a database to check. Defaults to the "default" database.',
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            help="Seconds to wait for each index before failing. Waits forever by default.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5,
+            help="Seconds between two progress checks. Defaults to 5.",
+        )
+
+    def get_models(self, labels):
+        if not labels:
+            return apps.get_models()
+        models = []
+        for label in labels:
+            try:
+                if "." in label:
+                    models.append(apps.get_model(label))
+                else:
+                    models.extend(apps.get_app_config(label).get_models())
+            except LookupError as e:
+                raise CommandError(str(e))
+        return models
+
+    def handle(self, *labels, **options):
+        indexes = [
+            (model, index)
+            for model in self.get_models(labels)
+            for index in model._meta.indexes
+            if isinstance(index, VectorIndex)
+        ]
+        if not indexes:
+            self.stdout.write("No vector indexes found.")
+            return
+        for model, index in indexes:
+            label = "%s.%s" % (model._meta.db_table, index.name)
+
+            def report(state, label=label):
+                self.stdout.write(
+                    "  %s: TiFlash replica %s (%.0f%%), %d rows indexed, "
+                    "%d rows pending"
+                    % (
+                        label,
+                        "available" if state.replica_available else "syncing",
+                        state.replica_progress * 100,
+                        state.rows_indexed,
+                        state.rows_not_indexed,
+                    )
+                )
+
+            self.stdout.write("Waiting for vector index %s..." % label)
+            try:
+                index.wait_until_ready(
+                    model,
+                    using=options["database"],
+                    timeout=options["timeout"],
+                    interval=options["interval"],
+                    progress=report if options["verbosity"] >= 1 else None,
+                )
+            except TimeoutError as e:
+                raise CommandError(str(e))
+            self.stdout.write(self.style.SUCCESS("Vector index %s is ready." % label))
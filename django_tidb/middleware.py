@@ -0,0 +1,34 @@
+# Copyright 2021 PingCAP, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .limits import deadline
+
+
+class RequestDeadlineMiddleware:
+    """
+    Give the queries of each request settings.TIDB_REQUEST_TIMEOUT seconds
+    to run in total, see django_tidb.limits.deadline().
+    """
+
+    def __init__(self, get_response):
+        self.timeout = getattr(settings, "TIDB_REQUEST_TIMEOUT", None)
+        if not self.timeout:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with deadline(self.timeout):
+            return self.get_response(request)
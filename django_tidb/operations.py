@@ -17,6 +17,7 @@ from django.db.backends.mysql.operations import (
 
 
 class DatabaseOperations(MysqlDatabaseOperations):
+    compiler_module = "django_tidb.compiler"
     integer_field_ranges = {
         **MysqlDatabaseOperations.integer_field_ranges,
         "BigAutoRandomField": (-9223372036854775808, 9223372036854775807),
@@ -40,6 +40,9 @@ def patch_model_options():
     # Django will record `tidb_auto_id_cache` in migration files,
     # and then restore it when applying migrations.
     state.DEFAULT_NAMES += ("tidb_auto_id_cache",)
+    # `tidb_deferred_fields` only changes the default SELECT list, it isn't
+    # recorded in migration files.
+    options.DEFAULT_NAMES += ("tidb_deferred_fields",)
 
 
 def monkey_patch():
@@ -0,0 +1,300 @@
+# Copyright 2021 PingCAP, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+from collections import Counter, deque, namedtuple
+
+import MySQLdb as Database
+
+# The options of OPTIONS["pool"], with their default values.
+POOL_DEFAULTS = {
+    # Connections opened with the pool and kept open, even when they exceed
+    # max_idle.
+    "min_size": 0,
+    # Connections opened at the same time, idle or in use.
+    "max_size": 10,
+    # Seconds after which a connection is closed instead of being reused.
+    "max_lifetime": 3600,
+    # Seconds after which an idle connection is closed.
+    "max_idle": 600,
+    # Seconds to wait for a connection when max_size are in use.
+    "timeout": 30,
+    # Seconds after which an idle connection is pinged before being reused,
+    # 0 to ping it every time, None to never ping it.
+    "check_interval": 30,
+}
+
+PooledConnection = namedtuple(
+    "PooledConnection", "connection created_at idle_since used"
+)
+
+
+class PoolTimeout(Database.OperationalError):
+    pass
+
+
+class PoolClosed(Database.OperationalError):
+    pass
+
+
+class ConnectionPool:
+    """
+    A thread-safe pool of MySQLdb connections.
+
+    connect() is called without arguments to open a connection. Idle
+    connections are reused most recently used first, so that the least used
+    ones reach max_idle and are closed when the load decreases.
+
+    min_size connections are opened with the pool, and opened again when a
+    returned connection is closed, e.g. at max_lifetime, until the pool has
+    min_size connections.
+
+    connection_failed(connection, error) is called when an idle connection
+    fails its liveness check.
+    """
+
+    def __init__(self, connect, connection_failed=None, **options):
+        unknown = set(options) - set(POOL_DEFAULTS)
+        if unknown:
+            raise ValueError("Unknown pool options: %s." % ", ".join(sorted(unknown)))
+        options = {**POOL_DEFAULTS, **options}
+        if options["max_size"] < max(options["min_size"], 1):
+            raise ValueError("max_size must be greater than or equal to min_size.")
+        self._connect = connect
+        self._connection_failed = connection_failed
+        self.min_size = options["min_size"]
+        self.max_size = options["max_size"]
+        self.max_lifetime = options["max_lifetime"]
+        self.max_idle = options["max_idle"]
+        self.timeout = options["timeout"]
+        self.check_interval = options["check_interval"]
+        self.closed = False
+        self._cond = threading.Condition()
+        # Idle connections, the most recently returned on the right.
+        self._idle = deque()
+        # (creation time, reused) of the connections in use, by id().
+        self._in_use = {}
+        # Connections being opened.
+        self._opening = 0
+        self._waiting = 0
+        self._stats = Counter()
+        self._fill()
+
+    @property
+    def size(self):
+        """The number of open connections, idle or in use."""
+        return len(self._idle) + len(self._in_use) + self._opening
+
+    def getconn(self):
+        """
+        Return a connection, reusing an idle one if possible. Wait up to
+        timeout seconds for one to be returned if max_size are in use.
+        """
+        started = time.monotonic()
+        deadline = started + self.timeout
+        with self._cond:
+            self._stats["requests_num"] += 1
+        while True:
+            expired = []
+            try:
+                item = self._take(deadline, expired)
+            finally:
+                self._close_all(expired)
+            if item is None:
+                connection = self._open()
+                break
+            if self._is_healthy(item):
+                connection = item.connection
+                break
+            with self._cond:
+                del self._in_use[id(item.connection)]
+                self._stats["connections_lost"] += 1
+                self._cond.notify()
+            self._close_connection(item.connection)
+        with self._cond:
+            self._stats["requests_wait_ms"] += int((time.monotonic() - started) * 1000)
+        return connection
+
+    def putconn(self, connection, discard=False):
+        """
+        Return a connection to the pool. Close it instead if discard is True,
+        if it's too old, or if the pool is closed.
+        """
+        now = time.monotonic()
+        with self._cond:
+            created_at, _reused = self._in_use.pop(id(connection), (None, None))
+            if created_at is None:
+                raise ValueError("The connection doesn't belong to this pool.")
+            keep = (
+                not discard
+                and not self.closed
+                and (self.max_lifetime is None or now - created_at < self.max_lifetime)
+            )
+            if keep:
+                self._idle.append(PooledConnection(connection, created_at, now, True))
+            expired = self._prune(now)
+            self._cond.notify()
+        if not keep:
+            self._close_connection(connection)
+        self._close_all(expired)
+        self._fill()
+
+    def is_reused(self, connection):
+        """
+        Return whether the connection, which is in use, was used before its
+        last checkout.
+        """
+        with self._cond:
+            return self._in_use[id(connection)][1]
+
+    def close(self):
+        """Close the idle connections, and the others when they're returned."""
+        with self._cond:
+            self.closed = True
+            idle = [item.connection for item in self._idle]
+            self._idle.clear()
+            self._cond.notify_all()
+        self._close_all(idle)
+
+    def get_stats(self):
+        """Return the size of the pool and the counters since its creation."""
+        with self._cond:
+            return {
+                "pool_min": self.min_size,
+                "pool_max": self.max_size,
+                "pool_size": self.size,
+                "pool_available": len(self._idle),
+                "requests_waiting": self._waiting,
+                **self._stats,
+            }
+
+    def _take(self, deadline, expired):
+        """
+        Return an idle connection, marked as in use, or None if the caller
+        must open a new connection. Add the connections that expired to the
+        expired list.
+        """
+        with self._cond:
+            while True:
+                if self.closed:
+                    raise PoolClosed("The connection pool is closed.")
+                now = time.monotonic()
+                expired += self._prune(now)
+                if self._idle:
+                    item = self._idle.pop()
+                    self._in_use[id(item.connection)] = (item.created_at, item.used)
+                    return item
+                if self.size < self.max_size:
+                    self._opening += 1
+                    return None
+                remaining = deadline - now
+                if remaining <= 0:
+                    self._stats["requests_errors"] += 1
+                    raise PoolTimeout(
+                        "Couldn't get a connection after %s seconds, %s connections "
+                        "are in use." % (self.timeout, self.max_size)
+                    )
+                self._stats["requests_queued"] += 1
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+    def _prune(self, now):
+        """
+        Remove the connections that reached max_lifetime or max_idle from the
+        idle ones, keeping min_size of them open. Return the removed ones.
+        """
+        size = self.size
+        expired = []
+        kept = deque()
+        while self._idle:
+            item = self._idle.popleft()
+            too_old = (
+                self.max_lifetime is not None
+                and now - item.created_at >= self.max_lifetime
+            )
+            too_idle = (
+                self.max_idle is not None
+                and now - item.idle_since >= self.max_idle
+                and size - len(expired) > self.min_size
+            )
+            if too_old or too_idle:
+                expired.append(item.connection)
+            else:
+                kept.append(item)
+        self._idle = kept
+        return expired
+
+    def _fill(self):
+        """
+        Open idle connections until the pool has min_size connections. Stop
+        at the first error, the next connection request reports it.
+        """
+        while True:
+            with self._cond:
+                if self.closed or self.size >= self.min_size:
+                    return
+                self._opening += 1
+            try:
+                connection = self._open()
+            except Exception:
+                return
+            with self._cond:
+                created_at, _reused = self._in_use.pop(id(connection))
+                self._idle.appendleft(
+                    PooledConnection(connection, created_at, created_at, False)
+                )
+                self._cond.notify()
+
+    def _open(self):
+        started = time.monotonic()
+        try:
+            connection = self._connect()
+        except Exception:
+            with self._cond:
+                self._opening -= 1
+                self._stats["connections_errors"] += 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._opening -= 1
+            self._in_use[id(connection)] = (time.monotonic(), False)
+            self._stats["connections_num"] += 1
+            self._stats["connections_ms"] += int((time.monotonic() - started) * 1000)
+        return connection
+
+    def _is_healthy(self, item):
+        if self.check_interval is None:
+            return True
+        if time.monotonic() - item.idle_since < self.check_interval:
+            return True
+        try:
+            item.connection.ping()
+        except Database.Error as e:
+            if self._connection_failed is not None:
+                self._connection_failed(item.connection, e)
+            return False
+        return True
+
+    def _close_connection(self, connection):
+        try:
+            connection.close()
+        except Database.Error:
+            pass
+
+    def _close_all(self, connections):
+        for connection in connections:
+            self._close_connection(connection)
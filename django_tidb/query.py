@@ -0,0 +1,302 @@
+# Copyright 2021 PingCAP, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import math
+
+from django.conf import settings
+from django.db import NotSupportedError
+from django.db.models import DateTimeField, Func, QuerySet, Value
+from django.db.models.query import ModelIterable
+from django.utils import timezone
+
+from .hints import parse_hint
+
+# The values of the tidb_replica_read session variable.
+REPLICA_READ_MODES = {
+    "leader",
+    "follower",
+    "leader-and-follower",
+    "prefer-leader",
+    "closest-replicas",
+    "closest-adaptive",
+    "learner",
+}
+
+# The storage engines that a query can read from.
+STORAGE_ENGINES = ("tikv", "tiflash")
+
+
+def check_replica_read_mode(mode):
+    if mode not in REPLICA_READ_MODES:
+        raise ValueError(
+            "Unknown replica read mode %r, use one of %s."
+            % (mode, ", ".join(sorted(REPLICA_READ_MODES)))
+        )
+
+
+def check_storage_engine(engine, mpp):
+    if engine not in STORAGE_ENGINES:
+        raise ValueError(
+            "Unknown storage engine %r, use one of %s."
+            % (engine, ", ".join(STORAGE_ENGINES))
+        )
+    if mpp and engine != "tiflash":
+        raise ValueError("MPP execution requires the tiflash engine.")
+
+
+def check_writable(query):
+    if getattr(query, "tidb_as_of", None) is not None:
+        raise NotSupportedError(
+            "Stale reads are read-only, as_of() and stale() querysets can't be "
+            "updated or deleted."
+        )
+
+
+def check_execution_limits(timeout, memory_quota):
+    if timeout is None and memory_quota is None:
+        raise ValueError("Set a timeout, a memory quota, or both.")
+    if timeout is not None and timeout <= 0:
+        raise ValueError("The timeout must be positive.")
+    if memory_quota is not None and (
+        not isinstance(memory_quota, int) or memory_quota <= 0
+    ):
+        raise ValueError("The memory quota must be a positive number of MB.")
+
+
+class BoundedStaleness(Func):
+    """The newest timestamp at most `seconds` old that a replica can serve."""
+
+    function = "TIDB_BOUNDED_STALENESS"
+    template = "%(function)s(NOW() - INTERVAL %(expressions)s SECOND, NOW())"
+    output_field = DateTimeField()
+
+
+class ExactStaleness(Func):
+    """The timestamp exactly `seconds` ago."""
+
+    template = "NOW() - INTERVAL %(expressions)s SECOND"
+    output_field = DateTimeField()
+
+
+def as_of_timestamp(value):
+    """
+    Return the expression of an `AS OF TIMESTAMP` clause for `value`: a
+    datetime, a string, or an expression.
+    """
+    if hasattr(value, "resolve_expression"):
+        return value
+    if isinstance(value, datetime.datetime):
+        if settings.USE_TZ and timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        if timezone.is_aware(value):
+            # TiDB reads the timestamp in the session time zone, which
+            # FROM_UNIXTIME() uses too.
+            return Func(
+                Value(value.timestamp()),
+                function="FROM_UNIXTIME",
+                output_field=DateTimeField(),
+            )
+        value = value.isoformat(sep=" ")
+    if not isinstance(value, str):
+        raise TypeError(
+            "as_of() expects a datetime, a string or an expression, got %r." % value
+        )
+    return Value(value)
+
+
+def deferred_by_default(opts):
+    """
+    Return the concrete fields of the model that are left out of the default
+    SELECT list: fields with `load="deferred"` and the fields named in the
+    `tidb_deferred_fields` Meta option.
+    """
+    names = getattr(opts, "tidb_deferred_fields", None) or ()
+    return [
+        field
+        for field in opts.concrete_fields
+        if getattr(field, "load", None) == "deferred" or field.name in names
+    ]
+
+
+def prefetch_deferred_objects(instances, *field_names):
+    """
+    Load the deferred fields `field_names` of `instances` with one query per
+    model and database, instead of one query per instance on access. Without
+    `field_names`, load the deferred-by-default fields that are deferred.
+    """
+    groups = {}
+    for obj in instances:
+        groups.setdefault((type(obj), obj._state.db), []).append(obj)
+    for (model, db), objs in groups.items():
+        opts = model._meta
+        if field_names:
+            fields = [opts.get_field(name) for name in field_names]
+        else:
+            fields = deferred_by_default(opts)
+        deferred = set().union(*(obj.get_deferred_fields() for obj in objs))
+        attnames = [field.attname for field in fields if field.attname in deferred]
+        if not attnames:
+            continue
+        values = {
+            row[0]: row[1:]
+            for row in model._base_manager.db_manager(db)
+            .filter(pk__in={obj.pk for obj in objs})
+            .values_list("pk", *attnames)
+        }
+        for obj in objs:
+            row = values.get(obj.pk)
+            if row is None:
+                continue
+            loaded = obj.get_deferred_fields()
+            for attname, value in zip(attnames, row):
+                if attname in loaded:
+                    setattr(obj, attname, value)
+
+
+class TiDBQuerySet(QuerySet):
+    """
+    QuerySet with TiDB specific helpers.
+
+    Example:
+    ```python
+    class Document(models.Model):
+        payload = models.JSONField()
+
+        objects = TiDBQuerySet.as_manager()
+
+        class Meta:
+            tidb_deferred_fields = ["payload"]
+
+    Document.objects.prefetch_deferred()
+    ```
+    """
+
+    def undefer(self, *fields):
+        """
+        Select the deferred-by-default `fields`, or all of them when no
+        field is given, with the rest of the row. Fields of the models of
+        select_related() are named with their relation, e.g. "parent__payload".
+        """
+        clone = self._chain()
+        if fields:
+            undeferred = getattr(clone.query, "tidb_undeferred", None)
+            if undeferred is not True:
+                clone.query.tidb_undeferred = frozenset(undeferred or ()) | set(fields)
+        else:
+            clone.query.tidb_undeferred = True
+        return clone
+
+    def prefetch_deferred(self, *fields):
+        """
+        Load the deferred-by-default `fields`, or all of them when no field
+        is given, with one extra query for the whole result set instead of
+        one query per instance on access.
+        """
+        clone = self._chain()
+        clone.query.tidb_prefetch_deferred = fields
+        return clone
+
+    def as_of(self, timestamp):
+        """
+        Read the data as it was at `timestamp`, with TiDB's
+        `AS OF TIMESTAMP` clause on every table of the query.
+        """
+        clone = self._chain()
+        clone.query.tidb_as_of = as_of_timestamp(timestamp)
+        return clone
+
+    def stale(self, seconds, exact=False):
+        """
+        Read data at most `seconds` old, the newest that the closest replica
+        can serve. With `exact=True`, read the data as it was `seconds` ago.
+        """
+        if seconds < 0:
+            raise ValueError("The staleness must be positive.")
+        staleness = ExactStaleness if exact else BoundedStaleness
+        return self.as_of(staleness(Value(seconds)))
+
+    def replica_read(self, mode):
+        """
+        Read from the replicas chosen by `mode`, one of the values of the
+        tidb_replica_read session variable, e.g. "closest-replicas".
+        """
+        check_replica_read_mode(mode)
+        clone = self._chain()
+        clone.query.tidb_replica_read = mode
+        return clone
+
+    def using_engine(self, engine, mpp=False):
+        """
+        Read the tables of the query from `engine`, "tiflash" for the
+        columnar replicas or "tikv", with the READ_FROM_STORAGE hint. With
+        `mpp=True`, enforce the MPP execution of the query on TiFlash.
+        """
+        check_storage_engine(engine, mpp)
+        clone = self._chain()
+        clone.query.tidb_engine = engine
+        clone.query.tidb_mpp = mpp
+        return clone
+
+    def execution_limits(self, timeout=None, memory_quota=None):
+        """
+        Cancel the query if it runs longer than `timeout` seconds, with the
+        MAX_EXECUTION_TIME hint, or uses more than `memory_quota` MB of
+        memory, with the MEMORY_QUOTA hint. TiDB only applies the timeout to
+        SELECT statements.
+        """
+        check_execution_limits(timeout, memory_quota)
+        clone = self._chain()
+        if timeout is not None:
+            clone.query.tidb_max_execution_time = math.ceil(timeout * 1000)
+        if memory_quota is not None:
+            clone.query.tidb_memory_quota = memory_quota
+        return clone
+
+    def hints(self, *hints):
+        """
+        Add TiDB optimizer hints to the query, e.g. "HASH_JOIN(self, course)"
+        or "USE_INDEX(course, course_name_idx)". Tables are referred to as
+        "self" for the table of the model, or by the relation path that joins
+        them. Raise ValueError for unknown or malformed hints.
+        """
+        parsed = [parse_hint(hint) for hint in hints]
+        clone = self._chain()
+        clone.query.tidb_hints = (*getattr(clone.query, "tidb_hints", ()), *parsed)
+        return clone
+
+    def delete(self):
+        # Checked before the related objects are collected from the snapshot.
+        check_writable(self.query)
+        return super().delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def update(self, **kwargs):
+        check_writable(self.query)
+        return super().update(**kwargs)
+
+    update.alters_data = True
+
+    def _fetch_all(self):
+        fetch = self._result_cache is None
+        super()._fetch_all()
+        fields = getattr(self.query, "tidb_prefetch_deferred", None)
+        if (
+            fetch
+            and fields is not None
+            and self._result_cache
+            and issubclass(self._iterable_class, ModelIterable)
+        ):
+            prefetch_deferred_objects(self._result_cache, *fields)
@@ -29,6 +29,11 @@ class DatabaseSchemaEditor(MysqlDatabaseSchemaEditor):
     def sql_rename_column(self):
         return "ALTER TABLE %(table)s CHANGE %(old_column)s %(new_column)s %(type)s"
 
+    def execute(self, sql, params=()):
+        super().execute(sql, params)
+        # The schema changed, drop the introspection results that may be stale.
+        self.connection.introspection.schema_changed()
+
     def skip_default_on_alter(self, field):
         if self._is_limited_data_type(field):
             # TiDB doesn't support defaults for BLOB/TEXT/JSON in the
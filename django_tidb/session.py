@@ -0,0 +1,141 @@
+# Copyright 2021 PingCAP, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+import re
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .query import (
+    check_execution_limits,
+    check_replica_read_mode,
+    check_storage_engine,
+)
+
+variable_name_re = re.compile(r"^[a-z_][a-z0-9_]*$", re.IGNORECASE)
+
+
+@contextmanager
+def session_variables(using=None, **variables):
+    """
+    Set the session variables for the duration of the block, and restore
+    their previous values afterward.
+
+    Example:
+    ```python
+    with session_variables(tidb_replica_read="closest-replicas"):
+        ...
+    ```
+    """
+    for name in variables:
+        if not variable_name_re.match(name):
+            raise ValueError("Invalid session variable name %r." % name)
+    if not variables:
+        yield
+        return
+    connection = connections[using or DEFAULT_DB_ALIAS]
+    names = list(variables)
+    assignments = ", ".join("@@SESSION.%s = %%s" % name for name in names)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT %s" % ", ".join("@@SESSION.%s" % name for name in names))
+        previous = cursor.fetchone()
+        cursor.execute("SET %s" % assignments, [variables[name] for name in names])
+    # The connection the variables were set on, don't restore them on a new
+    # one if it was closed within the block. A pooled connection closed with
+    # changed variables is discarded instead of being reused.
+    raw_connection = connection.connection
+    connection._session_changes += 1
+    try:
+        yield
+    finally:
+        if connection.connection is raw_connection:
+            with connection.cursor() as cursor:
+                cursor.execute("SET %s" % assignments, list(previous))
+            connection._session_changes -= 1
+
+
+def read_staleness(seconds, using=None):
+    """
+    Serve the reads of the block from data at most `seconds` old, by any
+    replica, through the tidb_read_staleness session variable. The block
+    should only read, outside of transactions.
+
+    Example:
+    ```python
+    with read_staleness(5):
+        feed = list(Article.objects.filter(published=True)[:20])
+    ```
+    """
+    if seconds < 0:
+        raise ValueError("The read staleness must be positive.")
+    # Whole seconds only, round up rather than down to 0, which disables it.
+    return session_variables(using=using, tidb_read_staleness=-math.ceil(seconds))
+
+
+def replica_read(mode, using=None):
+    """
+    Serve the reads of the block from the replicas chosen by `mode`, through
+    the tidb_replica_read session variable.
+
+    Example:
+    ```python
+    with replica_read("closest-replicas"):
+        feed = list(Article.objects.filter(published=True)[:20])
+    ```
+    """
+    check_replica_read_mode(mode)
+    return session_variables(using=using, tidb_replica_read=mode)
+
+
+def using_engine(engine, mpp=False, using=None):
+    """
+    Serve the reads of the block from `engine`, "tiflash" for the columnar
+    replicas or "tikv", through the tidb_isolation_read_engines session
+    variable. With `mpp=True`, enforce the MPP execution of the queries.
+
+    Example:
+    ```python
+    with using_engine("tiflash", mpp=True):
+        report = Order.objects.values("region").annotate(total=Sum("amount"))
+        report = list(report)
+    ```
+    """
+    check_storage_engine(engine, mpp)
+    # The tidb engine serves the memory tables, e.g. information_schema.
+    variables = {"tidb_isolation_read_engines": "%s,tidb" % engine}
+    if mpp:
+        variables["tidb_enforce_mpp"] = 1
+    return session_variables(using=using, **variables)
+
+
+def execution_limits(timeout=None, memory_quota=None, using=None):
+    """
+    Cancel the queries of the block that run longer than `timeout` seconds,
+    through the max_execution_time session variable, or use more than
+    `memory_quota` MB of memory, through tidb_mem_quota_query. TiDB only
+    applies the timeout to SELECT statements.
+
+    Example:
+    ```python
+    with execution_limits(timeout=5, memory_quota=512):
+        report = list(Order.objects.values("region").annotate(total=Sum("amount")))
+    ```
+    """
+    check_execution_limits(timeout, memory_quota)
+    variables = {}
+    if timeout is not None:
+        variables["max_execution_time"] = math.ceil(timeout * 1000)
+    if memory_quota is not None:
+        variables["tidb_mem_quota_query"] = memory_quota * 1024 * 1024
+    return session_variables(using=using, **variables)
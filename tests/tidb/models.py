@@ -1,6 +1,7 @@
 from django.db import models
 
 from django_tidb.fields import BigAutoRandomField
+from django_tidb.query import TiDBQuerySet
 
 
 class Course(models.Model):
@@ -15,3 +16,31 @@ class BigAutoRandomModel(models.Model):
 class BigAutoRandomExplicitInsertModel(models.Model):
     value = BigAutoRandomField(primary_key=True)
     tag = models.CharField(max_length=100, blank=True, null=True)
+
+
+class DeferredPayload(models.Model):
+    name = models.CharField(max_length=100)
+    payload = models.JSONField()
+
+    objects = TiDBQuerySet.as_manager()
+
+    class Meta:
+        tidb_deferred_fields = ["payload"]
+
+
+class DeferredPayloadItem(models.Model):
+    parent = models.ForeignKey(DeferredPayload, models.CASCADE, related_name="items")
+    name = models.CharField(max_length=100)
+    payload = models.JSONField()
+
+    objects = TiDBQuerySet.as_manager()
+
+    class Meta:
+        tidb_deferred_fields = ["payload"]
+
+
+class Chapter(models.Model):
+    course = models.ForeignKey(Course, models.CASCADE, related_name="chapters")
+    title = models.CharField(max_length=100)
+
+    objects = TiDBQuerySet.as_manager()
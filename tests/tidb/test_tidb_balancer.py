@@ -0,0 +1,201 @@
+import copy
+import gc
+from unittest import mock
+
+import MySQLdb
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import SimpleTestCase
+
+from django_tidb.balancer import HostBalancer, parse_hosts
+from django_tidb.base import DatabaseWrapper
+from django_tidb.pool import ConnectionPool
+
+
+class LostCursor:
+    def execute(self, query, args=None):
+        raise MySQLdb.OperationalError(2013, "Lost connection to server")
+
+
+class FakeConnection:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.alive = True
+
+    def cursor(self):
+        return LostCursor()
+
+    def ping(self):
+        if not self.alive:
+            raise MySQLdb.OperationalError(2006, "MySQL server has gone away")
+
+    def close(self):
+        pass
+
+
+class HostBalancerTests(SimpleTestCase):
+    hosts = [("tidb-0", 4000), ("tidb-1", 4000), ("tidb-2", 4000)]
+
+    def setUp(self):
+        self.down = set()
+
+    def connect(self, host, port, **kwargs):
+        if host in self.down:
+            raise MySQLdb.OperationalError(2003, "Can't connect to '%s'" % host)
+        return FakeConnection(host, port)
+
+    def test_parse_hosts(self):
+        self.assertEqual(
+            parse_hosts("tidb-0, tidb-1:4001,[::1]:4002,[::2]", 4000),
+            [("tidb-0", 4000), ("tidb-1", 4001), ("::1", 4002), ("::2", 4000)],
+        )
+
+    def test_round_robin(self):
+        balancer = HostBalancer(self.hosts)
+        connections = [balancer.connect(self.connect, {}) for _i in range(6)]
+        self.assertEqual(
+            [conn.host for conn in connections],
+            ["tidb-0", "tidb-1", "tidb-2", "tidb-0", "tidb-1", "tidb-2"],
+        )
+
+    def test_least_connections(self):
+        balancer = HostBalancer(self.hosts, strategy="least_connections")
+        first = balancer.connect(self.connect, {})
+        second = balancer.connect(self.connect, {})
+        self.assertNotEqual(first.host, second.host)
+        del first
+        gc.collect()
+        stats = balancer.get_stats()
+        self.assertEqual(
+            sum(host["connections"] for host in stats.values()),
+            1,
+        )
+        third = balancer.connect(self.connect, {})
+        self.assertNotEqual(third.host, second.host)
+
+    def test_failover(self):
+        balancer = HostBalancer(self.hosts, backoff=60)
+        self.down.add("tidb-0")
+        conn = balancer.connect(self.connect, {"port": 3306})
+        self.assertEqual((conn.host, conn.port), ("tidb-1", 4000))
+        stats = balancer.get_stats()
+        self.assertEqual(stats["tidb-0:4000"]["failures"], 1)
+        self.assertGreater(stats["tidb-0:4000"]["ejected_for"], 0)
+        # The ejected host isn't tried while its backoff runs.
+        hosts = [balancer.connect(self.connect, {}).host for _i in range(4)]
+        self.assertNotIn("tidb-0", hosts)
+
+    def test_backoff(self):
+        balancer = HostBalancer(self.hosts, backoff=1, max_backoff=3)
+        host = self.hosts[0]
+        with mock.patch("django_tidb.balancer.time.monotonic", return_value=100):
+            delays = []
+            for _i in range(4):
+                balancer.mark_failed(host)
+                delays.append(balancer.get_stats()["tidb-0:4000"]["ejected_for"])
+        self.assertEqual(delays, [1, 2, 3, 3])
+        balancer.mark_ok(host)
+        self.assertEqual(balancer.get_stats()["tidb-0:4000"]["failures"], 0)
+
+    def test_all_hosts_down(self):
+        balancer = HostBalancer(self.hosts)
+        self.down.update(host for host, _port in self.hosts)
+        with self.assertRaises(MySQLdb.OperationalError):
+            balancer.connect(self.connect, {})
+        # Ejected hosts are still tried when no host is healthy.
+        self.down.discard("tidb-2")
+        self.assertEqual(balancer.connect(self.connect, {}).host, "tidb-2")
+
+    def test_no_failover_on_other_errors(self):
+        balancer = HostBalancer(self.hosts)
+        calls = []
+
+        def connect(**kwargs):
+            calls.append(kwargs["host"])
+            raise MySQLdb.OperationalError(1045, "Access denied")
+
+        with self.assertRaises(MySQLdb.OperationalError):
+            balancer.connect(connect, {})
+        self.assertEqual(len(calls), 1)
+
+    def test_pool_health_check_ejects_host(self):
+        balancer = HostBalancer(self.hosts, backoff=60)
+        pool = ConnectionPool(
+            lambda: balancer.connect(self.connect, {}),
+            connection_failed=balancer.connection_failed,
+            check_interval=0,
+        )
+        conn = pool.getconn()
+        pool.putconn(conn)
+        conn.alive = False
+        self.assertNotEqual(pool.getconn().host, conn.host)
+        stats = balancer.get_stats()["%s:4000" % conn.host]
+        self.assertEqual(stats["failures"], 1)
+        self.assertGreater(stats["ejected_for"], 0)
+
+    def test_other_errors_dont_eject(self):
+        balancer = HostBalancer(self.hosts)
+        conn = balancer.connect(self.connect, {})
+        balancer.connection_failed(conn, MySQLdb.OperationalError(1205, "Timeout"))
+        self.assertEqual(balancer.get_stats()["tidb-0:4000"]["failures"], 0)
+
+    def test_invalid_options(self):
+        with self.assertRaisesMessage(ValueError, "Unknown load balancing strategy"):
+            HostBalancer(self.hosts, strategy="random")
+        with self.assertRaisesMessage(ValueError, "Unknown load balancing options"):
+            HostBalancer(self.hosts, retries=3)
+
+
+class TiDBBalancerSettingsTests(SimpleTestCase):
+    def new_wrapper(self, host, **options):
+        settings_dict = copy.deepcopy(connection.settings_dict)
+        settings_dict["HOST"] = host
+        settings_dict["OPTIONS"].update(options)
+        wrapper = DatabaseWrapper(settings_dict, alias="balancer_tests")
+        self.addCleanup(DatabaseWrapper._balancers.clear)
+        return wrapper
+
+    def test_single_host(self):
+        self.assertIsNone(self.new_wrapper("tidb-0").balancer)
+
+    def test_hosts(self):
+        wrapper = self.new_wrapper(
+            "tidb-0,tidb-1:4001", load_balancing="least_connections"
+        )
+        port = int(wrapper.settings_dict["PORT"] or 0) or None
+        self.assertEqual(wrapper.balancer.hosts, [("tidb-0", port), ("tidb-1", 4001)])
+        self.assertEqual(wrapper.balancer.strategy, "least_connections")
+        self.assertIs(self.new_wrapper("tidb-0,tidb-1:4001").balancer, wrapper.balancer)
+        self.assertNotIn("load_balancing", wrapper.get_connection_params())
+
+    def test_cursor_error_ejects_host(self):
+        wrapper = self.new_wrapper("tidb-0,tidb-1", load_balancing={"backoff": 60})
+        wrapper.connection = wrapper.balancer.connect(
+            lambda host, **kwargs: FakeConnection(host, kwargs.get("port")), {}
+        )
+        self.addCleanup(setattr, wrapper, "connection", None)
+        with self.assertRaises(MySQLdb.OperationalError):
+            wrapper.create_cursor().execute("SELECT 1")
+        stats = wrapper.balancer.get_stats()
+        self.assertEqual(
+            [host["failures"] for host in stats.values()],
+            [1, 0] if wrapper.connection.host == "tidb-0" else [0, 1],
+        )
+
+    def test_dbshell(self):
+        wrapper = self.new_wrapper("tidb-0,tidb-1:4001")
+        args, _env = wrapper.client.settings_to_cmd_args_env(wrapper.settings_dict, [])
+        self.assertIn("--host=tidb-0", args)
+        wrapper.balancer.mark_failed(("tidb-0", wrapper.balancer.hosts[0][1]))
+        with mock.patch("django_tidb.client.subprocess.run") as run:
+            wrapper.client.runshell([])
+        args = run.call_args[0][0]
+        self.assertIn("--host=tidb-1", args)
+        self.assertIn("--port=4001", args)
+
+    def test_invalid_options(self):
+        wrapper = self.new_wrapper("tidb-0,tidb-1", load_balancing={"tries": 1})
+        msg = "Invalid load balancing options"
+        with self.assertRaisesMessage(ImproperlyConfigured, msg):
+            wrapper.balancer
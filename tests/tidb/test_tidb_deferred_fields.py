@@ -0,0 +1,57 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .models import DeferredPayload, DeferredPayloadItem
+
+
+class TiDBDeferredFieldsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(3):
+            DeferredPayload.objects.create(name=str(i), payload={"i": i})
+
+    def test_deferred_by_default(self):
+        with CaptureQueriesContext(connection) as ctx:
+            obj = DeferredPayload.objects.get(name="1")
+        self.assertNotIn(
+            connection.ops.quote_name("payload"), ctx.captured_queries[0]["sql"]
+        )
+        self.assertEqual(obj.get_deferred_fields(), {"payload"})
+        with self.assertNumQueries(1):
+            self.assertEqual(obj.payload, {"i": 1})
+
+    def test_undefer(self):
+        obj = DeferredPayload.objects.undefer().get(name="1")
+        self.assertEqual(obj.get_deferred_fields(), set())
+        obj = DeferredPayload.objects.only("payload").get(name="1")
+        self.assertEqual(obj.get_deferred_fields(), {"name"})
+
+    def test_related_fields_with_the_same_name(self):
+        parent = DeferredPayload.objects.get(name="1")
+        DeferredPayloadItem.objects.create(parent=parent, name="a", payload={"a": 1})
+        items = DeferredPayloadItem.objects.select_related("parent")
+        for queryset, deferred, parent_deferred in [
+            (items, {"payload"}, {"payload"}),
+            (items.undefer("payload"), set(), {"payload"}),
+            (items.undefer("parent__payload"), {"payload"}, set()),
+            (items.only("name", "parent__payload"), {"payload"}, {"name"}),
+        ]:
+            with self.subTest(query=str(queryset.query)):
+                with self.assertNumQueries(1):
+                    item = queryset.get()
+                    self.assertEqual(item.get_deferred_fields(), deferred)
+                    self.assertEqual(item.parent.get_deferred_fields(), parent_deferred)
+
+    def test_prefetch_deferred(self):
+        with self.assertNumQueries(2):
+            objs = list(DeferredPayload.objects.prefetch_deferred().order_by("name"))
+            self.assertEqual(
+                [obj.payload for obj in objs], [{"i": i} for i in range(3)]
+            )
+
+    def test_save_keeps_deferred_value(self):
+        obj = DeferredPayload.objects.get(name="1")
+        obj.name = "updated"
+        obj.save()
+        self.assertEqual(DeferredPayload.objects.get(name="updated").payload, {"i": 1})
@@ -0,0 +1,123 @@
+import time
+
+from django.db import OperationalError, connection
+from django.db.backends.mysql.base import Database
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from django_tidb.base import CursorWrapper
+from django_tidb.limits import (
+    ExecutionLimitExceeded,
+    ExecutionTimeExceeded,
+    MemoryQuotaExceeded,
+    deadline,
+    remaining_time,
+)
+from django_tidb.middleware import RequestDeadlineMiddleware
+from django_tidb.session import execution_limits
+
+from .models import Chapter, Course
+
+
+class FailingCursor:
+    def __init__(self, code):
+        self.code = code
+
+    def execute(self, query, args=None):
+        raise Database.OperationalError(self.code, "Query cancelled.")
+
+
+class TiDBExecutionLimitErrorsTests(SimpleTestCase):
+    def test_limit_errors(self):
+        for code, exception_class in [
+            (3024, ExecutionTimeExceeded),
+            (8175, MemoryQuotaExceeded),
+        ]:
+            with self.subTest(code=code):
+                with self.assertRaises(exception_class) as ctx:
+                    CursorWrapper(FailingCursor(code)).execute("SELECT 1")
+                self.assertIsInstance(ctx.exception, ExecutionLimitExceeded)
+                self.assertIsInstance(ctx.exception, OperationalError)
+                self.assertEqual(ctx.exception.args[0], code)
+
+    def test_other_errors(self):
+        with self.assertRaises(Database.OperationalError):
+            CursorWrapper(FailingCursor(2013)).execute("SELECT 1")
+
+    def test_nested_deadlines(self):
+        self.assertIsNone(remaining_time())
+        with deadline(1):
+            with deadline(60):
+                self.assertLessEqual(remaining_time(), 1)
+            with deadline(0.5):
+                self.assertLessEqual(remaining_time(), 0.5)
+        self.assertIsNone(remaining_time())
+
+    def test_middleware(self):
+        def get_response(request):
+            self.assertLessEqual(remaining_time(), 5)
+            return HttpResponse()
+
+        request = RequestFactory().get("/")
+        with override_settings(TIDB_REQUEST_TIMEOUT=5):
+            RequestDeadlineMiddleware(get_response)(request)
+        self.assertIsNone(remaining_time())
+
+
+class TiDBExecutionLimitsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        course = Course.objects.create(name="TiDB")
+        Chapter.objects.create(course=course, title="Limits")
+
+    def get_variables(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT @@max_execution_time, @@tidb_mem_quota_query")
+            return cursor.fetchone()
+
+    def test_queryset(self):
+        queryset = Chapter.objects.execution_limits(timeout=1.5, memory_quota=256)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(queryset.count(), 1)
+            queryset.filter(title="Limits").update(title="Quotas")
+        self.assertIn(
+            "SELECT /*+ MAX_EXECUTION_TIME(1500) MEMORY_QUOTA(256 MB) */",
+            ctx.captured_queries[0]["sql"],
+        )
+        self.assertIn(
+            "UPDATE /*+ MEMORY_QUOTA(256 MB) */", ctx.captured_queries[1]["sql"]
+        )
+
+    def test_deadline(self):
+        queryset = Chapter.objects.execution_limits(timeout=60)
+        with deadline(10):
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(queryset.count(), 1)
+                self.assertEqual(Chapter.objects.count(), 1)
+        for query in ctx.captured_queries:
+            timeout = int(query["sql"].split("MAX_EXECUTION_TIME(")[1].split(")")[0])
+            self.assertLessEqual(timeout, 10000)
+        with deadline(0.01):
+            time.sleep(0.02)
+            with self.assertRaisesMessage(
+                ExecutionTimeExceeded, "The deadline of the queries is over."
+            ):
+                list(Chapter.objects.all())
+
+    def test_block(self):
+        previous = self.get_variables()
+        with execution_limits(timeout=2, memory_quota=64):
+            self.assertEqual(self.get_variables(), (2000, 64 * 1024 * 1024))
+            self.assertEqual(Chapter.objects.count(), 1)
+        self.assertEqual(self.get_variables(), previous)
+
+    def test_invalid_limits(self):
+        with self.assertRaisesMessage(ValueError, "Set a timeout, a memory quota"):
+            Chapter.objects.execution_limits()
+        with self.assertRaisesMessage(ValueError, "The timeout must be positive."):
+            execution_limits(timeout=0)
+        msg = "The memory quota must be a positive number of MB."
+        with self.assertRaisesMessage(ValueError, msg):
+            Chapter.objects.execution_limits(memory_quota=0.5)
@@ -0,0 +1,100 @@
+from django.core.exceptions import FieldError
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from django_tidb.query import TiDBQuerySet
+
+from .models import Chapter, Course
+
+
+class TiDBHintsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.course = Course.objects.create(name="TiDB")
+        Chapter.objects.create(course=cls.course, title="Optimizer")
+        Chapter.objects.create(course=cls.course, title="Hints")
+
+    def test_join_hints(self):
+        queryset = Chapter.objects.hints(
+            "HASH_JOIN(self, course)", "READ_CONSISTENT_REPLICA()"
+        ).filter(course__name="TiDB")
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(queryset.count(), 2)
+        self.assertIn(
+            "/*+ HASH_JOIN(tidb_chapter, tidb_course) READ_CONSISTENT_REPLICA() */",
+            ctx.captured_queries[0]["sql"],
+        )
+
+    def test_select_related(self):
+        queryset = Chapter.objects.hints("INL_JOIN(course)").select_related("course")
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(queryset[0].course, self.course)
+        self.assertIn(
+            "SELECT /*+ INL_JOIN(tidb_course) */", ctx.captured_queries[0]["sql"]
+        )
+
+    def test_subquery(self):
+        subquery = Chapter.objects.hints(
+            "USE_INDEX(self, PRIMARY)", "IGNORE_PLAN_CACHE()"
+        ).values("course")
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(Course.objects.filter(pk__in=subquery).count(), 1)
+        sql = ctx.captured_queries[0]["sql"]
+        self.assertIn("SELECT /*+ USE_INDEX(U0, PRIMARY) */", sql)
+        self.assertNotIn("IGNORE_PLAN_CACHE", sql)
+
+    def test_update_and_delete(self):
+        queryset = Chapter.objects.hints("USE_INDEX(self, PRIMARY)")
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(queryset.filter(title="Hints").update(title="Plans"), 1)
+            self.assertEqual(queryset.filter(title="Plans").delete()[0], 1)
+        self.assertIn(
+            "UPDATE /*+ USE_INDEX(tidb_chapter, PRIMARY) */",
+            ctx.captured_queries[0]["sql"],
+        )
+        self.assertTrue(
+            any(
+                query["sql"].startswith(
+                    "DELETE /*+ USE_INDEX(tidb_chapter, PRIMARY) */"
+                )
+                for query in ctx.captured_queries
+            )
+        )
+
+    def test_multivalued_relation(self):
+        queryset = TiDBQuerySet(Course).hints("MERGE_JOIN(self, chapters)")
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(queryset.filter(chapters__title="Hints").count(), 1)
+        self.assertIn(
+            "MERGE_JOIN(tidb_course, tidb_chapter)", ctx.captured_queries[0]["sql"]
+        )
+
+    def test_invalid_hints(self):
+        msg = "Unknown optimizer hint 'NO_SUCH_HINT'."
+        with self.assertRaisesMessage(ValueError, msg):
+            Chapter.objects.hints("NO_SUCH_HINT()")
+        msg = "The HASH_JOIN hint requires at least one table."
+        with self.assertRaisesMessage(ValueError, msg):
+            Chapter.objects.hints("HASH_JOIN()")
+        msg = "Invalid argument 'course) */ DROP(' in the HASH_JOIN hint."
+        with self.assertRaisesMessage(ValueError, msg):
+            Chapter.objects.hints("HASH_JOIN(course) */ DROP()")
+
+    def test_invalid_tables(self):
+        msg = "Invalid table 'course' in an optimizer hint: the query doesn't join it."
+        with self.assertRaisesMessage(FieldError, msg):
+            list(Chapter.objects.hints("HASH_JOIN(course)"))
+        msg = "Invalid table 'title' in an optimizer hint: 'title' isn't a relation."
+        with self.assertRaisesMessage(FieldError, msg):
+            list(Chapter.objects.hints("HASH_JOIN(title)"))
+
+    def test_invalid_tables_in_writes(self):
+        # The writes mark the transaction for rollback when they fail.
+        msg = "Invalid table 'cours' in an optimizer hint"
+        with self.assertRaisesMessage(FieldError, msg), transaction.atomic():
+            Chapter.objects.hints("HASH_JOIN(cours)").update(title="Plans")
+        msg = "Invalid table 'course' in an optimizer hint: the query doesn't join it."
+        with self.assertRaisesMessage(FieldError, msg), transaction.atomic():
+            Chapter.objects.hints("HASH_JOIN(course)").filter(title="Hints").delete()
+        self.assertEqual(Chapter.objects.filter(title="Hints").count(), 1)
@@ -0,0 +1,189 @@
+from django.db import DatabaseError, connection
+from django.test import SimpleTestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from django_tidb.introspection import DatabaseIntrospection, clear_introspection_cache
+
+from .models import BigAutoRandomModel, Course, DeferredPayload
+
+# The sizes that information_schema.columns doesn't provide for the column
+# types of the models, so that bulk mode, which doesn't read
+# cursor.description, leaves them to None.
+MISSING_SIZES = {
+    # numeric_precision and numeric_scale, no character_maximum_length.
+    "bigint": ("display_size", "internal_size"),
+    # character_maximum_length, no numeric_precision or numeric_scale.
+    "varchar": ("precision", "scale"),
+    "json": ("display_size", "internal_size", "precision", "scale"),
+}
+
+
+class TiDBBulkIntrospectionTests(TransactionTestCase):
+    available_apps = ["tidb"]
+    models = [Course, BigAutoRandomModel, DeferredPayload]
+
+    def introspect(self):
+        results = {}
+        with connection.cursor() as cursor:
+            for model in self.models:
+                table = model._meta.db_table
+                results[table] = (
+                    connection.introspection.get_table_description(cursor, table),
+                    connection.introspection.get_relations(cursor, table),
+                    connection.introspection.get_constraints(cursor, table),
+                )
+        return results
+
+    def test_bulk_mode_matches_per_table_introspection(self):
+        expected = self.introspect()
+        with connection.introspection.bulk_mode():
+            results = self.introspect()
+        for table, (description, relations, constraints) in expected.items():
+            with self.subTest(table=table):
+                bulk_description, bulk_relations, bulk_constraints = results[table]
+                self.assertEqual(len(bulk_description), len(description))
+                for bulk_field, field in zip(bulk_description, description):
+                    missing = MISSING_SIZES[field.data_type]
+                    for name in missing:
+                        self.assertIn(
+                            getattr(bulk_field, name), (None, getattr(field, name))
+                        )
+                    self.assertEqual(
+                        bulk_field._replace(**{name: None for name in missing}),
+                        field._replace(**{name: None for name in missing}),
+                    )
+                self.assertEqual(bulk_relations, relations)
+                self.assertEqual(bulk_constraints, constraints)
+
+    def test_bulk_mode_query_count(self):
+        with connection.introspection.bulk_mode():
+            self.introspect()
+            with CaptureQueriesContext(connection) as ctx:
+                self.introspect()
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_bulk_mode_cleared_by_ddl(self):
+        table = Course._meta.db_table
+        with connection.introspection.bulk_mode():
+            with connection.cursor() as cursor:
+                connection.introspection.get_table_description(cursor, table)
+            with connection.schema_editor() as editor:
+                editor.execute("ALTER TABLE %s ADD COLUMN extra INT" % table)
+            try:
+                with connection.cursor() as cursor:
+                    description = connection.introspection.get_table_description(
+                        cursor, table
+                    )
+                self.assertIn("extra", [f.name for f in description])
+            finally:
+                with connection.schema_editor() as editor:
+                    editor.execute("ALTER TABLE %s DROP COLUMN extra" % table)
+
+
+class DeniedCursor:
+    def __init__(self):
+        self.queries = []
+
+    def execute(self, query, args=None):
+        self.queries.append(query)
+        raise DatabaseError("Access denied.")
+
+
+class FakeConnection:
+    alias = "default"
+    settings_dict = {
+        "HOST": "",
+        "PORT": "",
+        "USER": "",
+        "NAME": "",
+        "OPTIONS": {"introspection_cache": {"schema_version_ttl": 0}},
+    }
+
+    def __init__(self):
+        self.connection = object()
+
+
+class TiDBSchemaVersionUnavailableTests(SimpleTestCase):
+    def test_disabled_for_the_connection(self):
+        fake_connection = FakeConnection()
+        introspection = DatabaseIntrospection(fake_connection)
+        cursor = DeniedCursor()
+        loaded = []
+
+        def loader(cursor):
+            loaded.append(cursor)
+            return []
+
+        with self.assertLogs("django.db.backends", "WARNING") as logs:
+            for _ in range(3):
+                introspection._cached(cursor, "tables", None, loader)
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn("introspection cache of the 'default'", logs.output[0])
+        self.assertEqual(len(loaded), 3)
+        self.assertEqual(
+            cursor.queries,
+            ["ADMIN SHOW DDL", "SELECT MAX(job_id) FROM information_schema.ddl_jobs"],
+        )
+        # A new database connection tries again.
+        fake_connection.connection = object()
+        with self.assertLogs("django.db.backends", "WARNING"):
+            introspection._cached(cursor, "tables", None, loader)
+        self.assertEqual(len(cursor.queries), 4)
+
+
+class TiDBIntrospectionCacheTests(TransactionTestCase):
+    available_apps = ["tidb"]
+
+    def setUp(self):
+        options = connection.settings_dict["OPTIONS"]
+        self.addCleanup(options.pop, "introspection_cache", None)
+        self.addCleanup(clear_introspection_cache)
+        options["introspection_cache"] = {"schema_version_ttl": 60}
+        clear_introspection_cache()
+        connection.introspection.schema_changed()
+
+    def describe(self, table):
+        with connection.cursor() as cursor:
+            return connection.introspection.get_table_description(cursor, table)
+
+    def test_schema_version(self):
+        with connection.cursor() as cursor:
+            version = connection.introspection.get_schema_version(cursor)
+            self.assertIsInstance(version, int)
+            with connection.schema_editor() as editor:
+                editor.execute("CREATE TABLE tidb_cache_version (id INT)")
+                editor.execute("DROP TABLE tidb_cache_version")
+            self.assertGreater(
+                connection.introspection.get_schema_version(cursor), version
+            )
+
+    def test_cached_results(self):
+        table = Course._meta.db_table
+        description = self.describe(table)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.describe(table), description)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_cached_results_are_copies(self):
+        table = Course._meta.db_table
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, table)
+            constraints.clear()
+            self.assertNotEqual(
+                connection.introspection.get_constraints(cursor, table), {}
+            )
+
+    def test_cache_invalidated_by_ddl(self):
+        table = Course._meta.db_table
+        self.describe(table)
+        with connection.schema_editor() as editor:
+            editor.execute("ALTER TABLE %s ADD COLUMN extra INT" % table)
+        try:
+            self.assertIn("extra", [f.name for f in self.describe(table)])
+        finally:
+            with connection.schema_editor() as editor:
+                editor.execute("ALTER TABLE %s DROP COLUMN extra" % table)
+        self.assertNotIn("extra", [f.name for f in self.describe(table)])
+
+    def test_connection_params(self):
+        self.assertNotIn("introspection_cache", connection.get_connection_params())
@@ -0,0 +1,259 @@
+import copy
+import threading
+import time
+from unittest import mock
+
+import MySQLdb
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.backends.mysql.base import DatabaseWrapper as MysqlDatabaseWrapper
+from django.test import SimpleTestCase, TransactionTestCase
+
+from django_tidb.base import DatabaseWrapper
+from django_tidb.pool import ConnectionPool, PoolClosed, PoolTimeout
+from django_tidb.session import read_staleness
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.alive = True
+        self.pings = 0
+
+    def ping(self):
+        self.pings += 1
+        if not self.alive:
+            raise MySQLdb.OperationalError(2006, "MySQL server has gone away")
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def new_pool(self, **options):
+        self.opened = []
+
+        def connect():
+            self.opened.append(FakeConnection())
+            return self.opened[-1]
+
+        return ConnectionPool(connect, **options)
+
+    def test_reuse(self):
+        pool = self.new_pool()
+        conn = pool.getconn()
+        self.assertIs(pool.is_reused(conn), False)
+        pool.putconn(conn)
+        self.assertIs(pool.getconn(), conn)
+        self.assertIs(pool.is_reused(conn), True)
+        self.assertEqual(len(self.opened), 1)
+        stats = pool.get_stats()
+        self.assertEqual(stats["requests_num"], 2)
+        self.assertEqual(stats["connections_num"], 1)
+        self.assertEqual(stats["pool_size"], 1)
+        self.assertEqual(stats["pool_available"], 0)
+
+    def test_max_size_timeout(self):
+        pool = self.new_pool(max_size=1, timeout=0.01)
+        pool.getconn()
+        with self.assertRaises(PoolTimeout):
+            pool.getconn()
+        self.assertEqual(pool.get_stats()["requests_errors"], 1)
+
+    def test_wait_for_returned_connection(self):
+        pool = self.new_pool(max_size=1, timeout=5)
+        conn = pool.getconn()
+        timer = threading.Timer(0.05, pool.putconn, [conn])
+        timer.start()
+        self.assertIs(pool.getconn(), conn)
+        timer.join()
+        self.assertEqual(pool.get_stats()["requests_queued"], 1)
+
+    def test_max_lifetime(self):
+        pool = self.new_pool(max_lifetime=0)
+        conn = pool.getconn()
+        pool.putconn(conn)
+        self.assertIs(conn.closed, True)
+        self.assertIsNot(pool.getconn(), conn)
+
+    def test_max_idle_keeps_min_size(self):
+        pool = self.new_pool(min_size=1, max_idle=0)
+        first, second = pool.getconn(), pool.getconn()
+        pool.putconn(first)
+        pool.putconn(second)
+        self.assertEqual([first.closed, second.closed], [True, False])
+        self.assertEqual(pool.get_stats()["pool_size"], 1)
+
+    def test_min_size_opened_with_the_pool(self):
+        pool = self.new_pool(min_size=2)
+        stats = pool.get_stats()
+        self.assertEqual(stats["pool_size"], 2)
+        self.assertEqual(stats["pool_available"], 2)
+        self.assertEqual(stats["connections_num"], 2)
+        self.assertNotIn("requests_num", stats)
+        # Session variables are set on the first checkout.
+        conn = pool.getconn()
+        self.assertIn(conn, self.opened)
+        self.assertIs(pool.is_reused(conn), False)
+        self.assertEqual(len(self.opened), 2)
+
+    def test_min_size_topped_up(self):
+        pool = self.new_pool(min_size=2)
+        conn = pool.getconn()
+        pool.putconn(conn, discard=True)
+        self.assertEqual(len(self.opened), 3)
+        self.assertEqual(pool.get_stats()["pool_size"], 2)
+        pool.close()
+        self.assertEqual(pool.get_stats()["pool_size"], 0)
+
+    def test_min_size_connection_errors(self):
+        def connect():
+            raise MySQLdb.OperationalError(2003, "Can't connect")
+
+        pool = ConnectionPool(connect, min_size=2)
+        stats = pool.get_stats()
+        self.assertEqual(stats["pool_size"], 0)
+        self.assertEqual(stats["connections_errors"], 1)
+        with self.assertRaises(MySQLdb.OperationalError):
+            pool.getconn()
+
+    def test_liveness_check(self):
+        pool = self.new_pool(check_interval=0)
+        conn = pool.getconn()
+        pool.putconn(conn)
+        conn.alive = False
+        new_conn = pool.getconn()
+        self.assertIsNot(new_conn, conn)
+        self.assertIs(conn.closed, True)
+        self.assertEqual(pool.get_stats()["connections_lost"], 1)
+
+    def test_no_liveness_check_when_recently_used(self):
+        pool = self.new_pool(check_interval=60)
+        conn = pool.getconn()
+        pool.putconn(conn)
+        pool.getconn()
+        self.assertEqual(conn.pings, 0)
+
+    def test_discard(self):
+        pool = self.new_pool()
+        conn = pool.getconn()
+        pool.putconn(conn, discard=True)
+        self.assertIs(conn.closed, True)
+        self.assertEqual(pool.get_stats()["pool_size"], 0)
+
+    def test_close(self):
+        pool = self.new_pool()
+        idle, in_use = pool.getconn(), pool.getconn()
+        pool.putconn(idle)
+        pool.close()
+        self.assertIs(idle.closed, True)
+        with self.assertRaises(PoolClosed):
+            pool.getconn()
+        pool.putconn(in_use)
+        self.assertIs(in_use.closed, True)
+
+    def test_invalid_options(self):
+        with self.assertRaisesMessage(ValueError, "Unknown pool options: size."):
+            self.new_pool(size=1)
+        with self.assertRaises(ValueError):
+            self.new_pool(min_size=2, max_size=1)
+
+    def test_threads(self):
+        pool = self.new_pool(max_size=3)
+
+        def work():
+            for _i in range(20):
+                conn = pool.getconn()
+                time.sleep(0.001)
+                pool.putconn(conn)
+
+        threads = [threading.Thread(target=work) for _i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLessEqual(len(self.opened), 3)
+        self.assertEqual(pool.get_stats()["requests_num"], 160)
+
+
+class TiDBPoolTests(TransactionTestCase):
+    available_apps = ["tidb"]
+
+    def new_wrapper(self, pool=True, **settings):
+        settings_dict = copy.deepcopy(connection.settings_dict)
+        settings_dict["OPTIONS"]["pool"] = pool
+        settings_dict.update(settings)
+        return DatabaseWrapper(settings_dict, alias=connection.alias)
+
+    def tearDown(self):
+        for pool in DatabaseWrapper._connection_pools.values():
+            pool.close()
+        DatabaseWrapper._connection_pools.clear()
+
+    def test_connections_are_reused(self):
+        wrapper = self.new_wrapper()
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+        wrapper.close()
+        self.assertIsNone(wrapper.connection)
+        other = self.new_wrapper()
+        self.assertIs(other.pool, wrapper.pool)
+        with mock.patch.object(MysqlDatabaseWrapper, "init_connection_state") as init:
+            other.ensure_connection()
+        self.assertIs(other.connection, raw)
+        # The session variables were already set.
+        init.assert_not_called()
+        with other.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            self.assertEqual(cursor.fetchone(), (1,))
+        other.close()
+        self.assertEqual(wrapper.pool.get_stats()["connections_num"], 1)
+
+    def test_changed_session_variables(self):
+        wrapper = self.new_wrapper()
+        with mock.patch("django_tidb.session.connections", {connection.alias: wrapper}):
+            # Restored on exit, the connection is reused.
+            with read_staleness(5):
+                raw = wrapper.connection
+            wrapper.close()
+            wrapper.ensure_connection()
+            self.assertIs(wrapper.connection, raw)
+            # Closed within the block, the connection is discarded.
+            with read_staleness(5):
+                wrapper.close()
+        other = self.new_wrapper()
+        other.ensure_connection()
+        self.assertIsNot(other.connection, raw)
+        with other.cursor() as cursor:
+            cursor.execute("SELECT @@tidb_read_staleness")
+            self.assertEqual(int(cursor.fetchone()[0]), 0)
+        other.close()
+        self.assertEqual(wrapper.pool.get_stats()["connections_num"], 2)
+
+    def test_rollback_on_return(self):
+        wrapper = self.new_wrapper()
+        wrapper.set_autocommit(False)
+        with wrapper.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        with mock.patch.object(
+            wrapper.connection, "rollback", wraps=wrapper.connection.rollback
+        ) as rollback:
+            wrapper.close()
+        rollback.assert_called_once()
+
+    def test_pool_options(self):
+        wrapper = self.new_wrapper(pool={"max_size": 2, "max_idle": 5})
+        self.assertEqual(wrapper.pool.max_size, 2)
+        self.assertEqual(wrapper.pool.max_idle, 5)
+        self.assertNotIn("pool", wrapper.get_connection_params())
+
+    def test_invalid_pool_options(self):
+        wrapper = self.new_wrapper(pool={"size": 2})
+        with self.assertRaisesMessage(ImproperlyConfigured, "Invalid pool options"):
+            wrapper.pool
+
+    def test_persistent_connections(self):
+        wrapper = self.new_wrapper(CONN_MAX_AGE=60)
+        msg = "Pooling doesn't support persistent connections."
+        with self.assertRaisesMessage(ImproperlyConfigured, msg):
+            wrapper.pool
@@ -0,0 +1,65 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from django_tidb.session import replica_read
+
+from .models import Chapter, Course
+
+
+class TiDBReplicaReadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        course = Course.objects.create(name="TiDB")
+        Chapter.objects.create(course=course, title="Replicas")
+
+    def get_replica_read(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT @@tidb_replica_read")
+            return cursor.fetchone()[0]
+
+    def test_queryset(self):
+        with CaptureQueriesContext(connection) as ctx:
+            chapters = list(
+                Chapter.objects.replica_read("closest-replicas").filter(
+                    course__name="TiDB"
+                )
+            )
+        self.assertEqual(len(chapters), 1)
+        self.assertIn(
+            "SELECT /*+ SET_VAR(tidb_replica_read='closest-replicas') */",
+            ctx.captured_queries[0]["sql"],
+        )
+
+    def test_queryset_aggregate(self):
+        queryset = Chapter.objects.replica_read("follower").distinct()
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(queryset.count(), 1)
+        self.assertTrue(
+            ctx.captured_queries[0]["sql"].startswith(
+                "SELECT /*+ SET_VAR(tidb_replica_read='follower') */"
+            )
+        )
+
+    def test_subquery(self):
+        subquery = Chapter.objects.replica_read("follower").values("course")
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(Course.objects.filter(pk__in=subquery).count(), 1)
+        self.assertNotIn("SET_VAR", ctx.captured_queries[0]["sql"])
+
+    def test_block(self):
+        previous = self.get_replica_read()
+        with replica_read("closest-replicas"):
+            self.assertEqual(self.get_replica_read(), "closest-replicas")
+            self.assertEqual(Chapter.objects.count(), 1)
+        self.assertEqual(self.get_replica_read(), previous)
+        with connection.replica_read("leader-and-follower"):
+            self.assertEqual(self.get_replica_read(), "leader-and-follower")
+        self.assertEqual(self.get_replica_read(), previous)
+
+    def test_invalid_mode(self):
+        msg = "Unknown replica read mode 'nearest'"
+        with self.assertRaisesMessage(ValueError, msg):
+            Chapter.objects.replica_read("nearest")
+        with self.assertRaisesMessage(ValueError, msg):
+            replica_read("nearest")
@@ -0,0 +1,57 @@
+import copy
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+
+from django_tidb.base import DatabaseWrapper, clear_server_data_cache
+
+PINNED_SERVER_DATA = {
+    "version": "8.0.11-TiDB-v8.5.0",
+    "sql_mode": "STRICT_TRANS_TABLES,NO_ENGINE_SUBSTITUTION",
+    "default_storage_engine": "InnoDB",
+    "sql_auto_is_null": False,
+    "lower_case_table_names": True,
+    "has_zoneinfo_database": True,
+}
+
+
+class TiDBServerDataTests(TestCase):
+    def new_wrapper(self, **options):
+        settings_dict = copy.deepcopy(connection.settings_dict)
+        settings_dict["OPTIONS"].update(options)
+        return DatabaseWrapper(settings_dict, alias=connection.alias)
+
+    def test_shared_by_connections(self):
+        clear_server_data_cache()
+        self.addCleanup(clear_server_data_cache)
+        data = self.new_wrapper().tidb_server_data
+        with mock.patch.object(DatabaseWrapper, "_probe_server_data") as probe:
+            wrapper = self.new_wrapper()
+            self.assertEqual(wrapper.tidb_server_data, data)
+            self.assertEqual(wrapper.mysql_server_data, data)
+            self.assertEqual(wrapper.tidb_version, connection.tidb_version)
+        probe.assert_not_called()
+
+    def test_pinned(self):
+        with mock.patch.object(DatabaseWrapper, "_probe_server_data") as probe:
+            wrapper = self.new_wrapper(server_data=PINNED_SERVER_DATA)
+            self.assertEqual(wrapper.tidb_server_data, PINNED_SERVER_DATA)
+            self.assertEqual(wrapper.tidb_version, (8, 5, 0))
+            self.assertEqual(
+                wrapper.sql_mode, {"STRICT_TRANS_TABLES", "NO_ENGINE_SUBSTITUTION"}
+            )
+            self.assertIs(wrapper.features.ignores_table_name_case, True)
+        probe.assert_not_called()
+
+    def test_partially_pinned(self):
+        wrapper = self.new_wrapper(server_data={"has_zoneinfo_database": False})
+        self.assertIs(wrapper.tidb_server_data["has_zoneinfo_database"], False)
+        self.assertEqual(
+            wrapper.tidb_server_data["version"],
+            connection.tidb_server_data["version"],
+        )
+
+    def test_connection_params(self):
+        wrapper = self.new_wrapper(server_data=PINNED_SERVER_DATA)
+        self.assertNotIn("server_data", wrapper.get_connection_params())
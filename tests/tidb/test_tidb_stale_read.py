@@ -0,0 +1,93 @@
+import datetime
+import time
+
+from django.db import NotSupportedError, connection
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from django_tidb.query import TiDBQuerySet
+from django_tidb.session import read_staleness, session_variables
+
+from .models import Chapter, Course
+
+
+class TiDBStaleReadTests(TransactionTestCase):
+    available_apps = ["tidb"]
+
+    def setUp(self):
+        self.course = Course.objects.create(name="TiDB")
+        Chapter.objects.create(course=self.course, title="Stale reads")
+        # Let the rows become visible to the reads in the past.
+        time.sleep(1)
+
+    def test_stale(self):
+        with CaptureQueriesContext(connection) as ctx:
+            chapters = list(Chapter.objects.stale(0.5).filter(course__name="TiDB"))
+        self.assertEqual(len(chapters), 1)
+        sql = ctx.captured_queries[0]["sql"]
+        self.assertEqual(sql.count("AS OF TIMESTAMP TIDB_BOUNDED_STALENESS("), 2)
+
+    def test_stale_exact(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(Chapter.objects.stale(0.5, exact=True).count(), 1)
+        self.assertIn(
+            "AS OF TIMESTAMP NOW() - INTERVAL", ctx.captured_queries[0]["sql"]
+        )
+
+    def test_as_of(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT NOW(6)")
+            before = cursor.fetchone()[0]
+        Chapter.objects.create(course=self.course, title="New")
+        self.assertEqual(Chapter.objects.count(), 2)
+        self.assertEqual(Chapter.objects.as_of(str(before)).count(), 1)
+        self.assertEqual(
+            list(Chapter.objects.as_of(before).values_list("title", flat=True)),
+            ["Stale reads"],
+        )
+
+    def test_as_of_aware_datetime(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT UNIX_TIMESTAMP(NOW(6))")
+            now = float(cursor.fetchone()[0])
+        timestamp = datetime.datetime.fromtimestamp(now, tz=datetime.timezone.utc)
+        self.assertEqual(Chapter.objects.as_of(timestamp).count(), 1)
+
+    def test_invalid_values(self):
+        with self.assertRaises(TypeError):
+            Chapter.objects.as_of(1)
+        with self.assertRaises(ValueError):
+            Chapter.objects.stale(-1)
+
+    def test_read_only(self):
+        msg = "Stale reads are read-only"
+        with self.assertRaisesMessage(NotSupportedError, msg):
+            Chapter.objects.stale(1).update(title="x")
+        with self.assertRaisesMessage(NotSupportedError, msg):
+            Chapter.objects.stale(1).delete()
+        # Deleted through the collector, which cascades to the chapters.
+        with self.assertRaisesMessage(NotSupportedError, msg):
+            TiDBQuerySet(Course).stale(1).delete()
+        self.assertEqual(Course.objects.count(), 1)
+
+    def test_read_staleness(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT @@tidb_read_staleness")
+            previous = cursor.fetchone()[0]
+        with read_staleness(5):
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT @@tidb_read_staleness")
+                self.assertEqual(int(cursor.fetchone()[0]), -5)
+            Chapter.objects.count()
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT @@tidb_read_staleness")
+            self.assertEqual(cursor.fetchone()[0], previous)
+        with read_staleness(0.5):
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT @@tidb_read_staleness")
+                self.assertEqual(int(cursor.fetchone()[0]), -1)
+
+    def test_invalid_session_variable(self):
+        with self.assertRaisesMessage(ValueError, "Invalid session variable name"):
+            with session_variables(**{"tidb_read_staleness = 0; --": 1}):
+                pass
@@ -0,0 +1,55 @@
+from django.db import connection
+from django.db.models import Count
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from django_tidb.session import using_engine
+
+from .models import Chapter, Course
+
+
+class TiDBStorageEngineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        course = Course.objects.create(name="TiDB")
+        Chapter.objects.create(course=course, title="TiFlash")
+        Chapter.objects.create(course=course, title="MPP")
+
+    def get_variables(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT @@tidb_isolation_read_engines, @@tidb_enforce_mpp")
+            return cursor.fetchone()
+
+    def test_queryset(self):
+        queryset = (
+            Chapter.objects.using_engine("tiflash", mpp=True)
+            .values("course__name")
+            .annotate(n=Count("id"))
+        )
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(list(queryset), [{"course__name": "TiDB", "n": 2}])
+        # Without TiFlash replicas, TiDB ignores the hints with a warning.
+        self.assertIn(
+            "SELECT /*+ SET_VAR(tidb_enforce_mpp=1) "
+            "READ_FROM_STORAGE(TIFLASH[tidb_chapter, tidb_course]) */",
+            ctx.captured_queries[0]["sql"],
+        )
+
+    def test_subquery_aliases(self):
+        subquery = Chapter.objects.using_engine("tikv").values("course")
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(Course.objects.filter(pk__in=subquery).count(), 1)
+        self.assertIn("READ_FROM_STORAGE(TIKV[U0])", ctx.captured_queries[0]["sql"])
+
+    def test_block(self):
+        previous = self.get_variables()
+        with using_engine("tikv"):
+            self.assertEqual(self.get_variables()[0], "tikv,tidb")
+            self.assertEqual(Chapter.objects.count(), 2)
+        self.assertEqual(self.get_variables(), previous)
+
+    def test_invalid_engine(self):
+        with self.assertRaisesMessage(ValueError, "Unknown storage engine 'tidb'"):
+            Chapter.objects.using_engine("tidb")
+        with self.assertRaisesMessage(ValueError, "MPP execution requires"):
+            using_engine("tikv", mpp=True)
@@ -5,6 +5,7 @@ from django_tidb.fields.vector import (
     VectorIndex,
     CosineDistance,
     L2Distance,
+    VectorQuerySet,
 )
 
 
@@ -12,16 +13,51 @@ class Document(models.Model):
     content = models.TextField()
     embedding = VectorField()
 
+    objects = VectorQuerySet.as_manager()
+
 
 class DocumentExplicitDimension(models.Model):
     content = models.TextField()
     embedding = VectorField(dimensions=3)
 
+    objects = VectorQuerySet.as_manager()
+
+
+class DocumentNullable(models.Model):
+    content = models.TextField()
+    version = models.IntegerField(default=0)
+    embedding = VectorField(null=True)
+
+    objects = VectorQuerySet.as_manager()
+
+
+class DocumentHalfPrecision(models.Model):
+    content = models.TextField()
+    embedding = VectorField(dimensions=3, dtype="float16")
+
+    objects = VectorQuerySet.as_manager()
+
+
+class DocumentLazy(models.Model):
+    content = models.TextField()
+    embedding = VectorField(dimensions=3, lazy=True)
+
+    objects = VectorQuerySet.as_manager()
+
+
+class DocumentDeferred(models.Model):
+    content = models.TextField()
+    embedding = VectorField(dimensions=3, load="deferred")
+
+    objects = VectorQuerySet.as_manager()
+
 
 class DocumentWithAnnIndex(models.Model):
     content = models.TextField()
     embedding = VectorField(dimensions=3)
 
+    objects = VectorQuerySet.as_manager()
+
     class Meta:
         indexes = [
             VectorIndex(CosineDistance("embedding"), name="idx_cos"),
@@ -1,15 +1,500 @@
 import numpy as np
+import os
+import pickle
+import tempfile
+import threading
+import time
 from math import sqrt
+from unittest import mock
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Value
 from django.db.utils import OperationalError
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
 from django_tidb.fields.vector import (
     CosineDistance,
     L1Distance,
     L2Distance,
+    LazyVector,
+    LocalVectorIndex,
     NegativeInnerProduct,
+    VectorField,
+    VectorIndex,
+    VectorIndexProgress,
+    VectorLiteralCache,
+    decode_vector,
+    encode_vector,
+    encode_vector_base64,
+    export_vectors,
+    reciprocal_rank_fusion,
+    vector_literal_cache,
+    weighted_score_fusion,
 )
+from django_tidb.management.commands.tidb_export_vectors import (
+    Command as ExportVectorsCommand,
+)
+
+from .models import (
+    Document,
+    DocumentDeferred,
+    DocumentExplicitDimension,
+    DocumentHalfPrecision,
+    DocumentLazy,
+    DocumentNullable,
+    DocumentWithAnnIndex,
+)
+
+
+class VectorCodecTests(SimpleTestCase):
+    def test_round_trip(self):
+        rng = np.random.default_rng(0)
+        vectors = (
+            rng.standard_normal(1536).astype(np.float32),
+            # Arbitrary finite float32 bit patterns, including subnormals.
+            rng.integers(0, 2**31, size=10000, dtype=np.uint32).view(np.float32),
+            np.array(
+                [0, -0.0, 1, -1, 1000, 1e-45, 3.4028235e38, 999.99994, 0.1],
+                dtype=np.float32,
+            ),
+        )
+        for vector in vectors:
+            with self.subTest(size=vector.size):
+                vector = vector[np.isfinite(vector)]
+                self.assertTrue(
+                    np.array_equal(decode_vector(encode_vector(vector)), vector)
+                )
+
+    def test_encode_list(self):
+        self.assertTrue(
+            np.array_equal(decode_vector(encode_vector([1, 2.5, -3])), [1, 2.5, -3])
+        )
+        self.assertEqual(encode_vector([1, -2]), "[1,-2]")
+
+    def test_encode_shortest(self):
+        vector = np.float32(
+            [0.1, -0.0, 12.5, 100, 1e8, 0.00125, 1e-7, 999.99994, 1e-45, 3.4028235e38]
+        )
+        self.assertEqual(
+            encode_vector(vector),
+            "[0.1,-0,12.5,100,1e8,0.00125,1e-7,999.99994,1e-45,3.4028235e38]",
+        )
+
+    def test_encode_invalid(self):
+        with self.assertRaisesMessage(ValueError, "expected ndim to be 1"):
+            encode_vector(np.zeros((2, 2)))
+        with self.assertRaisesMessage(ValueError, "dtype must be numeric"):
+            encode_vector(np.array(["a"]))
+        with self.assertRaisesMessage(ValueError, "expected 3 dimensions, not 2"):
+            encode_vector([1, 2], dim=3)
+        with self.assertRaisesMessage(ValueError, "NaN or infinity"):
+            encode_vector([1, float("nan")])
+
+    def test_decode(self):
+        self.assertIsNone(decode_vector(None))
+        decoded = decode_vector(b"[1,2.5,-3e-2]")
+        self.assertEqual(decoded.dtype, np.float32)
+        self.assertTrue(np.array_equal(decoded, np.float32([1, 2.5, -3e-2])))
+
+    def test_decode_invalid(self):
+        field = VectorField()
+        for value in ["1,2,3", "", "[1,2,]", "[1,,2]", "[1,a]", "AAA", "[1,2"]:
+            with self.subTest(value=value):
+                with self.assertRaisesMessage(ValueError, "Invalid vector, expected"):
+                    field.to_python(value)
+        self.assertEqual(decode_vector("[ ]").size, 0)
+
+
+class VectorSerializationTests(SimpleTestCase):
+    def test_base64_round_trip(self):
+        vector = np.array([1.5, -2, 3e-8], dtype=np.float32)
+        encoded = encode_vector_base64(vector)
+        self.assertEqual(encoded, "AADAPwAAAMBZ2QAz")
+        decoded = decode_vector(encoded)
+        self.assertEqual(decoded.dtype, np.float32)
+        self.assertTrue(decoded.flags.writeable)
+        self.assertTrue(np.array_equal(decoded, vector))
+
+    def test_value_to_string(self):
+        field = VectorField(dimensions=3, serialization="base64")
+        field.set_attributes_from_name("embedding")
+        obj = Document(embedding=np.array([1, 2, 3], dtype=np.float32))
+        value = field.value_to_string(obj)
+        self.assertEqual(value, encode_vector_base64([1, 2, 3]))
+        self.assertTrue(np.array_equal(field.to_python(value), [1, 2, 3]))
+        # The text form is still accepted.
+        self.assertTrue(np.array_equal(field.to_python("[1,2,3]"), [1, 2, 3]))
+
+    def test_deconstruct(self):
+        field = VectorField(serialization="base64")
+        self.assertEqual(field.deconstruct()[3], {"serialization": "base64"})
+        self.assertEqual(VectorField().deconstruct()[3], {})
+
+    def test_check_serialization(self):
+        field = VectorField(serialization="json")
+        field.set_attributes_from_name("embedding")
+        self.assertEqual(
+            [error.msg for error in field.check()],
+            ["Vector serialization must be one of: text, base64"],
+        )
+
+
+class VectorDtypeTests(SimpleTestCase):
+    def test_to_python(self):
+        field = VectorField(dtype="float16")
+        for value in ([1, 2, 3], "[1,2,3]", np.array([1, 2, 3], dtype=np.float32)):
+            with self.subTest(value=value):
+                vector = field.to_python(value)
+                self.assertEqual(vector.dtype, np.float16)
+                self.assertTrue(np.array_equal(vector, [1, 2, 3]))
+
+    def test_validate_out_of_range(self):
+        field = VectorField(dtype="float16")
+        field.set_attributes_from_name("embedding")
+        field.clean([1, 2, 3], None)
+        with self.assertRaisesMessage(
+            ValidationError, "Vector values are out of range for float16."
+        ):
+            field.clean([1e6, 2, 3], None)
+
+    def test_encode(self):
+        vector = np.array([1.5, -2, 3], dtype=np.float16)
+        self.assertEqual(encode_vector(vector), encode_vector([1.5, -2, 3]))
+
+    def test_deconstruct(self):
+        self.assertEqual(
+            VectorField(dtype=np.float16).deconstruct()[3], {"dtype": "float16"}
+        )
+
+    def test_check_dtype(self):
+        field = VectorField(dtype="int8")
+        field.set_attributes_from_name("embedding")
+        self.assertEqual(
+            [error.msg for error in field.check()],
+            ["Vector dtype must be a floating point type, not int8."],
+        )
+
+
+class VectorValidationTests(SimpleTestCase):
+    def get_field(self, **kwargs):
+        field = VectorField(**kwargs)
+        field.set_attributes_from_name("embedding")
+        return field
+
+    def test_valid(self):
+        field = self.get_field(dimensions=3)
+        vector = np.array([1, 2, 3], dtype=np.float32)
+        self.assertIs(field.clean(vector, None), vector)
+        field.clean(LazyVector("[1,2,3]"), None)
+
+    def test_dimensions(self):
+        field = self.get_field(dimensions=3)
+        with self.assertRaisesMessage(
+            ValidationError, "Expected a vector with 3 dimensions, not 2."
+        ):
+            field.clean(np.array([1, 2], dtype=np.float32), None)
+
+    def test_shape_and_dtype(self):
+        field = self.get_field()
+        with self.assertRaisesMessage(ValidationError, "with 1 dimension, not 2"):
+            field.validate(np.ones((2, 2), dtype=np.float32), None)
+        with self.assertRaisesMessage(ValidationError, "must be numbers, not bool"):
+            field.validate(np.array([True, False]), None)
+
+    def test_not_finite(self):
+        field = self.get_field()
+        for value in ([1, np.nan], [1, np.inf], [1, 1e300]):
+            with self.subTest(value=value):
+                with self.assertRaisesMessage(ValidationError, "must be finite"):
+                    field.validate(np.array(value, dtype=np.float64), None)
+
+    def test_blank(self):
+        field = self.get_field()
+        with self.assertRaisesMessage(ValidationError, "cannot be blank"):
+            field.validate(np.array([], dtype=np.float32), None)
+        self.get_field(blank=True).validate(np.array([], dtype=np.float32), None)
+
+    def test_run_validators(self):
+        def validate_unit(value):
+            if not np.isclose(np.linalg.norm(value), 1):
+                raise ValidationError("not a unit vector")
+
+        field = self.get_field(validators=[validate_unit])
+        field.run_validators(np.array([0, 1], dtype=np.float32))
+        with self.assertRaisesMessage(ValidationError, "not a unit vector"):
+            field.run_validators(np.array([1, 1], dtype=np.float32))
+
+
+class LazyVectorTests(SimpleTestCase):
+    def test_decoded_on_access(self):
+        vector = VectorField(lazy=True).from_db_value("[1,2,3]", None, connection)
+        self.assertIsInstance(vector, LazyVector)
+        self.assertEqual(len(vector), 3)
+        self.assertEqual(vector.dtype, np.float32)
+        self.assertIs(vector.is_decoded, False)
+        self.assertTrue(np.array_equal(vector + 1, [2, 3, 4]))
+        self.assertIs(vector.is_decoded, True)
+        self.assertIs(np.asarray(vector), vector.array)
+        self.assertEqual(vector.tolist(), [1, 2, 3])
+        self.assertEqual(vector @ vector, 14)
+
+    def test_get_prep_value(self):
+        field = VectorField(lazy=True)
+        vector = field.from_db_value("[1,2,3]", None, connection)
+        self.assertEqual(field.get_prep_value(vector), "[1,2,3]")
+        self.assertIs(vector.is_decoded, False)
+        vector[0] = 4
+        self.assertEqual(field.get_prep_value(vector), encode_vector([4, 2, 3]))
+
+    def test_raw_bytes(self):
+        field = VectorField(lazy=True)
+        vector = field.from_db_value(memoryview(b"[1,2,3]"), None, connection)
+        self.assertEqual(vector.raw, b"[1,2,3]")
+        self.assertEqual(len(vector), 3)
+        self.assertEqual(field.get_prep_value(vector), "[1,2,3]")
+        self.assertIs(vector.is_decoded, False)
+        self.assertEqual(vector.tolist(), [1, 2, 3])
+        self.assertEqual(len(LazyVector(b"[]")), 0)
+
+    def test_pickle(self):
+        vector = LazyVector("[1,2,3]", "float16")
+        restored = pickle.loads(pickle.dumps(vector))
+        self.assertIs(restored.is_decoded, False)
+        self.assertEqual(restored.dtype, np.float16)
+        vector[0] = 4
+        self.assertEqual(pickle.loads(pickle.dumps(vector)).tolist(), [4, 2, 3])
+
+    def test_deconstruct(self):
+        self.assertEqual(VectorField(lazy=True).deconstruct()[3], {"lazy": True})
+        self.assertEqual(
+            VectorField(load="deferred").deconstruct()[3], {"load": "deferred"}
+        )
+
+
+class VectorLiteralCacheTests(SimpleTestCase):
+    def test_hits_and_misses(self):
+        cache = VectorLiteralCache(maxsize=2)
+        vector = np.array([1, 2, 3], dtype=np.float32)
+        literal = cache.encode(vector)
+        self.assertEqual(literal, encode_vector(vector))
+        self.assertIs(cache.encode(vector.copy()), literal)
+        # Same values with another dtype are a different key.
+        self.assertEqual(cache.encode([1.0, 2.0, 3.0]), literal)
+        self.assertEqual(cache.cache_info(), (1, 2, 2, 2))
+        cache.cache_clear()
+        self.assertEqual(cache.cache_info(), (0, 0, 2, 0))
+
+    def test_eviction(self):
+        cache = VectorLiteralCache(maxsize=2)
+        for vector in ([1], [2], [1], [3], [1], [2]):
+            cache.encode(vector)
+        self.assertEqual(cache.cache_info(), (2, 4, 2, 2))
+        cache.maxsize = 1
+        self.assertEqual(cache.cache_info().currsize, 1)
+        cache.maxsize = 0
+        cache.encode([1])
+        self.assertEqual(cache.cache_info().currsize, 0)
+
+    def test_invalid_vector(self):
+        cache = VectorLiteralCache()
+        with self.assertRaisesMessage(ValueError, "expected ndim to be 1"):
+            cache.encode([[1, 2]])
+        self.assertEqual(cache.cache_info().misses, 0)
+
+    def test_distance_uses_cache(self):
+        vector = np.array([4, 5, 6], dtype=np.float32)
+        before = vector_literal_cache.cache_info()
+        CosineDistance("embedding", vector)
+        CosineDistance("embedding", vector)
+        after = vector_literal_cache.cache_info()
+        self.assertGreaterEqual(after.hits, before.hits + 1)
+
+
+class DistanceComputeTests(SimpleTestCase):
+    vectors = np.array([[1, 1, 1], [2, 2, 2], [1, 1, 2]], dtype=np.float64)
+    vector = np.array([1, 1, 1], dtype=np.float64)
+
+    def test_compute(self):
+        expected = (
+            (L1Distance, [0, 3, 1]),
+            (L2Distance, [0, sqrt(3), 1]),
+            (CosineDistance, [0, 0, 0.05719095841793653]),
+            (NegativeInnerProduct, [-3, -6, -4]),
+        )
+        for distance, values in expected:
+            with self.subTest(distance=distance.__name__):
+                np.testing.assert_allclose(
+                    distance.compute(self.vectors, self.vector), values, atol=1e-12
+                )
+
+    def test_nearest_requires_vector_index(self):
+        with self.assertRaisesMessage(ValueError, "Document has no VectorIndex"):
+            Document.objects.nearest("embedding", [1, 1, 1])
+        with self.assertRaisesMessage(ValueError, "using L1Distance"):
+            DocumentWithAnnIndex.objects.nearest("embedding", [1, 1, 1], metric="l1")
+        with self.assertRaisesMessage(ValueError, "Unknown metric 'dot'"):
+            DocumentWithAnnIndex.objects.nearest("embedding", [1, 1, 1], metric="dot")
+
+    def test_search_requires_literal_vector(self):
+        with self.assertRaisesMessage(ValueError, "literal query vector"):
+            Document.objects.search(L2Distance("embedding", Value("[1,1,1]")), k=1)
+
+
+class VectorIndexOptionsTests(SimpleTestCase):
+    def test_deconstruct(self):
+        index = VectorIndex(L2Distance("embedding"), name="idx")
+        self.assertEqual(index.deconstruct()[2], {"name": "idx"})
+        index = VectorIndex(
+            L2Distance("embedding"),
+            name="idx",
+            tiflash_replica=2,
+            add_columnar_replica_on_demand=True,
+        )
+        kwargs = index.deconstruct()[2]
+        self.assertEqual(kwargs["tiflash_replica"], 2)
+        self.assertIs(kwargs["add_columnar_replica_on_demand"], True)
+
+    def test_invalid_tiflash_replica(self):
+        with self.assertRaisesMessage(ValueError, "positive integer"):
+            VectorIndex(L2Distance("embedding"), name="idx", tiflash_replica=0)
+
+    def test_wait_until_ready(self):
+        index = VectorIndex(L2Distance("embedding"), name="idx")
+        states = [
+            VectorIndexProgress(False, 0.5, 0, 0, False),
+            VectorIndexProgress(True, 1.0, 10, 5, False),
+            VectorIndexProgress(True, 1.0, 15, 0, True),
+        ]
+        seen = []
+        with mock.patch.object(
+            index, "get_build_progress", side_effect=states
+        ), mock.patch("django_tidb.fields.vector.time.sleep"):
+            state = index.wait_until_ready(Document, interval=0, progress=seen.append)
+        self.assertIs(state.ready, True)
+        self.assertEqual(seen, states)
+
+    def test_wait_until_ready_timeout(self):
+        index = VectorIndex(L2Distance("embedding"), name="idx")
+        pending = VectorIndexProgress(True, 1.0, 0, 5, False)
+        clock = [100.0]
+
+        def sleep(seconds):
+            clock[0] += seconds
+
+        with mock.patch.object(
+            index, "get_build_progress", return_value=pending
+        ) as get_build_progress, mock.patch(
+            "django_tidb.fields.vector.time.monotonic", side_effect=lambda: clock[0]
+        ), mock.patch(
+            "django_tidb.fields.vector.time.sleep", side_effect=sleep
+        ):
+            with self.assertRaisesMessage(TimeoutError, "not ready after 1 seconds"):
+                index.wait_until_ready(Document, timeout=1, interval=5)
+        # Polled at the start and at the deadline, not 5 seconds later.
+        self.assertEqual(get_build_progress.call_count, 2)
+        self.assertEqual(clock[0], 101.0)
+
+
+class LocalVectorIndexOptionsTests(SimpleTestCase):
+    def test_invalid_arguments(self):
+        with self.assertRaisesMessage(ValueError, "Unknown metric 'dot'"):
+            LocalVectorIndex(Document, "embedding", metric="dot")
+        with self.assertRaisesMessage(ValueError, "'content' is not a VectorField"):
+            LocalVectorIndex(Document, "content")
+        with self.assertRaisesMessage(ValueError, "'lists' must be"):
+            LocalVectorIndex(Document, "embedding", lists=0)
+        msg = "'pk' can't be a watermark: TiDB doesn't allocate its values"
+        with self.assertRaisesMessage(ValueError, msg):
+            LocalVectorIndex(Document, "embedding", watermark="pk")
+
+    def test_l1_centroids_in_blocks(self):
+        index = LocalVectorIndex(Document, "embedding", metric="l1")
+        rng = np.random.default_rng(0)
+        matrix = rng.standard_normal((50, 8)).astype(np.float32)
+        centroids = matrix[:4]
+        expected = np.abs(matrix[:, None, :] - centroids).sum(axis=2).argmin(axis=1)
+        # One row against the 4 centroids of 8 dimensions already takes more
+        # than 16 elements, so the rows are compared one at a time.
+        with mock.patch("django_tidb.fields.vector._L1_BLOCK_SIZE", 16), mock.patch(
+            "numpy.abs", wraps=np.abs
+        ) as absolute:
+            nearest = index._nearest_centroids(matrix, centroids, 1)[:, 0]
+        self.assertTrue(np.array_equal(nearest, expected))
+        self.assertEqual(absolute.call_count, 50)
+        self.assertEqual(absolute.call_args[0][0].shape, (1, 4, 8))
 
-from .models import Document, DocumentExplicitDimension, DocumentWithAnnIndex
+    def test_search_empty(self):
+        index = LocalVectorIndex(Document, "embedding")
+        pks, distances = index.search([1, 1, 1])
+        self.assertEqual((len(pks), len(distances)), (0, 0))
+
+    def test_max_age_refreshes_once(self):
+        index = LocalVectorIndex(Document, "embedding", max_age=60)
+        calls = []
+
+        def refresh(replace=False):
+            calls.append(replace)
+            time.sleep(0.05)
+            index._refreshed_at = time.monotonic()
+            return 0
+
+        with mock.patch.object(index, "_refresh", side_effect=refresh):
+            threads = [
+                threading.Thread(target=index.search, args=([1, 1, 1],))
+                for _ in range(4)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(calls, [False])
+
+
+class ExportVectorsTests(SimpleTestCase):
+    def test_invalid_fields(self):
+        with self.assertRaisesMessage(ValueError, "'content' is not a VectorField"):
+            export_vectors(Document, "content", "out.npz")
+        with self.assertRaisesMessage(ValueError, "Can't export 'content'"):
+            export_vectors(Document, "embedding", "out.npz", ["content"])
+
+    def test_command_unknown_field(self):
+        for field, fields in [("missing", ""), ("embedding", "content,missing")]:
+            with self.subTest(field=field, fields=fields):
+                with self.assertRaisesMessage(
+                    CommandError, "Document has no field named 'missing'"
+                ):
+                    call_command(
+                        ExportVectorsCommand(),
+                        "tidb_vector.Document",
+                        field,
+                        "out.npz",
+                        fields=fields,
+                    )
+
+
+class RankFusionTests(SimpleTestCase):
+    def test_reciprocal_rank_fusion(self):
+        scores = reciprocal_rank_fusion([["a", "b"], ["b", "c"]], k=1)
+        self.assertEqual(scores, {"a": 1 / 2, "b": 1 / 3 + 1 / 2, "c": 1 / 3})
+        scores = reciprocal_rank_fusion([["a", "b"], ["b", "c"]], [2, 0], k=1)
+        self.assertEqual(scores, {"a": 1, "b": 2 / 3, "c": 0})
+
+    def test_weighted_score_fusion(self):
+        scores = weighted_score_fusion(
+            [{"a": 10, "b": 5, "c": 0}, {"b": -0.5, "c": -0.1}], [1, 2]
+        )
+        self.assertEqual(scores, {"a": 1, "b": 0.5, "c": 2})
+        self.assertEqual(weighted_score_fusion([{"a": 3}, {}]), {"a": 1})
+
+    def test_hybrid_search_invalid_arguments(self):
+        search = DocumentWithAnnIndex.objects.hybrid_search
+        with self.assertRaisesMessage(ValueError, "Unknown fusion 'sum'"):
+            search("content", "text", "embedding", [1, 1, 1], fusion="sum")
+        with self.assertRaisesMessage(ValueError, "(text, vector) pair"):
+            search("content", "text", "embedding", [1, 1, 1], weights=(1,))
+        with self.assertRaisesMessage(ValueError, "Document has no VectorIndex"):
+            Document.objects.hybrid_search("content", "text", "embedding", [1, 1, 1])
 
 
 class TiDBVectorFieldTests(TestCase):
@@ -73,6 +558,162 @@ class TiDBVectorFieldTests(TestCase):
         self.assertEqual([d.content for d in docs], ["2", "3", "1"])
         self.assertEqual([d.distance for d in docs], [-6, -4, -3])
 
+    def test_export_vectors(self):
+        self.create_documents()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "documents")
+            rows = export_vectors(
+                self.model.objects.all(), "embedding", path, ["id"], chunk_size=2
+            )
+            self.assertEqual(rows, 3)
+            pks = np.load(os.path.join(path, "pk.npy"))
+            matrix = np.load(os.path.join(path, "embedding.npy"), mmap_mode="r")
+            self.assertEqual(
+                list(pks),
+                list(self.model.objects.order_by("pk").values_list("pk", flat=True)),
+            )
+            self.assertTrue(np.array_equal(np.load(os.path.join(path, "id.npy")), pks))
+            self.assertTrue(np.array_equal(matrix, [[1, 1, 1], [2, 2, 2], [1, 1, 2]]))
+
+            path = os.path.join(directory, "documents.npz")
+            self.assertEqual(export_vectors(self.model, "embedding", path), 3)
+            with np.load(path) as data:
+                self.assertEqual(sorted(data.files), ["embedding", "pk"])
+                self.assertEqual(data["embedding"].shape, (3, 3))
+
+    def test_local_index(self):
+        self.create_documents()
+        index = LocalVectorIndex(self.model.objects.all(), "embedding", metric="l2")
+        self.assertEqual(index.refresh(), 3)
+        pks, distances = index.search([1, 1, 1], k=2)
+        contents = self.model.objects.in_bulk(list(pks))
+        self.assertEqual([contents[pk].content for pk in pks], ["1", "3"])
+        np.testing.assert_allclose(distances, [0, 1])
+
+        obj = self.model.objects.create(content="4", embedding=[1, 1, 1.5])
+        self.assertEqual(index.refresh(), 4)
+        self.assertEqual(list(index.search([1, 1, 1.5], k=1)[0]), [obj.pk])
+        obj.delete()
+        self.assertEqual(index.reload(), 3)
+        self.assertEqual(len(index), 3)
+
+    def test_local_index_non_monotonic_pks(self):
+        # TiDB servers allocate primary keys from their own batches, a row
+        # inserted later may get a lower one.
+        self.model.objects.create(pk=100, content="1", embedding=[1, 2, 3])
+        index = LocalVectorIndex(self.model, "embedding", metric="l2")
+        self.assertEqual(index.refresh(), 1)
+        obj = self.model.objects.create(pk=10, content="2", embedding=[3, 2, 1])
+        index.refresh()
+        self.assertEqual(len(index), 2)
+        self.assertEqual(list(index.search([3, 2, 1], k=1)[0]), [obj.pk])
+
+    def test_local_index_ivf(self):
+        self.create_documents()
+        index = LocalVectorIndex(
+            self.model, "embedding", metric="cosine", lists=2, nprobe=2
+        )
+        index.refresh()
+        pks, distances = index.search([1, 1, 1], k=3)
+        self.assertEqual(len(pks), 3)
+        np.testing.assert_allclose(distances, [0, 0, 0.05719095841793653], atol=1e-6)
+
+
+class TiDBVectorFieldHalfPrecisionTests(TestCase):
+    def test_create_get(self):
+        obj = DocumentHalfPrecision.objects.create(
+            content="test content",
+            embedding=[1.5, 2, 3],
+        )
+        obj = DocumentHalfPrecision.objects.get(pk=obj.pk)
+        self.assertEqual(obj.embedding.dtype, np.float16)
+        self.assertTrue(np.array_equal(obj.embedding, [1.5, 2, 3]))
+        obj.save()
+        _, matrix = DocumentHalfPrecision.objects.vector_matrix("embedding")
+        self.assertEqual(matrix.dtype, np.float16)
+        self.assertTrue(np.array_equal(matrix, [[1.5, 2, 3]]))
+
+
+class TiDBVectorFieldNullableTests(TestCase):
+    def test_vector_matrix_leading_nulls(self):
+        for i in range(3):
+            DocumentNullable.objects.create(content=f"{i}", embedding=None)
+        DocumentNullable.objects.create(content="3", embedding=[1, 2, 3])
+        docs = DocumentNullable.objects.order_by("content")
+        # Make uninitialized memory visible, fresh allocations are often zeros.
+        with mock.patch("numpy.empty", side_effect=np.ones):
+            _, matrix = docs.vector_matrix("embedding", chunk_size=2)
+        self.assertEqual(matrix.shape, (4, 3))
+        self.assertTrue(np.isnan(matrix[:3]).all())
+        self.assertTrue(np.array_equal(matrix[3], [1, 2, 3]))
+
+    def test_local_index_watermark_lag(self):
+        DocumentNullable.objects.create(content="1", version=5, embedding=[1, 2, 3])
+        index = LocalVectorIndex(
+            DocumentNullable, "embedding", metric="l2", watermark="version", lag=2
+        )
+        self.assertEqual(index.refresh(), 1)
+        # Committed after the first row, with an earlier version.
+        obj = DocumentNullable.objects.create(
+            content="2", version=4, embedding=[3, 2, 1]
+        )
+        self.assertEqual(index.refresh(), 2)
+        self.assertEqual(len(index), 2)
+        self.assertEqual(list(index.search([3, 2, 1], k=1)[0]), [obj.pk])
+        DocumentNullable.objects.create(content="3", version=1, embedding=[1, 1, 1])
+        self.assertEqual(index.refresh(), 2)
+        self.assertEqual(len(index), 2)
+
+    def test_local_index_drops_null_vectors(self):
+        obj = DocumentNullable.objects.create(content="1", embedding=[1, 2, 3])
+        DocumentNullable.objects.create(content="2", embedding=[3, 2, 1])
+        index = LocalVectorIndex(DocumentNullable, "embedding", watermark="content")
+        self.assertEqual(index.refresh(), 2)
+        obj.content = "3"
+        obj.embedding = None
+        obj.save()
+        # The row with the highest watermark is read again.
+        self.assertEqual(index.refresh(), 2)
+        self.assertEqual(len(index), 1)
+        self.assertNotIn(obj.pk, list(index.search([1, 2, 3], k=2)[0]))
+
+
+class TiDBVectorFieldLazyTests(TestCase):
+    def test_create_get(self):
+        obj = DocumentLazy.objects.create(content="test content", embedding=[1, 2, 3])
+        obj = DocumentLazy.objects.get(pk=obj.pk)
+        self.assertIsInstance(obj.embedding, LazyVector)
+        self.assertIs(obj.embedding.is_decoded, False)
+        obj.content = "updated"
+        obj.save()
+        obj = DocumentLazy.objects.get(pk=obj.pk)
+        self.assertTrue(np.array_equal(obj.embedding, [1, 2, 3]))
+
+
+class TiDBVectorFieldDeferredTests(TestCase):
+    def test_deferred_by_default(self):
+        DocumentDeferred.objects.create(content="1", embedding=[1, 2, 3])
+        obj = DocumentDeferred.objects.get()
+        self.assertEqual(obj.get_deferred_fields(), {"embedding"})
+        with self.assertNumQueries(1):
+            self.assertTrue(np.array_equal(obj.embedding, [1, 2, 3]))
+
+    def test_prefetch_deferred(self):
+        for v in ([1, 1, 1], [2, 2, 2]):
+            DocumentDeferred.objects.create(content=str(v[0]), embedding=v)
+        with self.assertNumQueries(2):
+            docs = list(DocumentDeferred.objects.prefetch_deferred().order_by("pk"))
+            self.assertEqual([d.embedding.tolist() for d in docs], [[1] * 3, [2] * 3])
+
+    def test_search_undefers_vectors(self):
+        for v in ([1, 1, 1], [2, 2, 2]):
+            DocumentDeferred.objects.create(content=str(v[0]), embedding=v)
+        with self.assertNumQueries(1):
+            docs = DocumentDeferred.objects.search(
+                L2Distance("embedding", [1, 1, 1]), k=1
+            )
+        self.assertEqual([d.content for d in docs], ["1"])
+
 
 class TiDBVectorFieldExplicitDimensionTests(TiDBVectorFieldTests):
     model = DocumentExplicitDimension
@@ -80,3 +721,73 @@ class TiDBVectorFieldExplicitDimensionTests(TiDBVectorFieldTests):
 
 class TiDBVectorFieldWithAnnIndexTests(TiDBVectorFieldTests):
     model = DocumentWithAnnIndex
+
+    def test_nearest(self):
+        self.create_documents()
+        with CaptureQueriesContext(connection) as captured_queries:
+            docs = self.model.objects.nearest(
+                "embedding", [1, 1, 1], k=2, metric="l2", explain=False
+            )
+        self.assertEqual([d.content for d in docs], ["1", "3"])
+        self.assertEqual([d.distance for d in docs], [0, 1])
+        self.assertEqual(len(captured_queries), 1)
+        self.assertIn("VEC_L2_DISTANCE", captured_queries[0]["sql"])
+        self.assertIn("LIMIT 2", captured_queries[0]["sql"])
+
+    def test_nearest_many(self):
+        self.create_documents()
+        with CaptureQueriesContext(connection) as captured_queries:
+            results = self.model.objects.nearest_many(
+                "embedding", [[1, 1, 1], [1, 1, 2]], k=2, metric="l2"
+            )
+        self.assertEqual(len(captured_queries), 1)
+        self.assertIn("UNION ALL", captured_queries[0]["sql"])
+        self.assertEqual(
+            [[d.content for d in docs] for docs in results], [["1", "3"], ["3", "1"]]
+        )
+        self.assertEqual(
+            [[d.distance for d in docs] for docs in results], [[0, 1], [0, 1]]
+        )
+
+    def test_nearest_many_with_filters(self):
+        self.create_documents()
+        results = self.model.objects.exclude(content="1").nearest_many(
+            "embedding", [[1, 1, 1], [1, 1, 2]], k=2, metric="l2"
+        )
+        self.assertEqual(
+            [[d.content for d in docs] for docs in results], [["3"], ["3"]]
+        )
+
+    def test_nearest_with_filters(self):
+        self.create_documents()
+        docs = self.model.objects.exclude(content="1").nearest(
+            "embedding", [1, 1, 1], k=2, explain=False
+        )
+        self.assertEqual([d.content for d in docs], ["2"])
+
+    def test_vector_matrix(self):
+        self.create_documents()
+        docs = self.model.objects.order_by("content")
+        pks, matrix = docs.vector_matrix("embedding", chunk_size=2)
+        self.assertEqual(list(pks), list(docs.values_list("pk", flat=True)))
+        self.assertEqual(matrix.dtype, np.float32)
+        self.assertTrue(matrix.flags["C_CONTIGUOUS"])
+        self.assertTrue(np.array_equal(matrix, [[1, 1, 1], [2, 2, 2], [1, 1, 2]]))
+
+    def test_vector_matrix_empty(self):
+        pks, matrix = self.model.objects.vector_matrix("embedding")
+        self.assertEqual(len(pks), 0)
+        self.assertEqual(matrix.shape[0], 0)
+
+    def test_search(self):
+        self.create_documents()
+        docs = self.model.objects.search(L2Distance("embedding", [1, 1, 1]), k=2)
+        self.assertEqual([d.content for d in docs], ["1", "3"])
+        self.assertEqual([d.distance for d in docs], [0, 1])
+
+    def test_search_with_filters(self):
+        self.create_documents()
+        docs = self.model.objects.exclude(content="1").search(
+            L2Distance("embedding", [1, 1, 1]), k=2, oversample=2
+        )
+        self.assertEqual([d.content for d in docs], ["3", "2"])